@@ -0,0 +1,72 @@
+"""
+Step time and readout accuracy of the reduced point cell model against the tetra cell model.
+
+A patch is fixed and a constant force pushes along the normal of every other cell. The depth of each cell,
+read with SkinReadout, is compared between both models over the whole run (dynamic) and at the end (static).
+
+Usage, from the repository root:
+    python benchmarks/cellmodels.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+# Number of cells: cellGrid
+configurations = {200: [10, 20],
+                  1000: [20, 50],
+                  5000: [50, 100]}
+nbSteps = 200
+force = 0.05 # N, along -z, the normal of the cells
+
+
+def createScene(rootnode, cellGrid, model, withGui=False, withVisual=False):
+    from modules.header import addHeader, addSolvers
+    from modules.plugins import requireComponents
+    from modules.patch import Patch
+    from modules.readout import SkinReadout
+
+    settings, modelling, simulation = addHeader(rootnode, inverse=False, withCollision=False, withVisual=withVisual)
+    requireComponents(rootnode, ["ConstantForceField"])
+    addSolvers(simulation, rayleighStiffness=0.001)
+
+    base = simulation.addChild("Base")
+    requireComponents(base, ["MechanicalObject", "FixedProjectiveConstraint"])
+    base.addObject("MechanicalObject", template="Rigid3", position=[[0, 0, 0, 0, 0, 0, 1]])
+    base.addObject("FixedProjectiveConstraint", indices=[0])
+
+    patch = Patch(simulationNode=simulation, attachNode=base, attachIndex=0, name="Patch", cellGrid=cellGrid,
+                  withVisual=withVisual, model=model)
+    indices = list(range(0, patch.cells.nbCells, 2))
+    patch.cells.deformable.addObject("ConstantForceField", indices=indices, forces=[[0, 0, -force]] * len(indices))
+    rootnode.addObject(SkinReadout([patch]))
+
+
+def run(cellGrid, model):
+    from modules.runner import buildScene, runSteps
+
+    rootnode, build = buildScene(createScene, cellGrid=cellGrid, model=model)
+    readout = rootnode.SkinReadout
+    depths = np.zeros((nbSteps, readout.nbCells))
+    def record(step):
+        depths[step] = readout.frame[:, 3]
+    times = runSteps(rootnode, nbSteps, callback=record)
+    return build, np.median(times), depths
+
+
+def main():
+    print(f"{'cells':>8} {'tetra build (s)':>16} {'point build (s)':>16} {'tetra step (ms)':>16} {'point step (ms)':>16} "
+          f"{'depth RMSE (m)':>15} {'final error':>12}")
+    for nbCells, cellGrid in configurations.items():
+        tetraBuild, tetraStep, tetraDepths = run(cellGrid, "tetra")
+        pointBuild, pointStep, pointDepths = run(cellGrid, "point")
+        rmse = np.sqrt(np.mean((tetraDepths - pointDepths) ** 2))
+        final = np.max(np.abs(tetraDepths[-1] - pointDepths[-1])) / max(np.max(np.abs(tetraDepths[-1])), 1e-12)
+        print(f"{nbCells:>8} {tetraBuild:>16.3f} {pointBuild:>16.3f} {tetraStep*1e3:>16.3f} {pointStep*1e3:>16.3f} "
+              f"{rmse:>15.3e} {final:>12.2%}")
+
+
+if __name__ == "__main__":
+    main()
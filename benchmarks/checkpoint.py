@@ -0,0 +1,55 @@
+"""
+Time to reset the main scene (scene.py) to its settled state: rebuilding it and simulating the settling phase,
+rebuilding it and restoring a checkpoint of the settled state, and restoring the checkpoint in the same scene.
+
+Usage, from the repository root:
+    python benchmarks/checkpoint.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+nbSettlingSteps = 100
+nbRepetitions = 5
+
+
+def main():
+    import numpy as np
+    from scene import createScene
+    from modules.runner import buildScene, runSteps
+    from modules.checkpoint import saveCheckpoint, loadCheckpoint, restoreCheckpoint
+
+    filename = os.path.join(tempfile.mkdtemp(), "settled.npz")
+    rootnode, build = buildScene(createScene, withGui=False, withVisual=False)
+    runSteps(rootnode, nbSettlingSteps)
+    saveCheckpoint(rootnode, filename)
+    checkpoint = loadCheckpoint(filename)
+
+    rebuild, restore, reset = [], [], []
+    for _ in range(nbRepetitions):
+        start = time.perf_counter()
+        rootnode, build = buildScene(createScene, withGui=False, withVisual=False)
+        runSteps(rootnode, nbSettlingSteps)
+        rebuild.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        rootnode, build = buildScene(createScene, withGui=False, withVisual=False)
+        restoreCheckpoint(rootnode, filename)
+        restore.append(time.perf_counter() - start)
+
+        runSteps(rootnode, 10)
+        start = time.perf_counter()
+        restoreCheckpoint(rootnode, checkpoint)
+        reset.append(time.perf_counter() - start)
+
+    print(f"checkpoint: {len(checkpoint)} arrays, {os.path.getsize(filename) / 1e6:.2f} MB")
+    print(f"{'rebuild and settle (s)':<32} {np.median(rebuild):>10.3f}")
+    print(f"{'rebuild and restore (s)':<32} {np.median(restore):>10.3f}")
+    print(f"{'restore in place (s)':<32} {np.median(reset):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
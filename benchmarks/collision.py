@@ -0,0 +1,68 @@
+"""
+Collision time per step against the skin coverage, for each broad phase, with and without the collision groups
+of the patches.
+
+Usage, from the repository root:
+    python benchmarks/collision.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+nbPatchesList = [1, 2, 4, 8, 16]
+cellGrid = [4, 4]
+broadPhases = ["ParallelBruteForceBroadPhase", "BruteForceBroadPhase", "DirectSAP"]
+nbSteps = 100
+
+
+def createScene(rootnode, nbPatches, broadPhase, withCollisionGroups, withGui=False, withVisual=False):
+    """
+    Patches on a ring around a fixed rigid base, and a ball falling on the first one.
+    """
+    from math import cos, sin, pi
+    from modules.header import addHeader, addSolvers
+    from modules.plugins import requireComponents
+    from modules.patch import Patch
+    from modules.ball import Ball
+    from modules.profiling import StepProfiler
+
+    settings, modelling, simulation = addHeader(rootnode, inverse=False, withCollision=True, withVisual=withVisual,
+                                                broadPhase=broadPhase)
+    addSolvers(simulation, rayleighStiffness=0.001)
+    rootnode.addObject(StepProfiler())
+
+    base = simulation.addChild("Base")
+    requireComponents(base, ["MechanicalObject", "FixedProjectiveConstraint"])
+    base.addObject("MechanicalObject", template="Rigid3", position=[[0, 0, 0, 0, 0, 0, 1]])
+    base.addObject("FixedProjectiveConstraint", indices=[0])
+
+    for p in range(nbPatches):
+        angle = 2 * pi * p / nbPatches
+        # Rotation of pi/2 around y then angle around z, the normals of the patches point outward
+        q = [-sin(angle/2) * sin(pi/4), cos(angle/2) * sin(pi/4), sin(angle/2) * cos(pi/4), cos(angle/2) * cos(pi/4)]
+        Patch(simulationNode=simulation, attachNode=base, attachIndex=0, name="Patch" + str(p), cellGrid=cellGrid,
+              origin=[0.3 * cos(angle), 0.3 * sin(angle), 0] + q, withVisual=withVisual,
+              withCollisionGroups=withCollisionGroups)
+
+    Ball(simulation, position=[0.5, 0, 0.05], withVisual=withVisual)
+
+
+def main():
+    from modules.runner import buildScene, runSteps
+
+    print(f"{'patches':>8} {'broad phase':<30} {'groups':>7} {'collision (ms)':>15} {'step (ms)':>10}")
+    for nbPatches in nbPatchesList:
+        for broadPhase in broadPhases:
+            for withCollisionGroups in [False, True]:
+                rootnode, build = buildScene(createScene, nbPatches=nbPatches, broadPhase=broadPhase,
+                                             withCollisionGroups=withCollisionGroups)
+                runSteps(rootnode, nbSteps + 1)
+                statistics = rootnode.StepProfiler.statistics()
+                rootnode.StepProfiler.close()
+                print(f"{nbPatches:>8} {broadPhase:<30} {str(withCollisionGroups):>7} "
+                      f"{statistics['collision']['p50']:>15.3f} {statistics['step']['p50']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Time per step of the sensor emulation (modules/emulation.py) against the step time of the simulation,
+for 200, 1,000 and 5,000 cells, at the simulation rate and at 1 kHz with latency, noise and 12-bit quantization.
+
+Usage, from the repository root:
+    python benchmarks/emulation.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+# Number of cells: cellGrid
+configurations = {200: [10, 20],
+                  1000: [20, 50],
+                  5000: [50, 100]}
+emulations = {"step rate": {},
+              "1 kHz": {"rate": 1000., "latency": 0.005, "bits": 12, "noise": {"depth": 1e-6, "force": 1e-4}}}
+nbSteps = 50
+
+
+def createScene(rootnode, cellGrid, withGui=False, withVisual=False):
+    from modules.header import addHeader, addSolvers
+    from modules.plugins import requireComponents
+    from modules.patch import Patch
+    from modules.readout import SkinReadout
+
+    settings, modelling, simulation = addHeader(rootnode, inverse=False, withCollision=False, withVisual=withVisual)
+    addSolvers(simulation, rayleighStiffness=0.001)
+
+    base = simulation.addChild("Base")
+    requireComponents(base, ["MechanicalObject", "FixedProjectiveConstraint"])
+    base.addObject("MechanicalObject", template="Rigid3", position=[[0, 0, 0, 0, 0, 0, 1]])
+    base.addObject("FixedProjectiveConstraint", indices=[0])
+
+    patch = Patch(simulationNode=simulation, attachNode=base, attachIndex=0, name="Patch", cellGrid=cellGrid,
+                  withVisual=withVisual)
+    rootnode.addObject(SkinReadout([patch]))
+
+
+def main():
+    from modules.runner import buildScene, runSteps
+    from modules.emulation import SensorEmulator
+
+    print(f"{'cells':>8} {'step (ms)':>10} " + " ".join(f"{name + ' (ms)':>16}" for name in emulations))
+    for nbCells, cellGrid in configurations.items():
+        rootnode, build = buildScene(createScene, cellGrid=cellGrid)
+        readout = rootnode.SkinReadout
+        emulators = [SensorEmulator(readout, name="SensorEmulator" + str(k), **kwargs)
+                     for k, kwargs in enumerate(emulations.values())]
+        times = np.zeros((len(emulators), nbSteps))
+
+        def emulate(step):
+            for k, emulator in enumerate(emulators):
+                start = time.perf_counter()
+                emulator.update()
+                times[k, step] = time.perf_counter() - start
+
+        stepTimes = runSteps(rootnode, nbSteps, callback=emulate)
+        print(f"{nbCells:>8} {np.median(stepTimes)*1e3:>10.3f} "
+              + " ".join(f"{np.median(t)*1e3:>16.3f}" for t in times))
+
+
+if __name__ == "__main__":
+    main()
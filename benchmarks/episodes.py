@@ -0,0 +1,42 @@
+"""
+Throughput of the parallel episode runner (modules/episodes.py) on the main scene (scene.py) against the number of
+worker processes, one core each, with the same number of episodes per worker. The scaling efficiency is the
+throughput over the number of workers times the throughput of one worker.
+
+Usage, from the repository root:
+    python benchmarks/episodes.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+from modules.episodes import makeEpisodes, runEpisodes
+from modules.header import getNbCores
+
+episodesPerWorker = 4
+nbSteps = 100
+
+
+def main():
+    workers = [n for n in [1, 2, 4, 8, 16, 32, 64] if n <= getNbCores()]
+    directory = tempfile.mkdtemp()
+
+    print(f"{'workers':>8} {'episodes':>9} {'wall (s)':>9} {'episodes/s':>11} {'efficiency':>11} "
+          f"{'build+episode (s)':>18} {'reset+episode (s)':>18}")
+    reference = None
+    for nbWorkers in workers:
+        episodes = makeEpisodes(nbWorkers * episodesPerWorker, nbSteps, seed=0)
+        results, wallTime = runEpisodes(episodes, directory, nbWorkers=nbWorkers)
+        throughput = len(results) / wallTime
+        reference = throughput if reference is None else reference
+        built = [result["wallTime"] for result in results if result["built"]]
+        reused = [result["wallTime"] for result in results if not result["built"]]
+        print(f"{nbWorkers:>8} {len(results):>9} {wallTime:>9.2f} {throughput:>11.3f} {throughput / (nbWorkers * reference):>11.2f} "
+              f"{np.median(built):>18.3f} {np.median(reused) if reused else float('nan'):>18.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Time to lay cells out over the torso and the arms of Talos (modules/layout.py), against the cell spacing, down to
+thousands of cells. The target is a layout well under a second.
+
+Usage, from the repository root:
+    python benchmarks/layout.py
+"""
+import os
+import sys
+import time
+from scipy.spatial import cKDTree
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.cell import Cell
+from modules.layout import getLinkMesh, layoutCells
+
+urdf = "data/talos.urdf"
+links = ["torso_2_link", "arm_left_2_link", "arm_left_3_link", "arm_left_4_link",
+         "arm_right_2_link", "arm_right_3_link", "arm_right_4_link"]
+spacings = [Cell.sideSize * 3, Cell.sideSize * 2, Cell.sideSize * 1.5, Cell.sideSize, Cell.sideSize * 0.75]
+target = 1. # s
+
+
+def main():
+    meshes = {link: getLinkMesh(urdf, link) for link in links} # Parsing is cached, see modules/meshcache.py
+
+    print(f"{'spacing (m)':>12} {'cells':>8} {'layout (s)':>12} {'cells/s':>10} {'min distance (m)':>18} {'target':>7}")
+    for spacing in spacings:
+        start = time.perf_counter()
+        layouts = [layoutCells(*meshes[link], spacing=spacing) for link in links]
+        elapsed = time.perf_counter() - start
+
+        distances = [cKDTree(frames[:, :3]).query(frames[:, :3], k=2)[0][:, 1].min() for frames in layouts if len(frames) > 1]
+        nbCells = sum(len(frames) for frames in layouts)
+        print(f"{spacing:>12.4f} {nbCells:>8} {elapsed:>12.3f} {nbCells / elapsed:>10.0f} {min(distances):>18.4f} "
+              f"{'ok' if elapsed < target else 'missed':>7}")
+
+
+if __name__ == "__main__":
+    main()
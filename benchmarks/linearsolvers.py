@@ -0,0 +1,125 @@
+"""
+Step time of the full Talos + 200-cell scene with each linear solver of addSolvers. The "auto" choice is made on
+the number of scalar DOFs of the scene (getProblemSize) against parallelSolverMinSize (modules/header.py), compare
+its step time with those of SparseLDLSolver and AsyncSparseLDLSolver. With --calibrate, the torso patch is grown
+until AsyncSparseLDLSolver beats SparseLDLSolver, which gives the crossover size to set as the threshold.
+
+Usage, from the repository root:
+    python benchmarks/linearsolvers.py
+    python benchmarks/linearsolvers.py --solvers SparseLDLSolver AsyncSparseLDLSolver --steps 200
+    python benchmarks/linearsolvers.py --calibrate
+"""
+import argparse
+import os
+import subprocess
+import sys
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+solvers = ["SparseLDLSolver", "AsyncSparseLDLSolver", "CGLinearSolver", "ParallelCGLinearSolver", "auto"]
+# Rows of the torso patch (7 columns) of the calibration, from the target scene (24 rows, 200 cells) up
+calibrationRows = [24, 48, 72, 96, 144, 192]
+
+
+def createScene(rootnode, linearSolver, torsoRows=24, withGui=False, withVisual=False):
+    """
+    Full Talos robot in the grasp configuration, with 200 cells: 4x4 on each arm and 7x24 on the torso.
+    """
+    from modules.header import addHeader, addSolvers, getProblemSize
+    from modules.robot import TalosHumanoidRobot
+    from modules.patch import Patch
+    from modules.robotconfigurations import talos_ctrl_joint_infos_grasp as talosInitConfiguration
+
+    settings, modelling, simulation = addHeader(rootnode, inverse=False, withCollision=True, withVisual=withVisual)
+
+    simulation.addChild(TalosHumanoidRobot("data/talos.urdf", withVisual=withVisual, configuration=talosInitConfiguration))
+    robot = simulation.TalosHumanoidRobot.Robot
+
+    Patch(simulationNode=simulation, attachNode=robot.Model, attachIndex=13, name="PatchRightArm", cellGrid=[4, 4],
+          origin=[0.00487 + 0.01, -0.297262 + 0.06, -0.111945 + 0.08, 0.5233419, -0.5233419, -0.4753564, -0.4753564],
+          withVisual=withVisual)
+    Patch(simulationNode=simulation, attachNode=robot.Model, attachIndex=7, name="PatchLeftArm", cellGrid=[4, 4],
+          origin=[-0.00487, 0.297262 - 0.06, 0.111945 - 0.145, 0.5233419, 0.5233419, -0.4753564, 0.4753564],
+          withVisual=withVisual)
+    Patch(simulationNode=simulation, attachNode=robot.Model, attachIndex=2, name="PatchTorso", cellGrid=[7, torsoRows],
+          origin=[0.08, -0.1, 0.2, 0.0, 0.707, 0.0, 0.707],
+          withVisual=withVisual)
+
+    # Added last, so that the "auto" choice sees the size of the problem
+    addSolvers(simulation, rayleighStiffness=0.001, linearSolver=linearSolver, problemSize=getProblemSize(simulation))
+
+
+def runOne(linearSolver, nbSteps, torsoRows=24):
+    os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from modules.runner import buildScene, runSteps, summarize
+    from modules.header import getNbCores, getProblemSize
+
+    rootnode, build = buildScene(createScene, linearSolver=linearSolver, torsoRows=torsoRows)
+    runSteps(rootnode, 10)
+    summary = summarize(runSteps(rootnode, nbSteps))
+    summary["build"] = build
+    summary["selected"] = rootnode.Simulation.solver.getClassName()
+    summary["size"] = getProblemSize(rootnode.Simulation)
+    summary["cores"] = getNbCores()
+    print(json.dumps(summary))
+
+
+def run(solver, nbSteps, torsoRows=24):
+    """
+    Summary of runOne in its own process, the plugins and the threads of a run do not leak into the next.
+    """
+    process = subprocess.run([sys.executable, __file__, "--run-one", solver, "--steps", str(nbSteps),
+                              "--torso-rows", str(torsoRows)], capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(str(process.stderr.strip().splitlines()[-1:]))
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def calibrate(nbSteps):
+    from modules.header import parallelSolverMinSize
+
+    print(f"{'DOFs':>6} {'SparseLDL p50 (ms)':>19} {'AsyncSparseLDL p50 (ms)':>24}")
+    crossover = None
+    for torsoRows in calibrationRows:
+        sequential = run("SparseLDLSolver", nbSteps, torsoRows)
+        parallel = run("AsyncSparseLDLSolver", nbSteps, torsoRows)
+        print(f"{sequential['size']:>6} {sequential['p50']*1e3:>19.3f} {parallel['p50']*1e3:>24.3f}")
+        if parallel["p50"] < sequential["p50"]:
+            crossover = sequential["size"]
+            break
+    if crossover is None:
+        print(f"SparseLDLSolver is faster up to {sequential['size']} DOFs")
+    else:
+        print(f"AsyncSparseLDLSolver is faster from about {crossover} DOFs (parallelSolverMinSize = {parallelSolverMinSize})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--solvers", nargs="+", default=solvers)
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--calibrate", action="store_true", help="find the size above which AsyncSparseLDLSolver is faster")
+    parser.add_argument("--torso-rows", type=int, default=24, help=argparse.SUPPRESS)
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        runOne(args.run_one, args.steps, args.torso_rows)
+        return
+    if args.calibrate:
+        calibrate(args.steps)
+        return
+
+    print(f"{'solver':<24} {'selected':<24} {'DOFs':>6} {'build (s)':>10} {'p50 (ms)':>10} {'p90 (ms)':>10} {'steps/s':>10}")
+    for solver in args.solvers:
+        try:
+            summary = run(solver, args.steps)
+        except RuntimeError as error:
+            print(f"{solver:<24} failed: {error}")
+            continue
+        print(f"{solver:<24} {summary['selected']:<24} {summary['size']:>6} {summary['build']:>10.3f} {summary['p50']*1e3:>10.3f} "
+              f"{summary['p90']*1e3:>10.3f} {summary['stepsPerSecond']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Collision time per step for each level of detail of the collision meshes (modules/lod.py):
+a ball falling on a patch with the collision mesh of the ball decimated, and a ball falling on the Talos robot
+with the collision meshes of the links decimated.
+
+Usage, from the repository root:
+    python -m modules.lod generate data/meshes
+    python benchmarks/lod.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+levels = [0, 1, 2, 3]
+nbSteps = 100
+
+
+def createBallScene(rootnode, collisionLOD, withGui=False, withVisual=False):
+    """
+    A ball falling on a 4x4 patch fixed on a rigid base.
+    """
+    from modules.header import addHeader, addSolvers
+    from modules.plugins import requireComponents
+    from modules.patch import Patch
+    from modules.ball import Ball
+    from modules.profiling import StepProfiler
+
+    settings, modelling, simulation = addHeader(rootnode, inverse=False, withCollision=True, withVisual=withVisual)
+    addSolvers(simulation, rayleighStiffness=0.001)
+    rootnode.addObject(StepProfiler())
+
+    base = simulation.addChild("Base")
+    requireComponents(base, ["MechanicalObject", "FixedProjectiveConstraint"])
+    base.addObject("MechanicalObject", template="Rigid3", position=[[0, 0, 0, 0, 0, 0, 1]])
+    base.addObject("FixedProjectiveConstraint", indices=[0])
+    Patch(simulationNode=simulation, attachNode=base, attachIndex=0, name="Patch", cellGrid=[4, 4], withVisual=withVisual)
+    Ball(simulation, position=[0, 0, 0.2], withVisual=withVisual, collisionLOD=collisionLOD)
+
+
+def createRobotScene(rootnode, collisionLOD, withGui=False, withVisual=False):
+    """
+    A ball falling on the torso of the robot.
+    """
+    from modules.header import addHeader, addSolvers
+    from modules.robot import TalosHumanoidRobot
+    from modules.ball import Ball
+    from modules.profiling import StepProfiler
+
+    settings, modelling, simulation = addHeader(rootnode, inverse=False, withCollision=True, withVisual=withVisual)
+    addSolvers(simulation, rayleighStiffness=0.001)
+    rootnode.addObject(StepProfiler())
+    rootnode.gravity = [0., -9.81, 0.]
+
+    simulation.addChild(TalosHumanoidRobot(withVisual=withVisual, collisionLOD=collisionLOD))
+    Ball(simulation, position=[0.3, 1.3, 0], withVisual=withVisual)
+
+
+def main():
+    from modules.runner import buildScene, runSteps
+
+    print(f"{'scene':<8} {'LOD':>4} {'build (s)':>10} {'collision (ms)':>15} {'step (ms)':>10}")
+    for sceneName, createScene in [("ball", createBallScene), ("robot", createRobotScene)]:
+        for level in levels:
+            rootnode, build = buildScene(createScene, collisionLOD=level)
+            runSteps(rootnode, nbSteps + 1)
+            statistics = rootnode.StepProfiler.statistics()
+            rootnode.StepProfiler.close()
+            print(f"{sceneName:<8} {level:>4} {build:>10.3f} "
+                  f"{statistics['collision']['p50']:>15.3f} {statistics['step']['p50']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
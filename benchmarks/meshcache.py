@@ -0,0 +1,60 @@
+"""
+Load time of the meshes under data/meshes through the mesh cache (modules/meshcache.py): parsed without the cache
+(before), cold (parsed and cached) and warm (memory-mapped from the cache, after). This is the load of the Python
+tools (modules/lod.py, modules/layout.py). The startup time of the robot (createScene and init), whose meshes are
+loaded by SOFA without the cache, is given for reference.
+
+Usage, from the repository root:
+    python benchmarks/meshcache.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.meshcache import listMeshes, getMesh, readMesh
+
+nbRepeats = 3
+
+
+def createScene(rootnode, withGui=False, withVisual=True):
+    from modules.header import addHeader, addSolvers
+    from modules.robot import TalosHumanoidRobot
+
+    settings, modelling, simulation = addHeader(rootnode, inverse=False, withCollision=False, withVisual=withVisual)
+    addSolvers(simulation, rayleighStiffness=0.001)
+    simulation.addChild(TalosHumanoidRobot(withVisual=withVisual))
+
+
+def timeLoads(meshes, load):
+    start = time.perf_counter()
+    for filename in meshes:
+        load(filename)
+    return time.perf_counter() - start
+
+
+def main():
+    meshes = listMeshes("data/meshes")
+    with tempfile.TemporaryDirectory() as cacheDirectory:
+        before = min(timeLoads(meshes, readMesh) for _ in range(nbRepeats))
+        cold = timeLoads(meshes, lambda filename: getMesh(filename, cacheDirectory))
+        # Touches the mapped data
+        after = min(timeLoads(meshes, lambda filename: getMesh(filename, cacheDirectory)[1].sum()) for _ in range(nbRepeats))
+
+    print(f"{'load of the ' + str(len(meshes)) + ' meshes':<28} {'time (s)':>9}")
+    print(f"{'parsed (before)':<28} {before:>9.3f}")
+    print(f"{'cache cold':<28} {cold:>9.3f}")
+    print(f"{'cache warm (after)':<28} {after:>9.3f} {before / after:>6.1f}x")
+
+    try:
+        from modules.runner import buildScene
+    except ImportError:
+        return # Without SOFA
+    buildScene(createScene) # Plugins are loaded once per process, by a first untimed build
+    print(f"{'robot startup (SOFA)':<28} {min(buildScene(createScene)[1] for _ in range(nbRepeats)):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Build time of a patch against its number of cells.
+
+Usage, from the repository root:
+    python benchmarks/patch_build.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import Sofa
+import Sofa.Simulation
+
+from modules.header import addHeader, addSolvers
+from modules.plugins import requireComponents
+from modules.patch import Patch
+
+# Number of cells: cellGrid
+configurations = {200: [10, 20],
+                  1000: [20, 50],
+                  5000: [50, 100]}
+
+
+def buildPatch(cellGrid):
+    rootnode = Sofa.Core.Node("root")
+    settings, modelling, simulation = addHeader(rootnode, inverse=False, withCollision=False, friction=0)
+    addSolvers(simulation, rayleighStiffness=0.001)
+
+    robot = simulation.addChild("Robot")
+    requireComponents(robot, ["MechanicalObject", "FixedProjectiveConstraint"])
+    robot.addObject("MechanicalObject", template="Rigid3", position=[[0, 0, 0, 0, 0, 0, 1]])
+    robot.addObject("FixedProjectiveConstraint", indices=[0])
+
+    start = time.perf_counter()
+    Patch(simulationNode=simulation, attachNode=robot, attachIndex=0, name="Patch", cellGrid=cellGrid)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    Sofa.Simulation.init(rootnode)
+    init = time.perf_counter() - start
+
+    return build, init
+
+
+def main():
+    print(f"{'cells':>8} {'build (s)':>12} {'init (s)':>12}")
+    for nbCells, cellGrid in configurations.items():
+        build, init = buildPatch(cellGrid)
+        print(f"{nbCells:>8} {build:>12.3f} {init:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Step time of a patch with one rest state and spring force field per cell (before)
+against a single shared rest state and spring force field (after).
+
+Usage, from the repository root:
+    python benchmarks/patch_step.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import Sofa
+import Sofa.Simulation
+
+from modules.header import addHeader, addSolvers
+from modules.plugins import requireComponents
+from modules.patch import Patch
+
+# Number of cells: cellGrid
+configurations = {16: [4, 4],
+                  72: [3, 24],
+                  200: [10, 20],
+                  1000: [20, 50]}
+nbSteps = 100
+
+
+def stepPatch(cellGrid, sharedRestShape):
+    rootnode = Sofa.Core.Node("root")
+    settings, modelling, simulation = addHeader(rootnode, inverse=False, withCollision=False, friction=0)
+    addSolvers(simulation, rayleighStiffness=0.001)
+
+    robot = simulation.addChild("Robot")
+    requireComponents(robot, ["MechanicalObject", "FixedProjectiveConstraint"])
+    robot.addObject("MechanicalObject", template="Rigid3", position=[[0, 0, 0, 0, 0, 0, 1]])
+    robot.addObject("FixedProjectiveConstraint", indices=[0])
+
+    Patch(simulationNode=simulation, attachNode=robot, attachIndex=0, name="Patch", cellGrid=cellGrid,
+          sharedRestShape=sharedRestShape)
+    Sofa.Simulation.init(rootnode)
+
+    times = np.zeros(nbSteps)
+    for i in range(nbSteps):
+        start = time.perf_counter()
+        Sofa.Simulation.animate(rootnode, rootnode.dt.value)
+        times[i] = time.perf_counter() - start
+
+    return np.median(times)
+
+
+def main():
+    print(f"{'cells':>8} {'per cell (ms)':>14} {'shared (ms)':>12}")
+    for nbCells, cellGrid in configurations.items():
+        before = stepPatch(cellGrid, sharedRestShape=False)
+        after = stepPatch(cellGrid, sharedRestShape=True)
+        print(f"{nbCells:>8} {before*1e3:>14.3f} {after*1e3:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Latency and throughput of the skin frames sent to another process through the shared memory ring
+(modules/sharedmemory.py, published in the scenes by SkinPublisher) against a multiprocessing pipe, which pickles
+each frame. A stand-in consumer process reads every frame and sums its depth column. The frames are published as
+fast as possible (throughput) and at 1 kHz (latency).
+
+Usage, from the repository root:
+    python benchmarks/sharedmemory.py
+"""
+import os
+import sys
+import time
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+from modules.sharedmemory import SharedFramesWriter, SharedFramesReader
+
+# Number of cells: cellGrid
+configurations = {200: [10, 20],
+                  1000: [20, 50],
+                  5000: [50, 100]}
+rates = [None, 1000.] # Publishing rate in Hz, None for as fast as possible
+nbFrames = 5000
+memoryName = "laas_skin_benchmark"
+
+
+def consumeShared(nbFrames, ready, results):
+    reader = SharedFramesReader(memoryName)
+    ready.set()
+    latencies, nbTorn = [], 0
+    while True:
+        result = reader.wait(timeout=5.)
+        if result is None:
+            break
+        k, t, frame = result
+        stamp = reader.stamps[k % reader.nbSlots]
+        frame[:, 3].sum()
+        latencies.append(time.perf_counter() - stamp)
+        nbTorn += not reader.isIntact(k)
+        if k == nbFrames - 1:
+            break
+    result = frame = None
+    reader.close()
+    results.put((np.array(latencies), nbTorn))
+
+
+def consumePipe(nbFrames, connection, ready, results):
+    ready.set()
+    latencies = []
+    for _ in range(nbFrames):
+        stamp, frame = connection.recv()
+        frame[:, 3].sum()
+        latencies.append(time.perf_counter() - stamp)
+    results.put((np.array(latencies), 0))
+
+
+def publish(send, frames, rate):
+    start = time.perf_counter()
+    for k in range(nbFrames):
+        if rate is not None:
+            while time.perf_counter() - start < k / rate:
+                pass
+        send(k, frames[k % len(frames)])
+    return time.perf_counter() - start
+
+
+def run(transport, layout, rate):
+    from modules.readout import nbColumns
+
+    frames = np.random.default_rng(0).random((16, layout["nbCells"], nbColumns)).astype(np.float32)
+    ready, results = multiprocessing.Event(), multiprocessing.Queue()
+    if transport == "shared":
+        writer = SharedFramesWriter(memoryName, layout, nbColumns)
+        consumer = multiprocessing.Process(target=consumeShared, args=(nbFrames, ready, results))
+        send = lambda k, frame: writer.write(k, frame)
+    else:
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        consumer = multiprocessing.Process(target=consumePipe, args=(nbFrames, receiver, ready, results))
+        send = lambda k, frame: sender.send((time.perf_counter(), frame))
+    consumer.start()
+    ready.wait()
+    elapsed = publish(send, frames, rate)
+    latencies, nbTorn = results.get()
+    consumer.join()
+    if transport == "shared":
+        writer.close()
+    return elapsed, latencies, nbTorn
+
+
+def main():
+    print(f"{'cells':>8} {'rate (Hz)':>10} {'transport':>10} {'frames/s':>10} {'received':>9} {'torn':>5} "
+          f"{'latency p50 (us)':>17} {'p99 (us)':>9}")
+    for nbCells, cellGrid in configurations.items():
+        layout = {"patchNames": ["Patch"], "cellGrids": [cellGrid], "patchSlices": [[0, nbCells]],
+                  "cellIndex": {}, "columns": {}, "nbCells": nbCells}
+        for rate in rates:
+            for transport in ["shared", "pipe"]:
+                elapsed, latencies, nbTorn = run(transport, layout, rate)
+                p50, p99 = np.percentile(latencies, [50, 99]) * 1e6 if len(latencies) else (0., 0.)
+                print(f"{nbCells:>8} {'max' if rate is None else int(rate):>10} {transport:>10} {nbFrames / elapsed:>10.0f} "
+                      f"{len(latencies):>9} {nbTorn:>5} {p50:>17.1f} {p99:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
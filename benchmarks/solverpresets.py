@@ -0,0 +1,62 @@
+"""
+Speed against readout accuracy of the constraint solver presets (addHeader(solverPreset=...), modules/header.py)
+on the main scene (scene.py), with the ball falling on the skin. The readout of each preset is compared step by
+step with the readout of the "accurate" preset, and the solver telemetry (modules/telemetry.py) is reported.
+
+Usage, from the repository root:
+    python benchmarks/solverpresets.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+nbSteps = 300
+presets = ["accurate", "balanced", "realtime"]
+
+
+def createScene(rootnode, solverPreset, withGui=False, withVisual=False):
+    from scene import createScene
+    from modules.telemetry import SolverTelemetry
+
+    createScene(rootnode, withGui=withGui, withVisual=withVisual, solverPreset=solverPreset)
+    rootnode.addObject(SolverTelemetry(window=nbSteps))
+
+
+def run(solverPreset):
+    from modules.runner import buildScene, runSteps, summarize
+    from modules.readout import columns
+
+    rootnode, build = buildScene(createScene, solverPreset=solverPreset)
+    readout = rootnode.getObject("SkinReadout")
+    depths = np.zeros((nbSteps, readout.nbCells))
+    forces = np.zeros((nbSteps, readout.nbCells, 3))
+
+    def record(step):
+        depths[step] = readout.frame[:, columns["depth"]]
+        forces[step] = readout.frame[:, columns["force"]]
+
+    summary = summarize(runSteps(rootnode, nbSteps, callback=record))
+    return summary, rootnode.getObject("SolverTelemetry").statistics(), depths, forces
+
+
+def main():
+    results = {preset: run(preset) for preset in presets}
+    reference = results["accurate"]
+    referenceForce = np.max(np.linalg.norm(reference[3], axis=2))
+
+    print(f"{'preset':>9} {'step p50 (ms)':>14} {'speedup':>8} {'iterations':>11} {'p95':>5} {'residual max':>13} "
+          f"{'unconverged':>12} {'depth error (m)':>16} {'force error':>12}")
+    for preset, (summary, telemetry, depths, forces) in results.items():
+        depthError = np.max(np.abs(depths - reference[2]))
+        # Largest force difference, relative to the largest force of the reference
+        forceError = np.max(np.linalg.norm(forces - reference[3], axis=2)) / referenceForce if referenceForce > 0 else 0.
+        print(f"{preset:>9} {summary['p50']*1e3:>14.3f} {reference[0]['p50'] / summary['p50']:>8.2f} "
+              f"{telemetry['iterationsMean']:>11.1f} {telemetry['iterationsP95']:>5.0f} {telemetry['residualMax']:>13.2e} "
+              f"{telemetry['unconverged']:>12} {depthError:>16.2e} {forceError:>12.2%}")
+
+
+if __name__ == "__main__":
+    main()
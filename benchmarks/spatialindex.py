@@ -0,0 +1,97 @@
+"""
+Time of batched queries on the skin cells with the spatial index (modules/spatialindex.py) against a NumPy scan
+of all the cell positions, for 500 query points.
+
+Usage, from the repository root:
+    python benchmarks/spatialindex.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+# Number of cells: cellGrid
+configurations = {200: [10, 20],
+                  1000: [20, 50],
+                  5000: [50, 100]}
+nbPoints = 500
+radius = 0.02
+k = 4
+
+
+def createScene(rootnode, cellGrid, withGui=False, withVisual=False):
+    from modules.header import addHeader, addSolvers
+    from modules.plugins import requireComponents
+    from modules.patch import Patch
+    from modules.readout import SkinReadout
+    from modules.spatialindex import SkinIndex
+
+    settings, modelling, simulation = addHeader(rootnode, inverse=False, withCollision=False, withVisual=withVisual)
+    addSolvers(simulation, rayleighStiffness=0.001)
+
+    base = simulation.addChild("Base")
+    requireComponents(base, ["MechanicalObject", "FixedProjectiveConstraint"])
+    base.addObject("MechanicalObject", template="Rigid3", position=[[0, 0, 0, 0, 0, 0, 1]])
+    base.addObject("FixedProjectiveConstraint", indices=[0])
+
+    patch = Patch(simulationNode=simulation, attachNode=base, attachIndex=0, name="Patch", cellGrid=cellGrid,
+                  withVisual=withVisual)
+    readout = rootnode.addObject(SkinReadout([patch]))
+    rootnode.addObject(SkinIndex(readout))
+
+
+def timeIt(function, nbRepetitions=10):
+    start = time.perf_counter()
+    for _ in range(nbRepetitions):
+        function()
+    return (time.perf_counter() - start) / nbRepetitions
+
+
+def main():
+    from modules.runner import buildScene, runSteps
+
+    print(f"{'cells':>8} {'radius (ms)':>12} {'scan (ms)':>10} {'kNN (ms)':>10} {'scan (ms)':>10} {'ray (ms)':>10} "
+          f"{'scan (ms)':>10} {'box (ms)':>10} {'scan (ms)':>10}")
+    for nbCells, cellGrid in configurations.items():
+        rootnode, build = buildScene(createScene, cellGrid=cellGrid)
+        runSteps(rootnode, 10)
+        index = rootnode.SkinIndex
+        rng = np.random.default_rng(0)
+        lower, upper = index.positions.min(axis=0), index.positions.max(axis=0)
+        points = lower + rng.random((nbPoints, 3)) * (upper - lower)
+
+        def scan():
+            distances = np.linalg.norm(index.positions[None, :, :] - points[:, None, :], axis=2)
+            return [np.flatnonzero(d <= radius) for d in distances]
+
+        def scanNearest():
+            distances = np.linalg.norm(index.positions[None, :, :] - points[:, None, :], axis=2)
+            return np.argsort(distances, axis=1)[:, :k]
+
+        directions = np.tile([0., 0., -1.], (nbPoints, 1))
+        origins = points + [0, 0, 0.1]
+
+        def scanRay():
+            relative = index.positions[None, :, :] - origins[:, None, :]
+            t = np.einsum("rcj,rj->rc", relative, directions)
+            t[(t < 0) | (np.einsum("rcj,rcj->rc", relative, relative) - t * t > radius * radius)] = np.inf
+            return np.argmin(t, axis=1)
+
+        # One box of side 2 radius around each point
+        def boxes():
+            return [index.box(point - radius, point + radius) for point in points]
+
+        def scanBoxes():
+            return [np.flatnonzero(np.all(np.abs(index.positions - point) <= radius, axis=1)) for point in points]
+
+        print(f"{nbCells:>8} {timeIt(lambda: index.radius(points, radius))*1e3:>12.3f} {timeIt(scan)*1e3:>10.3f} "
+              f"{timeIt(lambda: index.nearest(points, k))*1e3:>10.3f} {timeIt(scanNearest)*1e3:>10.3f} "
+              f"{timeIt(lambda: index.ray(origins, directions, radius))*1e3:>10.3f} {timeIt(scanRay)*1e3:>10.3f} "
+              f"{timeIt(boxes)*1e3:>10.3f} {timeIt(scanBoxes)*1e3:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
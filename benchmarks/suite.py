@@ -0,0 +1,200 @@
+"""
+Performance benchmark suite: scene construction time, steady-state step time, peak RSS and
+constraint solver iterations, against the skin size and the solver configuration.
+
+Each scenario runs in its own process, so that the peak RSS is its own.
+
+Usage, from the repository root:
+    python benchmarks/suite.py run --output results.json
+    python benchmarks/suite.py run --scenario "patches3_.*" --output results.json
+    python benchmarks/suite.py compare baseline.json results.json --threshold 0.1
+    python benchmarks/suite.py list
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Metrics compared against the baseline, all of them lower is better
+comparedMetrics = ["build", "stepMedian", "stepP90", "peakRss", "iterationsMean"]
+
+
+def getScenarios():
+    """
+    Reproducible, parameterized scenarios, by name.
+    """
+    scenarios = {}
+    for nbPatches, cellGrid, withCollision, iterativeSolver, (tolerance, maxIterations) in itertools.product(
+            [1, 3, 6],
+            [[4, 4], [3, 24], [10, 20]],
+            [False, True],
+            [False, True],
+            [(1e-8, 500), (1e-5, 100)]):
+        name = "patches{}_grid{}x{}_{}_{}_tol{:.0e}_it{}".format(nbPatches, cellGrid[0], cellGrid[1],
+                                                               "collision" if withCollision else "nocollision",
+                                                               "iterative" if iterativeSolver else "direct",
+                                                               tolerance, maxIterations)
+        scenarios[name] = {"nbPatches": nbPatches, "cellGrid": cellGrid,
+                           "withCollision": withCollision, "iterativeSolver": iterativeSolver,
+                           "tolerance": tolerance, "maxIterations": maxIterations,
+                           "nbSteps": 200, "nbWarmupSteps": 20}
+    return scenarios
+
+
+def createScene(rootnode, nbPatches, cellGrid, withCollision, iterativeSolver, tolerance, maxIterations,
+                withGui=False, withVisual=False, **kwargs):
+    """
+    Patches side by side on a fixed rigid base, and a ball falling on the first one when with collision.
+    """
+    from modules.header import addHeader, addSolvers
+    from modules.plugins import requireComponents
+    from modules.patch import Patch
+    from modules.ball import Ball
+
+    settings, modelling, simulation = addHeader(rootnode, inverse=False, withCollision=withCollision, withVisual=withVisual,
+                                                constraintTolerance=tolerance, constraintMaxIterations=maxIterations)
+    addSolvers(simulation, rayleighStiffness=0.001, iterativeSolver=iterativeSolver)
+
+    base = simulation.addChild("Base")
+    requireComponents(base, ["MechanicalObject", "FixedProjectiveConstraint"])
+    base.addObject("MechanicalObject", template="Rigid3", position=[[0, 0, 0, 0, 0, 0, 1]])
+    base.addObject("FixedProjectiveConstraint", indices=[0])
+
+    width = cellGrid[0] * 3 * 0.01 + 0.05
+    for p in range(nbPatches):
+        Patch(simulationNode=simulation, attachNode=base, attachIndex=0, name="Patch" + str(p), cellGrid=cellGrid,
+              origin=[p * width, 0, 0, 0, 0, 0, 1], withVisual=withVisual)
+
+    if withCollision:
+        Ball(simulation, position=[0.05, 0.05, 0.2], withVisual=withVisual)
+
+
+def runScenario(scenario):
+    """
+    Runs one scenario in this process and returns its metrics.
+    """
+    import numpy as np
+    from modules.runner import buildScene, runSteps, summarize, getConstraintSolverStats
+
+    rootnode, build = buildScene(createScene, **scenario)
+    runSteps(rootnode, scenario["nbWarmupSteps"])
+
+    iterations = []
+    def readIterations(step):
+        stats = getConstraintSolverStats(rootnode)
+        if stats is not None:
+            iterations.append(stats["iterations"])
+
+    summary = summarize(runSteps(rootnode, scenario["nbSteps"], callback=readIterations))
+    return {"build": build,
+            "stepMedian": summary["p50"],
+            "stepP90": summary["p90"],
+            "stepMax": summary["max"],
+            "stepsPerSecond": summary["stepsPerSecond"],
+            "peakRss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, # ru_maxrss is in kB on Linux
+            "iterationsMean": float(np.mean(iterations)) if iterations else 0.,
+            "iterationsMax": int(np.max(iterations)) if iterations else 0}
+
+
+def run(args):
+    scenarios = getScenarios()
+    names = [name for name in scenarios if re.fullmatch(args.scenario, name)]
+    results = {}
+    for name in names:
+        print(f"running {name}", file=sys.stderr)
+        process = subprocess.run([sys.executable, __file__, "run-one", name], capture_output=True, text=True)
+        if process.returncode != 0:
+            print(process.stderr, file=sys.stderr)
+            results[name] = {"error": process.returncode}
+            continue
+        results[name] = json.loads(process.stdout.strip().splitlines()[-1])
+        results[name]["scenario"] = scenarios[name]
+
+    report = {"date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "platform": platform.platform(),
+              "python": platform.python_version(),
+              "cpus": os.cpu_count(),
+              "results": results}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+def runOne(args):
+    os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    print(json.dumps(runScenario(getScenarios()[args.name])))
+
+
+def compare(args):
+    """
+    Flags the metrics that got worse than the baseline by more than the threshold (relative).
+    Returns 1 if there is any regression, for CI.
+    """
+    with open(args.baseline) as file:
+        baseline = json.load(file)["results"]
+    with open(args.current) as file:
+        current = json.load(file)["results"]
+
+    regressions = 0
+    print(f"{'scenario':<60} {'metric':<16} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name in sorted(set(baseline) & set(current)):
+        for metric in comparedMetrics:
+            before = baseline[name].get(metric)
+            after = current[name].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            flag = ""
+            if change > args.threshold:
+                flag = "REGRESSION"
+                regressions += 1
+            elif change < -args.threshold:
+                flag = "improved"
+            if flag or args.verbose:
+                print(f"{name:<60} {metric:<16} {before:>12.4g} {after:>12.4g} {change:>+8.1%} {flag}")
+
+    for name in sorted(set(baseline) ^ set(current)):
+        print(f"{name:<60} only in {'baseline' if name in baseline else 'current'}")
+    print(f"{regressions} regression(s)")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parserRun = commands.add_parser("run", help="run the scenarios")
+    parserRun.add_argument("--scenario", default=".*", help="regular expression on the scenario names")
+    parserRun.add_argument("--output", help="JSON file for the results, printed when not given")
+    parserRun.set_defaults(function=run)
+
+    parserRunOne = commands.add_parser("run-one", help="run one scenario in this process")
+    parserRunOne.add_argument("name")
+    parserRunOne.set_defaults(function=runOne)
+
+    parserCompare = commands.add_parser("compare", help="compare results against a baseline")
+    parserCompare.add_argument("baseline")
+    parserCompare.add_argument("current")
+    parserCompare.add_argument("--threshold", type=float, default=0.1, help="relative change flagged (default: 0.1)")
+    parserCompare.add_argument("--verbose", action="store_true", help="print all the metrics")
+    parserCompare.set_defaults(function=compare)
+
+    parserList = commands.add_parser("list", help="list the scenarios")
+    parserList.set_defaults(function=lambda args: print("\n".join(getScenarios())))
+
+    args = parser.parse_args()
+    sys.exit(args.function(args) or 0)
+
+
+if __name__ == "__main__":
+    main()
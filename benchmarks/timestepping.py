@@ -0,0 +1,69 @@
+"""
+Real-time factor of the main scene (scene.py) with the fixed time step against the adaptive time step
+(modules/timestepping.py), over the same simulated time, the robot waving its arms from the grasp posture.
+The readout of the adaptive run is compared with the fixed run at the output times.
+
+Usage, from the repository root:
+    python benchmarks/timestepping.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+duration = 4. # Simulated time, s
+keyframes = [(0., "talos_ctrl_joint_infos_grasp"), (1., "talos_ctrl_joint_infos"),
+             (2., "talos_ctrl_joint_infos_grasp"), (3., "talos_ctrl_joint_infos")]
+
+
+def createScene(rootnode, adaptive, withGui=False, withVisual=False):
+    from scene import createScene
+    from modules.trajectory import Trajectory
+    from modules.player import TrajectoryPlayer
+    from modules.timestepping import AdaptiveTimeStep
+
+    createScene(rootnode, withGui=withGui, withVisual=withVisual)
+    robot = rootnode.Simulation.TalosHumanoidRobot
+    rootnode.addObject(TrajectoryPlayer(robot, [Trajectory.fromConfigurations(keyframes, name="wave")]))
+    if adaptive:
+        rootnode.addObject(AdaptiveTimeStep(rootnode.getObject("SkinReadout")))
+
+
+def run(adaptive):
+    import Sofa.Simulation
+    from modules.runner import buildScene
+
+    rootnode, build = buildScene(createScene, adaptive=adaptive)
+    readout = rootnode.getObject("SkinReadout")
+    period = rootnode.dt.value
+    frames = {}
+    nbSteps = 0
+    start = time.perf_counter()
+    while rootnode.time.value < duration - 1e-9:
+        Sofa.Simulation.animate(rootnode, rootnode.dt.value)
+        nbSteps += 1
+        if readout.nbOutputs:
+            frames[int(round(rootnode.time.value / period))] = readout.frame.copy()
+    elapsed = time.perf_counter() - start
+    return rootnode, elapsed, nbSteps, frames
+
+
+def main():
+    fixed, fixedTime, fixedSteps, fixedFrames = run(adaptive=False)
+    adaptive, adaptiveTime, adaptiveSteps, adaptiveFrames = run(adaptive=True)
+    controller = adaptive.getObject("AdaptiveTimeStep")
+
+    common = sorted(set(fixedFrames) & set(adaptiveFrames))
+    errors = [np.max(np.abs(fixedFrames[k][:, 3] - adaptiveFrames[k][:, 3])) for k in common]
+    print(f"{'dt':>9} {'steps':>7} {'sub-steps':>10} {'large steps':>12} {'wall (s)':>9} {'real-time factor':>17}")
+    print(f"{'fixed':>9} {fixedSteps:>7} {0:>10} {0:>12} {fixedTime:>9.2f} {duration / fixedTime:>17.3f}")
+    print(f"{'adaptive':>9} {adaptiveSteps:>7} {controller.nbSubSteps:>10} {controller.nbLargeSteps:>12} "
+          f"{adaptiveTime:>9.2f} {duration / adaptiveTime:>17.3f}")
+    print(f"outputs compared: {len(common)}, largest depth difference: {max(errors) if errors else 0.:.2e} m")
+
+
+if __name__ == "__main__":
+    main()
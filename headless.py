@@ -0,0 +1,123 @@
+"""
+Headless runner: builds a scene without GUI and visual components, runs N steps and reports the step rate.
+
+Usage, from the repository root:
+    python headless.py --steps 1000
+    python headless.py --scene modules.robot --steps 500 --warmup 10
+    python headless.py --steps 200 --trace trace.json
+    python headless.py --steps 0 --plugins
+    python headless.py --trajectory wave.npz grasp.npz --steps 2000
+    python headless.py --trajectory wave.npz --steps 2000 --adaptive
+    python headless.py --steps 500 --preset realtime --telemetry
+"""
+import argparse
+import importlib
+import inspect
+import json
+import os
+import sys
+
+os.chdir(os.path.dirname(os.path.abspath(__file__))) # The scenes use paths relative to the repository root
+sys.path.insert(0, os.getcwd())
+
+from modules.runner import buildScene, runSteps, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scene", default="scene", help="module with the createScene function (default: scene)")
+    parser.add_argument("--steps", type=int, default=1000, help="number of animation steps (default: 1000)")
+    parser.add_argument("--warmup", type=int, default=0, help="steps run before the measure (default: 0)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--trace", help="profile the measured steps and write their Chrome trace to this file")
+    parser.add_argument("--plugins", action="store_true", help="report the load time of the plugins used by the scene")
+    parser.add_argument("--trajectory", nargs="+", default=[], help="trajectory files played back to back by the robot")
+    parser.add_argument("--loop", action="store_true", help="play the trajectories in a loop")
+    parser.add_argument("--adaptive", action="store_true", help="adapt the time step to the contact load, see modules/timestepping.py")
+    parser.add_argument("--preset", help="constraint solver preset of the scene (accurate, balanced or realtime), see modules/header.py")
+    parser.add_argument("--telemetry", action="store_true", help="report the constraint solver iterations, residuals and constraints")
+    args = parser.parse_args()
+
+    scene = importlib.import_module(args.scene)
+
+    def createScene(rootnode, **kwargs):
+        scene.createScene(rootnode, **kwargs)
+        if args.trace:
+            from modules.profiling import StepProfiler
+            rootnode.addObject(StepProfiler(traceStart=args.warmup, traceStop=args.warmup + args.steps))
+        if args.trajectory:
+            from modules.trajectory import Trajectory
+            from modules.player import TrajectoryPlayer
+            trajectories = [Trajectory.load(filename) for filename in args.trajectory]
+            rootnode.addObject(TrajectoryPlayer(rootnode.Simulation.TalosHumanoidRobot, trajectories, loop=args.loop))
+        if args.telemetry:
+            from modules.telemetry import SolverTelemetry
+            rootnode.addObject(SolverTelemetry(window=args.steps or 1))
+        if args.adaptive:
+            from modules.timestepping import AdaptiveTimeStep
+            readout = rootnode.getObject("SkinReadout")
+            if readout is None:
+                parser.error("--adaptive: the scene " + args.scene + " has no SkinReadout to take the contact load from")
+            rootnode.addObject(AdaptiveTimeStep(readout))
+
+    # Only the arguments the createScene of the scene accepts are forwarded
+    parameters = inspect.signature(scene.createScene).parameters
+    if args.preset and "solverPreset" not in parameters:
+        parser.error("--preset: the createScene of " + args.scene + " has no solverPreset argument")
+    sceneArguments = {"withGui": False, "withVisual": False, "solverPreset": args.preset}
+    sceneArguments = {name: value for name, value in sceneArguments.items() if name in parameters and value is not None}
+
+    rootnode, buildTime = buildScene(createScene, **sceneArguments)
+    runSteps(rootnode, args.warmup)
+    startTime = rootnode.time.value
+    summary = summarize(runSteps(rootnode, args.steps))
+    summary["build"] = buildTime
+    summary["simulatedTime"] = rootnode.time.value - startTime
+    summary["realTimeFactor"] = summary["simulatedTime"] / summary["total"] if summary["total"] else 0.
+    if args.trace:
+        runSteps(rootnode, 1) # The profiler records a step at the beginning of the next one
+        profiler = rootnode.getObject("StepProfiler")
+        profiler.dumpTrace(args.trace)
+        summary["phases"] = profiler.statistics()
+        profiler.close()
+    if args.plugins:
+        from modules.plugins import report
+        summary["plugins"] = report()
+    if args.telemetry:
+        summary["solver"] = rootnode.getObject("SolverTelemetry").statistics()
+    if args.adaptive:
+        adaptive = rootnode.getObject("AdaptiveTimeStep")
+        summary["subSteps"], summary["largeSteps"] = adaptive.nbSubSteps, adaptive.nbLargeSteps
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print(f"scene:          {args.scene}")
+    print(f"build:          {buildTime:.3f} s")
+    print(f"steps:          {summary['steps']} in {summary['total']:.3f} s, {summary['stepsPerSecond']:.1f} steps/s")
+    print(f"real-time rate: {summary['realTimeFactor']:.2f} ({summary['simulatedTime']:.3f} s simulated)")
+    print(f"step time:      mean {summary['mean']*1e3:.3f} ms, p50 {summary['p50']*1e3:.3f} ms, "
+          f"p90 {summary['p90']*1e3:.3f} ms, p99 {summary['p99']*1e3:.3f} ms, max {summary['max']*1e3:.3f} ms")
+
+    if args.trace:
+        for phase, statistics in summary["phases"].items():
+            if isinstance(statistics, dict):
+                print(f"{phase + ':':<16}mean {statistics['mean']:.3f} ms, p95 {statistics['p95']:.3f} ms")
+        print(f"trace:          {args.trace}")
+
+    if args.telemetry:
+        solver = summary["solver"]
+        print(f"solver:         iterations mean {solver['iterationsMean']:.1f}, p95 {solver['iterationsP95']:.0f}, "
+              f"max {solver['iterationsMax']}, residual max {solver['residualMax']:.2e}, "
+              f"constraints mean {solver['constraintsMean']:.1f}, {solver['unconverged']} unconverged")
+    if args.adaptive:
+        print(f"adaptive dt:    {summary['subSteps']} sub-steps, {summary['largeSteps']} large steps")
+
+    if args.plugins:
+        from modules.plugins import printReport
+        printReport()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,32 @@
 import Sofa
+from .plugins import requireComponents
 
 class Ball(Sofa.Prefab):
 
-    def __init__(self, attachNode, position=[0, 0, 0]):
+    def __init__(self, attachNode, position=[0, 0, 0], withVisual=True, collisionLOD=None):
+        """
+        collisionLOD: None for the full shell mesh, else the level of detail of the collision mesh (see modules/lod.py)
+        """
         Sofa.Prefab.__init__(self)
         attachNode.addChild(self)
         self.translation = position
+        self.withVisual = withVisual
+        self.collisionLOD = collisionLOD
 
         self.__addSettings()
         self.__addMechanical()
-        self.__addVisual()
+        if withVisual:
+            self.__addVisual()
         self.__addCollision()
 
     def __addSettings(self):
-        settings = self.addChild("Settings")
-        settings.addObject("RequiredPlugin", name="Shell")
-        settings.addObject('RequiredPlugin', name='Sofa.Component.IO.Mesh') # Needed to use components [MeshOBJLoader]  
-        settings.addObject('RequiredPlugin', name='Sofa.Component.Mass') # Needed to use components [UniformMass]  
-        settings.addObject('RequiredPlugin', name='Sofa.Component.StateContainer') # Needed to use components [MechanicalObject]  
-        settings.addObject('RequiredPlugin', name='Sofa.Component.Topology.Container.Constant') # Needed to use components [MeshTopology] 
-        settings.addObject('RequiredPlugin', name='Sofa.Component.Collision.Geometry') # Needed to use components [LineCollisionModel,PointCollisionModel]  
-        settings.addObject('RequiredPlugin', name='Sofa.Component.Mapping.Linear') # Needed to use components [IdentityMapping]  
-        settings.addObject('RequiredPlugin', name='Sofa.GL.Component.Rendering3D') # Needed to use components [OglModel]  
+        components = ["MeshOBJLoader", "MeshTopology", "MechanicalObject", "UniformMass", "TriangularBendingFEMForceField",
+                      "IdentityMapping", "PointCollisionModel", "LineCollisionModel", "TriangleCollisionModel"]
+        if self.withVisual:
+            components += ["OglModel"]
+        if self.collisionLOD:
+            components += ["SubsetMapping"]
+        requireComponents(self, components)
 
     def __addMechanical(self):
         self.addObject("MeshOBJLoader", filename="mesh/ball.obj", triangulate=True, scale=0.17, translation=self.translation)
@@ -42,10 +47,20 @@ class Ball(Sofa.Prefab):
         collision = self.addChild("Collision")
         collision.addObject("MeshTopology", src=self.MeshTopology.linkpath)
         collision.addObject("MechanicalObject")
+        collision.addObject("IdentityMapping")
+        if self.collisionLOD:
+            # The decimated vertices are a subset of the shell vertices
+            from .lod import budgets, decimate
+            self.MeshOBJLoader.init()
+            vertices, triangles, indices = decimate(self.MeshOBJLoader.position.value, self.MeshOBJLoader.triangles.value,
+                                                    budgets[self.collisionLOD])
+            collision = collision.addChild("LOD" + str(self.collisionLOD))
+            collision.addObject("MeshTopology", position=vertices.tolist(), triangles=triangles.tolist())
+            collision.addObject("MechanicalObject")
+            collision.addObject("SubsetMapping", indices=indices.tolist())
         collision.addObject("PointCollisionModel")
         collision.addObject("LineCollisionModel")
         collision.addObject("TriangleCollisionModel")
-        collision.addObject("IdentityMapping")
 
 def createScene(rootnode):
     Ball(rootnode)
\ No newline at end of file
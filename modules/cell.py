@@ -1,22 +1,48 @@
 import Sofa
-from math import pi, cos, sin, floor
+from math import pi
 import numpy as np
+from .numerics import transform
+from .plugins import requireComponents
 
 class Cell(Sofa.Prefab):
     """
         Modeling of a cell sensor. Units are m, kg
+        When given a list of attach indices, the prefab models one cell per index, all sharing the same nodes.
+        With sharedRestShape, the rest positions of the cells are held by a single state with a single spring
+        force field, otherwise each cell gets its own rest state node and spring force field.
+        Two models are available:
+            - "tetra": 8 nodes and 6 tetras per cell, the top center is deformable and the other nodes are rigid
+            - "point": reduced model, only the top center point with its mass, held on its rest position by a
+              spring-damper along the normal of the cell (stiffness, damping) and springs along the two tangent
+              directions (lateralStiffness)
+        Both models have the same deformable and rest states, so they have the same readout (the force of the readout
+        takes the stiffness along the normal and along the tangents of the point model).
     """
     sideSize: float=0.01
     centerThickness: float=0.002
     stiffness: float=1e2
     totalMass: float=0.001
+    colorActive: list[float]=[0, 1, 0, 1]
+    colorInactive: list[float]=[1, 1, 1, 1]
+    drawMode: int=1
+    drawScale: float=0.002
+    damping: float=0.1 # Normal damping of the point model, N.s/m, on top of the Rayleigh damping of the solver
+    lateralStiffness: float=1e2 # Tangential stiffness of the point model
+    springLength: float=0.1 # Length of the oriented springs of the point model, long so that they act along their axis
+    skinCollisionGroup: int=1 # Shared by all the cells, so that the skin does not collide with itself
 
     def __init__(self, 
                  simulationNode: Sofa.Core.Node,
                  attachNode: Sofa.Core.Node,
                  name: str="Cell",
-                 attachIndex: int=0,
-                 addToCell=None
+                 attachIndex: int | list[int]=0,
+                 sharedRestShape: bool=True,
+                 withVisual: bool=True,
+                 collisionGroups: list[int]=None,
+                 model: str="tetra",
+                 stiffness: float=None,
+                 damping: float=None,
+                 lateralStiffness: float=None
                  ):
         Sofa.Prefab.__init__(self)
 
@@ -24,152 +50,179 @@ class Cell(Sofa.Prefab):
         self.simulationNode = simulationNode
         self.attachNode = attachNode
         self.attachIndex = attachIndex
+        self.attachIndices = np.atleast_1d(np.asarray(attachIndex, dtype=int))
+        self.nbCells = len(self.attachIndices)
+        self.sharedRestShape = sharedRestShape
+        self.withVisual = withVisual
+        self.collisionGroups = [self.skinCollisionGroup] if collisionGroups is None else collisionGroups
+        assert model in ["tetra", "point"]
+        self.model = model
+        if stiffness is not None:
+            self.stiffness = stiffness
+        if damping is not None:
+            self.damping = damping
+        if lateralStiffness is not None:
+            self.lateralStiffness = lateralStiffness
 
-        self.colorActive = [0, 1, 0, 1]
-        self.colorInactive = [1, 1, 1, 1]
-        self.drawMode = 1
-        self.drawScale = 0.002
-
-        assert simulationNode.getRoot().getChild("Settings") is not None
-        self.settings = simulationNode.getRoot().Settings
-        if self.settings.getChild("Cell") is None:
-            self.settings.addChild("Cell")
-            self.__addSettings()
-
+        self.__addSettings()
         self.positions = self.__addTopology()
-        if addToCell is None:
-            self.__addMechanical()
+        self.__addMechanical()
+        if withVisual and model == "tetra":
             self.__addVisual()
-            self.__addCollision()
-        else:
-            self.__addToCell(addToCell)
+        self.__addCollision()
 
     def __addSettings(self):
         """
-        Node with the settings, like the required plugins
+        Required plugins of the components of the cells
         """
-        settings = self.settings.Cell
-        settings.addObject('RequiredPlugin', name='Sofa.Component.Collision.Geometry') # Needed to use components [PointCollisionModel]  
-        settings.addObject('RequiredPlugin', name='Sofa.Component.Mapping.Linear') # Needed to use components [IdentityMapping]  
-        settings.addObject('RequiredPlugin', name='Sofa.Component.Topology.Container.Constant') # Needed to use components [MeshTopology] 
-        settings.addObject('RequiredPlugin', name='Sofa.Component.SolidMechanics.Spring') # Needed to use components [RestShapeSpringsForceField]
-        settings.addObject('RequiredPlugin', name='Sofa.Component.Constraint.Projective') # Needed to use components [FixedProjectiveConstraint]  
-        settings.addObject('RequiredPlugin', name='Sofa.Component.Mapping.NonLinear') # Needed to use components [RigidMapping]  
-        settings.addObject('RequiredPlugin', name='Sofa.Component.Mass') # Needed to use components [UniformMass]  
-        settings.addObject('RequiredPlugin', name='Sofa.GL.Component.Rendering3D') # Needed to use components [OglModel]
+        components = ["MechanicalObject", "UniformMass", "RigidMapping", "PointCollisionModel"]
+        if self.withVisual:
+            components += ["VisualStyle"]
+        if self.model == "tetra":
+            components += ["MeshTopology", "SubsetMultiMapping", "RestShapeSpringsForceField"]
+            if self.withVisual:
+                components += ["OglModel", "IdentityMapping"]
+        else:
+            components += ["StiffSpringForceField"]
+        requireComponents(self.simulationNode, components)
 
     def __addTopology(self):
         """
-        Topology of the cell, 8 points, 6 tetras.
+        Topology of the cells, 8 points and 6 tetras per cell, stacked for all the cells.
         """
         s = self.sideSize
-        o = [0., 0., 0.]
-
-        positions = [[o[0], o[1], o[2] + self.centerThickness], # First point is the center up
-                     [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0],
-                      o, # Last the center down 
-                     ]
-        for i in range(1, len(positions) - 1):
-            angle = 2. * pi / 6. * i
-            positions[i] = [s*cos(angle) + o[0], s*sin(angle) + o[1], o[2]]
-        self.edges = [[0, 1],[0, 2],[0, 3],[0, 4],[0, 5],[0, 6],
-                        [1, 2], [2, 3], [3, 4], [4, 5], [5, 6], [6, 1],
-                        [7, 1],[7, 2],[7, 3],[7, 4],[7, 5],[7, 6],
-                        [0, 7]]
-        self.tetras = [[0, 1, 2, 7],
-                        [0, 2, 3, 7],
-                        [0, 3, 4, 7],
-                        [0, 4, 5, 7],
-                        [0, 5, 6, 7],
-                        [0, 6, 1, 7],]
-
-        return positions
+
+        positions = np.zeros((8, 3)) # First point is the center up, last the center down
+        positions[0, 2] = self.centerThickness
+        angles = 2. * pi / 6. * np.arange(1, 7)
+        positions[1:7, 0] = s * np.cos(angles)
+        positions[1:7, 1] = s * np.sin(angles)
+        edges = np.array([[0, 1],[0, 2],[0, 3],[0, 4],[0, 5],[0, 6],
+                          [1, 2], [2, 3], [3, 4], [4, 5], [5, 6], [6, 1],
+                          [7, 1],[7, 2],[7, 3],[7, 4],[7, 5],[7, 6],
+                          [0, 7]])
+        tetras = np.array([[0, 1, 2, 7],
+                           [0, 2, 3, 7],
+                           [0, 3, 4, 7],
+                           [0, 4, 5, 7],
+                           [0, 5, 6, 7],
+                           [0, 6, 1, 7],])
+
+        self.cellPositions = positions
+        offsets = 8 * np.arange(self.nbCells)
+        self.edges = (edges[None, :, :] + offsets[:, None, None]).reshape(-1, 2)
+        self.tetras = (tetras[None, :, :] + offsets[:, None, None]).reshape(-1, 4)
+
+        return np.tile(positions, (self.nbCells, 1))
 
     def __addMechanical(self):
         """
-        Adds cell mechanical, deformable and rigid parts.
+        Adds cells mechanical, deformable and rigid parts.
         """
-        all = Sofa.Core.Node("All")
-        self.all = all
-        all.addObject("MeshTopology", position=self.positions, edges=self.edges, tetras=self.tetras)
-        all.addObject("MechanicalObject", position=self.positions)
-        all.addObject("UniformMass", totalMass=self.totalMass)
-
-        self.rigidified = self.attachNode.addChild(self.name.value + "RigidPart")
-        self.rigidified.addObject("MechanicalObject", position=[self.positions[1:]])
-        self.rigidified.addObject("RigidMapping", rigidIndexPerPoint=[self.attachIndex]*7, globalToLocalCoords=False)
-        self.rigidified.addChild(all)
-
-        topCenterRestPosition = self.attachNode.addChild(self.name.value + "TopCenterRestPosition")
-        topCenterRestPosition.addObject("MechanicalObject", position=[self.positions[0]],
-                                        showObject=True, showObjectScale=self.drawScale, drawMode=self.drawMode, showColor=self.colorActive)
-        topCenterRestPosition.addObject("RigidMapping", index=self.attachIndex, globalToLocalCoords=False)
-        topCenterRestPosition.init()
-        
+        n = self.nbCells
+
+        if self.model == "tetra":
+            all = Sofa.Core.Node("All")
+            self.all = all
+            all.addObject("MeshTopology", position=self.positions.tolist(), edges=self.edges.tolist(), tetras=self.tetras.tolist())
+            all.addObject("MechanicalObject", position=self.positions.tolist())
+            all.addObject("UniformMass", totalMass=self.totalMass)
+
+            self.rigidified = self.attachNode.addChild(self.name.value + "RigidPart")
+            self.rigidified.addObject("MechanicalObject", position=np.tile(self.cellPositions[1:], (n, 1)).tolist())
+            self.rigidified.addObject("RigidMapping", rigidIndexPerPoint=np.repeat(self.attachIndices, 7).tolist(), globalToLocalCoords=False)
+            self.rigidified.addChild(all)
+
+        # Rest positions of the top centers, computed from the attach frames as the RigidMappings would. The attach
+        # frames may not be placed yet (e.g. link-local frames, see Patch), the positions are set again at init
+        frames = np.asarray(self.attachNode.getMechanicalState().position.value)[self.attachIndices]
+        restPositions = transform(frames, self.cellPositions[0])
+
         self.deformable = self.simulationNode.addChild(self.name.value + "DeformablePart")
-        self.deformable.addObject("MechanicalObject", position=topCenterRestPosition.getMechanicalState().position.value,
-                                    showObject=True, showObjectScale=self.drawScale*1.1, drawMode=self.drawMode, showColor=self.colorInactive)
-        self.deformable.addChild(all)
-
-        self.deformable.addObject("VisualStyle", displayFlags=["showBehavior"])
-        self.deformable.addObject("RestShapeSpringsForceField", name="rsff0",
-                                  points=[0], stiffness=self.stiffness,
-                                  external_points=[0],
-                                  external_rest_shape=topCenterRestPosition.getMechanicalState().linkpath) # Spring on the top center of the cell
-        all.addObject('SubsetMultiMapping', template="Vec3,Vec3",
-                       input=[self.rigidified.getMechanicalState().linkpath,
-                              self.deformable.getMechanicalState().linkpath],
-                       output=all.getMechanicalState().linkpath,
-                       indexPairs=[[1, 0],
-                                   [0, 0], [0, 1], [0, 2], [0, 3], [0, 4], [0, 5], [0, 6]])
-        
-    def __addToCell(self, cell):
-
-        all = cell.all
-        offset = len(all.getMechanicalState().position.value)
-        offsetD = floor(offset / 8)
-        offsetR = offset - offsetD
-
-        offset = len(all.getMechanicalState().position.value)
-        for e in self.edges:
-            for i in range(2):
-                e[i] += offset
-        for t in self.tetras:
-            for i in range(4):
-                t[i] += offset
-
-        all.MeshTopology.position.value = np.append(all.MeshTopology.position.value, self.positions, axis=0)
-        all.MeshTopology.edges.value = list(np.append(all.MeshTopology.edges.value, self.edges, axis=0))
-        all.MeshTopology.tetras.value = list(np.append(all.MeshTopology.tetras.value, self.tetras, axis=0))
-        all.getMechanicalState().position.value = np.append(all.getMechanicalState().position.value, 
-                                                            self.positions, axis=0)
-
-        cell.rigidified.getMechanicalState().position.value = np.append(cell.rigidified.getMechanicalState().position.value, 
-                                                                        self.positions[1:], axis=0)
-        rigidIndexPerPoint = np.append(cell.rigidified.RigidMapping.rigidIndexPerPoint.value,
-                                       [self.attachIndex]*7)
-        cell.rigidified.RigidMapping.rigidIndexPerPoint.value = list(rigidIndexPerPoint)
-
-        topCenterRestPosition = self.attachNode.addChild(self.name.value + "TopCenterRestPosition" + str(offsetR))
-        topCenterRestPosition.addObject("MechanicalObject", position=[self.positions[0]],
-                                        showObject=True, showObjectScale=self.drawScale, drawMode=self.drawMode, showColor=self.colorActive)
-        topCenterRestPosition.addObject("RigidMapping", index=self.attachIndex, globalToLocalCoords=False)
-        topCenterRestPosition.init()
-
-        cell.deformable.getMechanicalState().position.value = np.append(cell.deformable.getMechanicalState().position.value,
-                                                                        topCenterRestPosition.getMechanicalState().position.value, axis=0)
-
-        cell.deformable.addObject("RestShapeSpringsForceField", 
-                                  name = "rsff" + str(offsetD),
-                                  points=[offsetD], stiffness=self.stiffness,
-                                  external_points=[0],
-                                  external_rest_shape=topCenterRestPosition.getMechanicalState().linkpath) # Spring on the top center of the cell
-        
-        indexPairs = list(all.SubsetMultiMapping.indexPairs.value) + [1, offsetD,
-                                                                      0, offsetR, 0, offsetR+1, 0, offsetR+2, 0, offsetR+3, 0, offsetR+4, 0, offsetR+5, 0, offsetR+6]
-    
-        all.SubsetMultiMapping.indexPairs.value = indexPairs
-        
+        self.deformable.addObject("MechanicalObject", position=restPositions.tolist(),
+                                    showObject=self.withVisual, showObjectScale=self.drawScale*1.1, drawMode=self.drawMode, showColor=self.colorInactive)
+        if self.model == "tetra":
+            self.deformable.addChild(all)
+        else:
+            # Same mass as the top center of a tetra cell
+            self.deformable.addObject("UniformMass", totalMass=self.totalMass / 8)
+        if self.withVisual:
+            self.deformable.addObject("VisualStyle", displayFlags=["showBehavior"])
+
+        self.__addRestShape()
+        self.deformable.addObject(CellsInit(self))
+
+        if self.model == "tetra":
+            # For each cell: the top center from the deformable part, then the 7 other points from the rigid part
+            indexPairs = np.zeros((n, 8, 2), dtype=int)
+            indexPairs[:, 0, 0] = 1
+            indexPairs[:, 0, 1] = np.arange(n)
+            indexPairs[:, 1:, 1] = 7 * np.arange(n)[:, None] + np.arange(7)[None, :]
+            all.addObject('SubsetMultiMapping', template="Vec3,Vec3",
+                           input=[self.rigidified.getMechanicalState().linkpath,
+                                  self.deformable.getMechanicalState().linkpath],
+                           output=all.getMechanicalState().linkpath,
+                           indexPairs=indexPairs.reshape(-1).tolist())
+
+    def __addRestShape(self):
+        """
+        Adds the rest positions of the top centers, mapped on the attach frames, and the springs pulling the
+        deformable part toward them, the oriented springs for the point model.
+        """
+        n = self.nbCells
+        if self.sharedRestShape:
+            # One rest state for all the top centers and one spring force field for all the cells
+            topCenterRestPosition = self.attachNode.addChild(self.name.value + "TopCenterRestPosition")
+            topCenterRestPosition.addObject("MechanicalObject", position=np.tile(self.cellPositions[0], (n, 1)).tolist(),
+                                            showObject=self.withVisual, showObjectScale=self.drawScale, drawMode=self.drawMode, showColor=self.colorActive)
+            topCenterRestPosition.addObject("RigidMapping", rigidIndexPerPoint=self.attachIndices.tolist(), globalToLocalCoords=False)
+            self.restPositions = [topCenterRestPosition]
+
+            if self.model == "tetra":
+                self.deformable.addObject("RestShapeSpringsForceField", name="rsff",
+                                          points=list(range(n)), stiffness=self.stiffness,
+                                          external_points=list(range(n)),
+                                          external_rest_shape=topCenterRestPosition.getMechanicalState().linkpath) # Springs on the top centers of the cells
+        else:
+            self.restPositions = []
+            for k in range(n):
+                suffix = str(k) if k else ""
+                topCenterRestPosition = self.attachNode.addChild(self.name.value + "TopCenterRestPosition" + suffix)
+                topCenterRestPosition.addObject("MechanicalObject", position=[self.cellPositions[0].tolist()],
+                                                showObject=self.withVisual, showObjectScale=self.drawScale, drawMode=self.drawMode, showColor=self.colorActive)
+                topCenterRestPosition.addObject("RigidMapping", index=int(self.attachIndices[k]), globalToLocalCoords=False)
+                self.restPositions.append(topCenterRestPosition)
+
+                if self.model == "tetra":
+                    self.deformable.addObject("RestShapeSpringsForceField", name="rsff" + str(k),
+                                              points=[k], stiffness=self.stiffness,
+                                              external_points=[0],
+                                              external_rest_shape=topCenterRestPosition.getMechanicalState().linkpath) # Spring on the top center of the cell
+
+        if self.model == "point":
+            self.__addOrientedSprings()
+
+    def __addOrientedSprings(self):
+        """
+        Point model: three springs per cell from anchors mapped on the attach frame, springLength below the rest
+        position along the normal (local z) and the two tangents of the cell. Being long, each spring only acts
+        along its axis around the rest position: a spring-damper along the normal, springs along the tangents.
+        """
+        n = self.nbCells
+        anchors = np.tile(self.cellPositions[0], (n, 3, 1))
+        anchors[:, [0, 1, 2], [2, 0, 1]] -= self.springLength # Normal, then the two tangents
+        anchorNode = self.attachNode.addChild(self.name.value + "SpringAnchors")
+        anchorNode.addObject("MechanicalObject", position=anchors.reshape(-1, 3).tolist())
+        anchorNode.addObject("RigidMapping", rigidIndexPerPoint=np.repeat(self.attachIndices, 3).tolist(), globalToLocalCoords=False)
+
+        stiffness = np.tile([self.stiffness, self.lateralStiffness, self.lateralStiffness], n)
+        damping = np.tile([self.damping, 0., 0.], n)
+        self.deformable.addObject("StiffSpringForceField", name="springs",
+                                  object1=anchorNode.getMechanicalState().linkpath,
+                                  object2=self.deformable.getMechanicalState().linkpath,
+                                  indices1=list(range(3 * n)), indices2=np.repeat(np.arange(n), 3).tolist(),
+                                  lengths=[self.springLength] * (3 * n), stiffness=stiffness.tolist(), damping=damping.tolist())
+
     def __addVisual(self):
         """
         Adds a visual model
@@ -180,15 +233,36 @@ class Cell(Sofa.Prefab):
 
     def __addCollision(self):
         """
-        Adds a collision model, one point on the center top of the cell.
+        Adds a collision model, one point on the center top of each cell, all in the same model.
+        No collision is computed with the models sharing one of the collision groups.
         """
-        self.deformable.addObject("PointCollisionModel")
-        
+        self.deformable.addObject("PointCollisionModel", group=self.collisionGroups)
+
+
+class CellsInit(Sofa.Core.Controller):
+    """
+        Places the top centers of the cells at their rest positions once the scene is initialized, when the
+        RigidMappings have placed the rest states on the attach frames, so that the cells do not snap on the first step.
+    """
+
+    def __init__(self, cells, name="CellsInit"):
+        Sofa.Core.Controller.__init__(self, name=name)
+        self.cells = cells
+
+    def onSimulationInitDoneEvent(self, event):
+        rest = np.concatenate([node.getMechanicalState().position.array() for node in self.cells.restPositions])
+        deformable = self.cells.deformable.getMechanicalState()
+        deformable.position.value = rest
+        deformable.rest_position.value = rest
+
+
 def createScene(rootnode):
 
     from modules.header import addHeader, addSolvers
+    from modules.plugins import requireComponents
 
     settings, modelling, simulation = addHeader(rootnode, inverse=False, withCollision=False, friction=0)
+    requireComponents(rootnode, ["MechanicalObject", "FixedProjectiveConstraint"])
 
     addSolvers(simulation, rayleighStiffness=0.001)
     rootnode.VisualStyle.displayFlags = ["showVisual"]
@@ -0,0 +1,122 @@
+"""
+Checkpoints of the state of a built scene: positions and velocities of the mechanical states, joint targets and the
+state of the Python controllers, saved with the topology arrays, mapping indices and rest states of the scene.
+
+A checkpoint is restored into a scene built by the same createScene, e.g. to reset an episode without rebuilding
+the scene, or to start from a settled state without simulating the settling phase again (see settle).
+The structure arrays are compared on restore, so that a checkpoint of a different scene is rejected.
+"""
+import os
+import numpy as np
+
+# Data restored, per component class
+# (the joint targets of the robot are the positions of a MechanicalObject, see TalosHumanoidRobot)
+stateData = {"MechanicalObject": ["position", "velocity", "rest_position", "free_position", "free_velocity"]}
+# Data checked on restore, per component class
+structureData = {"MeshTopology": ["position", "edges", "triangles", "tetras"],
+                 "SubsetMultiMapping": ["indexPairs"],
+                 "SubsetMapping": ["indices"],
+                 "RigidMapping": ["index", "rigidIndexPerPoint"],
+                 "AttachProjectiveConstraint": ["indices1", "indices2"],
+                 "RestShapeSpringsForceField": ["points", "stiffness"],
+                 "StiffSpringForceField": ["indices1", "indices2", "stiffness"]}
+
+
+def _walk(node):
+    yield node
+    for child in node.children:
+        yield from _walk(child)
+
+
+def getArrays(rootnode):
+    """
+    Arrays of the checkpoint: {"state/path.data": array}, {"structure/path.data": array},
+    and the controllers arrays {"controller/path.attribute": array}.
+    The Python controllers declare the attributes to save in their stateArrays class attribute.
+    """
+    arrays = {"time": np.array(rootnode.time.value), "dt": np.array(rootnode.dt.value)}
+    for node in _walk(rootnode):
+        for obj in node.objects:
+            path = obj.getPathName()
+            className = obj.getClassName()
+            for kind, dataNames in [("state", stateData.get(className, [])), ("structure", structureData.get(className, []))]:
+                for dataName in dataNames:
+                    data = obj.getData(dataName)
+                    if data is not None:
+                        arrays[kind + "/" + path + "." + dataName] = np.array(data.value)
+            for attribute in getattr(obj, "stateArrays", []):
+                arrays["controller/" + path + "." + attribute] = np.array(getattr(obj, attribute))
+    return arrays
+
+
+def saveCheckpoint(rootnode, filename):
+    """
+    Saves the state of the initialized scene into a .npz file.
+    """
+    arrays = getArrays(rootnode)
+    keys = list(arrays)
+    directory = os.path.dirname(os.path.abspath(filename))
+    os.makedirs(directory, exist_ok=True)
+    temporary = filename + "." + str(os.getpid()) + ".tmp.npz"
+    np.savez(temporary, keys=np.array(keys), **{"a" + str(k): arrays[key] for k, key in enumerate(keys)})
+    os.replace(temporary, filename)
+
+
+def loadCheckpoint(filename):
+    with np.load(filename) as file:
+        return {str(key): file["a" + str(k)] for k, key in enumerate(file["keys"])}
+
+
+def restoreCheckpoint(rootnode, checkpoint):
+    """
+    Restores a checkpoint (filename or loaded arrays) into the initialized scene.
+    Raises ValueError when the scene does not match the checkpoint.
+    """
+    arrays = loadCheckpoint(checkpoint) if isinstance(checkpoint, str) else checkpoint
+    current = getArrays(rootnode)
+    for key, value in arrays.items():
+        if key.startswith("structure/") and (key not in current or current[key].shape != value.shape
+                                              or not np.array_equal(current[key], value)):
+            raise ValueError("The scene does not match the checkpoint: " + key)
+    for key in current:
+        if key.startswith(("state/", "controller/")) and key not in arrays:
+            raise ValueError("The checkpoint has no value for " + key)
+
+    objects = {}
+    for node in _walk(rootnode):
+        for obj in node.objects:
+            objects[obj.getPathName()] = obj
+
+    for key, value in arrays.items():
+        if key.startswith("state/"):
+            path, dataName = key[len("state/"):].rsplit(".", 1)
+            objects[path].getData(dataName).value = value
+        elif key.startswith("controller/"):
+            path, attribute = key[len("controller/"):].rsplit(".", 1)
+            target = getattr(objects[path], attribute)
+            if isinstance(target, np.ndarray):
+                np.copyto(target, value) # The controllers may hold views on their arrays
+            else:
+                setattr(objects[path], attribute, value.item() if value.ndim == 0 else value)
+    rootnode.time.value = float(arrays["time"])
+    if "dt" in arrays: # Changed by the adaptive time stepping, see modules/timestepping.py
+        rootnode.dt.value = float(arrays["dt"])
+
+
+def settle(rootnode, nbSteps, filename):
+    """
+    Brings the initialized scene to its settled state: restored from the checkpoint file if it exists,
+    else simulated for nbSteps steps and saved to the file.
+    Returns True if the state was restored.
+    """
+    import Sofa.Simulation
+    if os.path.exists(filename):
+        try:
+            restoreCheckpoint(rootnode, filename)
+            return True
+        except ValueError:
+            pass # Saved from another version of the scene, settled again
+    for _ in range(nbSteps):
+        Sofa.Simulation.animate(rootnode, rootnode.dt.value)
+    saveCheckpoint(rootnode, filename)
+    return False
@@ -0,0 +1,209 @@
+import Sofa
+import numpy as np
+from .cell import Cell
+from .readout import columns, nbColumns
+
+# Default ADC full scale of each column, the quantized values are clipped to [-fullScale, fullScale]
+defaultFullScale = {"indentation": Cell.centerThickness,
+                    "depth": Cell.centerThickness,
+                    "force": Cell.stiffness * Cell.centerThickness}
+
+
+def _perCell(readout, value, default):
+    """
+    Per-cell array of a per-patch parameter, given as a scalar or as a dict {patch name: value}.
+    """
+    values = np.full(readout.nbCells, default, dtype=float)
+    if not isinstance(value, dict):
+        values[:] = default if value is None else value
+        return values
+    for name, v in value.items():
+        values[readout.patchSlices[readout.patchNames.index(name)]] = default if v is None else v
+    return values
+
+
+def _perColumn(value, default=0.):
+    """
+    Per-column array of a parameter, given as a scalar or as a dict {column name: value}, see readout.columns.
+    """
+    values = np.zeros(nbColumns)
+    if not isinstance(value, dict):
+        values[:] = default if value is None else value
+        return values
+    values[:] = default
+    for key, v in value.items():
+        values[columns[key]] = v
+    return values
+
+
+class SensorEmulator(Sofa.Core.Controller):
+    """
+        Emulates the acquisition of the frames of a SkinReadout by the real cells, after each step:
+            - sampling at the rate of each patch (Hz, None for one sample per step), the samples between two steps
+              are interpolated linearly, so the rate can be lower (decimation) or higher than the simulation rate
+            - latency of each patch (s), through a delay line of the last frames
+            - noise, "gaussian" or "uniform" with the given standard deviation per column, plus a constant offset
+              per cell drawn once with the given standard deviation per column, from a seeded generator
+            - quantization of each patch on the given number of bits over [-fullScale, fullScale] (None to disable)
+        The samples of the last step are in samples[m, cell] for m < nbSamples[cell], at sampleTimes[m, cell].
+        frame holds the last sample of each cell. All the cells are processed at once, in preallocated arrays.
+        Must be added after the SkinReadout.
+    """
+    stateArrays = ["frame", "history", "historyTimes", "nextSample", "head"] # Saved in the checkpoints, see modules/checkpoint.py
+
+    def __init__(self, readout, rate=None, latency=0., bits=None, fullScale=None,
+                 noise=0., noiseModel="gaussian", offset=0., seed=0, name="SensorEmulator"):
+        Sofa.Core.Controller.__init__(self, name=name)
+
+        if noiseModel not in ["gaussian", "uniform"]:
+            raise ValueError("Unknown noise model " + str(noiseModel))
+        self.readout = readout
+        self.dt = readout.getContext().getRoot().dt.value
+        n = readout.nbCells
+
+        rate = _perCell(readout, rate, np.nan)
+        self.period = np.where(np.isnan(rate), self.dt, 1. / rate)
+        self.latency = _perCell(readout, latency, 0.)
+        bits = _perCell(readout, bits, np.nan)
+        self.quantized = ~np.isnan(bits)
+        self.fullScale = _perColumn(defaultFullScale if fullScale is None else fullScale)
+        self.resolution = np.zeros((n, nbColumns))
+        self.resolution[self.quantized] = 2 * self.fullScale / 2 ** bits[self.quantized, None]
+        self.noise = _perColumn(noise)
+        self.noiseModel = noiseModel
+        self.offsetDeviation = _perColumn(offset)
+
+        # At most maxSamples samples per step, the delay line covers the largest latency
+        self.maxSamples = int(np.floor(self.dt / np.min(self.period) + 1e-6)) + 1
+        nbHistory = int(np.ceil(np.max(self.latency) / self.dt - 1e-6)) + 2
+        self.history = np.zeros((nbHistory, n, nbColumns))
+        self.historyTimes = np.zeros(nbHistory)
+        self.head = -1
+        self.nextSample = np.zeros(n)
+
+        self.samples = np.zeros((self.maxSamples, n, nbColumns))
+        self.sampleTimes = np.zeros((self.maxSamples, n))
+        self.nbSamples = np.zeros(n, dtype=int)
+        self.valid = np.zeros((self.maxSamples, n), dtype=bool)
+        self.frame = np.zeros((n, nbColumns))
+
+        self.__m = np.arange(self.maxSamples)[:, None]
+        self.__cells = np.arange(n)
+        self.__count = np.zeros(n)
+        self.__source = np.zeros((self.maxSamples, n))
+        self.__weight = np.zeros((self.maxSamples, n))
+        self.__upper = np.zeros((self.maxSamples, n), dtype=int)
+        self.__lower = np.zeros((self.maxSamples, n), dtype=int)
+        self.__lowerSamples = np.zeros((self.maxSamples, n, nbColumns))
+        self.__noise = np.zeros((self.maxSamples, n, nbColumns))
+
+        self.seed = seed
+        self.reset()
+
+    def reset(self, seed=None):
+        """
+        Clears the delay line and the samples, and reseeds the noise (with the same seed by default).
+        """
+        self.seed = self.seed if seed is None else seed
+        self.rng = np.random.default_rng(self.seed)
+        self.offsets = self.rng.standard_normal((self.readout.nbCells, nbColumns)) * self.offsetDeviation
+        self.head = -1
+        self.nbSamples[:] = 0
+        self.valid[:] = False
+        self.frame[:] = 0.
+
+    def __push(self, t):
+        """
+        Adds the readout frame to the delay line. The first frame fills the whole line, as if the cells were at rest.
+        """
+        if self.head < 0:
+            nbHistory = len(self.history)
+            self.history[:] = self.readout.frame
+            self.historyTimes[:] = t - self.dt * np.arange(nbHistory - 1, -1, -1)
+            self.head = nbHistory - 1
+            self.nextSample[:] = t
+            return
+        self.head = (self.head + 1) % len(self.history)
+        self.history[self.head] = self.readout.frame
+        self.historyTimes[self.head] = t
+
+    def update(self):
+        """
+        Computes the samples of the last step from the readout frame.
+        """
+        t = self.readout.time
+        self.__push(t)
+
+        # Sample times up to t, the last maxSamples ones of each cell. There are more only after a frame
+        # longer than dt (see modules/timestepping.py), the first ones are dropped then
+        np.subtract(t, self.nextSample, out=self.__count)
+        self.__count /= self.period
+        np.floor(self.__count + 1e-6, out=self.__count)
+        self.__count += 1
+        np.maximum(self.__count, 0., out=self.__count)
+        np.minimum(self.__count, self.maxSamples, out=self.nbSamples, casting="unsafe")
+        self.__count -= self.nbSamples
+        np.add(self.__m, self.__count, out=self.sampleTimes)
+        self.sampleTimes *= self.period
+        self.sampleTimes += self.nextSample
+        np.less(self.__m, self.nbSamples, out=self.valid)
+        self.__count += self.nbSamples
+        self.nextSample += self.__count * self.period
+
+        # Delay line, the frames are interpolated at sampleTime - latency
+        nbHistory = len(self.history)
+        order = (self.head + 1 + np.arange(nbHistory)) % nbHistory
+        times = self.historyTimes[order]
+        np.subtract(self.sampleTimes, self.latency, out=self.__source)
+        np.clip(self.__source, times[0], times[-1], out=self.__source)
+        index = np.clip(np.searchsorted(times, self.__source, side="right"), 1, nbHistory - 1)
+        np.subtract(self.__source, times[index - 1], out=self.__weight)
+        self.__weight /= times[index] - times[index - 1]
+
+        # Rows of the (nbHistory * nbCells) frames of the delay line
+        history = self.history.reshape(-1, nbColumns)
+        np.multiply(order[index], self.readout.nbCells, out=self.__upper)
+        self.__upper += self.__cells
+        np.multiply(order[index - 1], self.readout.nbCells, out=self.__lower)
+        self.__lower += self.__cells
+        np.take(history, self.__upper, axis=0, out=self.samples, mode="clip")
+        np.take(history, self.__lower, axis=0, out=self.__lowerSamples, mode="clip")
+        self.samples -= self.__lowerSamples
+        self.samples *= self.__weight[:, :, None]
+        self.samples += self.__lowerSamples
+
+        # Noise
+        if np.any(self.noise):
+            if self.noiseModel == "gaussian":
+                self.rng.standard_normal(out=self.__noise)
+            else:
+                self.rng.random(out=self.__noise)
+                self.__noise -= 0.5
+                self.__noise *= np.sqrt(12.) # Unit standard deviation
+            self.__noise *= self.noise
+            self.samples += self.__noise
+        self.samples += self.offsets
+
+        # Quantization, clipped to the full scale and rounded to the resolution
+        if np.any(self.quantized):
+            quantized = self.quantized[:, None]
+            np.minimum(self.samples, self.fullScale, out=self.samples, where=quantized)
+            np.maximum(self.samples, -self.fullScale, out=self.samples, where=quantized)
+            np.divide(self.samples, self.resolution, out=self.samples, where=quantized)
+            np.rint(self.samples, out=self.samples, where=quantized)
+            np.multiply(self.samples, self.resolution, out=self.samples, where=quantized)
+
+        # Last sample of each cell, held until its next sample
+        sampled = np.flatnonzero(self.nbSamples)
+        self.frame[sampled] = self.samples[self.nbSamples[sampled] - 1, sampled]
+        return self.frame
+
+    def getPatchFrame(self, name):
+        """
+        View on the emulated frame rows of the given patch.
+        """
+        return self.frame[self.readout.patchSlices[self.readout.patchNames.index(name)]]
+
+    def onAnimateEndEvent(self, event):
+        if self.readout.nbOutputs:
+            self.update()
@@ -0,0 +1,255 @@
+"""
+Parallel episode runner: independent episodes of a headless scene run on a pool of worker processes, e.g. to
+generate contact datasets with different ball positions, joint configurations and scene layouts.
+
+Each worker is pinned to its own cores and builds the scene once per layout. Between two episodes, the scene is
+reset by restoring an in-memory checkpoint of its initial state (see modules/checkpoint.py) instead of being rebuilt.
+The frames of the episodes of a worker are appended to its own shard, so the workers never share a file.
+
+An episode is a dict:
+    id              number of the episode
+    seed            seed of np.random and of the SensorEmulator of the scene, for the episode
+    nbSteps         number of steps
+    layout          keyword arguments of createScene, the scene is reused by the episodes of the same layout (default: {})
+    ballPosition    position of the center of the Ball at the start of the episode (default: where the scene puts it)
+    configuration   joint targets of the robot, a dict of ControlJointValue or the name of one in modules/robotconfigurations.py
+
+Shards, in the output directory:
+    shard_<worker>.bin      float32 (nbSteps, nbCells, nbColumns) frames of the episodes of the worker, back to back
+    shard_<worker>.json     index of the shard: the episodes with the offset and shape of their frames and their times
+
+Usage, from the repository root:
+    python -m modules.episodes run output --episodes 64 --steps 200 --workers 8
+"""
+import argparse
+import glob
+import importlib
+import json
+import multiprocessing
+import os
+import time
+import numpy as np
+
+# Thread pools of the libraries, limited to the cores of a worker
+threadVariables = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"]
+
+_worker = {} # State of the worker process
+
+
+class Shard:
+    """
+        Frames of the episodes of one worker, appended to a binary file with a JSON index.
+    """
+
+    def __init__(self, directory, worker):
+        self.filename = os.path.join(directory, "shard_{:03d}.bin".format(worker))
+        self.indexFilename = os.path.join(directory, "shard_{:03d}.json".format(worker))
+        self.index = {"worker": worker, "episodes": []}
+        open(self.filename, "wb").close()
+        self.__writeIndex()
+
+    def __writeIndex(self):
+        temporary = self.indexFilename + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(self.index, file, default=str) # Configurations given as dicts are stored as text
+        os.replace(temporary, self.indexFilename) # The shard stays readable if the worker dies
+
+    def append(self, episode, times, frames):
+        frames = np.ascontiguousarray(frames, dtype=np.float32)
+        with open(self.filename, "ab") as file:
+            offset = file.tell()
+            frames.tofile(file)
+        self.index["episodes"].append({"episode": episode, "offset": offset, "shape": list(frames.shape),
+                                       "dtype": frames.dtype.str, "times": times.tolist()})
+        self.__writeIndex()
+
+
+def loadEpisodes(directory):
+    """
+    (entry, frames) of all the episodes of the shards of the directory, ordered by episode id.
+    The frames are memory-mapped, entry is the index entry of the episode, see Shard.
+    """
+    episodes = []
+    for indexFilename in sorted(glob.glob(os.path.join(directory, "shard_*.json"))):
+        with open(indexFilename) as file:
+            index = json.load(file)
+        filename = indexFilename[:-len(".json")] + ".bin"
+        for entry in index["episodes"]:
+            frames = np.memmap(filename, dtype=entry["dtype"], mode="r", offset=entry["offset"], shape=tuple(entry["shape"]))
+            episodes.append((entry, frames))
+    return sorted(episodes, key=lambda episode: episode[0]["episode"]["id"])
+
+
+def makeEpisodes(nbEpisodes, nbSteps, seed=0, ballCenter=(0.3, 0., 0.3), ballRange=(0.05, 0.1, 0.05),
+                 configurations=None, layouts=None):
+    """
+    Episodes with ball positions drawn uniformly in ballCenter +- ballRange, and a configuration and a layout drawn
+    among the given ones. The draws and the seeds of the episodes only depend on seed.
+    """
+    rng = np.random.default_rng(seed)
+    episodes = []
+    for k in range(nbEpisodes):
+        episode = {"id": k, "seed": int(rng.integers(2**31)), "nbSteps": nbSteps,
+                   "ballPosition": (np.asarray(ballCenter) + (2 * rng.random(3) - 1) * ballRange).tolist()}
+        if configurations:
+            episode["configuration"] = configurations[rng.integers(len(configurations))]
+        if layouts:
+            episode["layout"] = layouts[rng.integers(len(layouts))]
+        episodes.append(episode)
+    return episodes
+
+
+def _partitionCores(nbWorkers, threadsPerWorker):
+    """
+    Cores of each worker, empty (no pinning) when there are not enough cores.
+    """
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    if len(cores) < nbWorkers * threadsPerWorker:
+        return [[] for _ in range(nbWorkers)]
+    return [cores[w * threadsPerWorker:(w + 1) * threadsPerWorker] for w in range(nbWorkers)]
+
+
+def _initWorker(assignments, threadsPerWorker, sceneName, directory, nbSettlingSteps, source):
+    worker, cores = assignments.get()
+    if cores:
+        os.sched_setaffinity(0, cores) # Before SOFA is imported, so that all its threads inherit it
+    _worker.update(id=worker, cores=cores, multithreading=threadsPerWorker > 1,
+                   scene=importlib.import_module(sceneName), nbSettlingSteps=nbSettlingSteps, source=source,
+                   shard=Shard(directory, worker), scenes={})
+
+
+def _getScene(layout):
+    """
+    Built scene of the layout and the checkpoint of its initial state, built on first use.
+    """
+    from .runner import buildScene, runSteps
+    from .checkpoint import getArrays
+
+    key = json.dumps(layout, sort_keys=True)
+    if key in _worker["scenes"]:
+        return _worker["scenes"][key] + (False,)
+    rootnode, buildTime = buildScene(_worker["scene"].createScene, withGui=False, withVisual=False,
+                                     multithreading=_worker["multithreading"], **layout)
+    runSteps(rootnode, _worker["nbSettlingSteps"])
+    _worker["scenes"][key] = (rootnode, getArrays(rootnode))
+    return _worker["scenes"][key] + (True,)
+
+
+def _applyEpisode(rootnode, episode):
+    from .checkpoint import _walk
+    from .emulation import SensorEmulator
+    from .robotconfigurations import JointTable
+    from . import robotconfigurations
+
+    seed = episode.get("seed", episode["id"])
+    np.random.seed(seed)
+    for node in _walk(rootnode):
+        for obj in node.objects:
+            if isinstance(obj, SensorEmulator):
+                obj.reset(seed)
+
+    simulation = rootnode.getChild("Simulation")
+    if episode.get("ballPosition") is not None:
+        ball = simulation.getChild("Ball").getMechanicalState()
+        with ball.position.writeableArray() as positions, ball.free_position.writeableArray() as freePositions:
+            positions[:, :3] += np.asarray(episode["ballPosition"]) - np.mean(positions[:, :3], axis=0)
+            freePositions[:] = positions
+        for data in [ball.velocity, ball.free_velocity]:
+            with data.writeableArray() as velocities:
+                velocities[:] = 0.
+
+    if episode.get("configuration") is not None:
+        configuration = episode["configuration"]
+        if isinstance(configuration, str):
+            configuration = getattr(robotconfigurations, configuration)
+        robot = simulation.TalosHumanoidRobot
+        table = JointTable.fromConfiguration(configuration, robot.jointTable.names)
+        robot.setJointTargets(table.pos_desired[table.known], np.flatnonzero(table.known))
+
+
+def _runEpisode(episode):
+    from .runner import runSteps
+    from .checkpoint import restoreCheckpoint
+
+    start = time.perf_counter()
+    rootnode, checkpoint, built = _getScene(episode.get("layout", {}))
+    restoreCheckpoint(rootnode, checkpoint)
+    _applyEpisode(rootnode, episode)
+
+    source = rootnode.getObject(_worker["source"])
+    frames = np.zeros((episode["nbSteps"],) + source.frame.shape, dtype=np.float32)
+    times = np.zeros(episode["nbSteps"])
+
+    def record(step):
+        frames[step] = source.frame
+        times[step] = rootnode.time.value
+
+    stepTimes = runSteps(rootnode, episode["nbSteps"], callback=record)
+    _worker["shard"].append(episode, times, frames)
+    return {"id": episode["id"], "worker": _worker["id"], "built": built,
+            "wallTime": time.perf_counter() - start, "stepTime": float(np.sum(stepTimes))}
+
+
+def runEpisodes(episodes, directory, nbWorkers=None, threadsPerWorker=1, sceneName="scene", nbSettlingSteps=0,
+                source="SkinReadout"):
+    """
+    Runs the episodes on nbWorkers processes, by default as many as the cores allow with threadsPerWorker cores each.
+    The scene module must have a createScene(rootnode, withGui, withVisual, multithreading, **layout) function,
+    multithreading being enabled for threadsPerWorker > 1. The frame of the source controller is recorded after each step.
+    Returns the results of the episodes (ordered by id) and the wall time.
+    """
+    from .header import getNbCores
+
+    nbWorkers = max(1, getNbCores() // threadsPerWorker) if nbWorkers is None else nbWorkers
+    os.makedirs(directory, exist_ok=True)
+    for filename in glob.glob(os.path.join(directory, "shard_*")):
+        os.remove(filename)
+
+    # Spawned workers do not inherit the SOFA state of this process, and read the thread variables at startup
+    context = multiprocessing.get_context("spawn")
+    assignments = context.Queue()
+    for worker, cores in enumerate(_partitionCores(nbWorkers, threadsPerWorker)):
+        assignments.put((worker, cores))
+    environment = {variable: os.environ.get(variable) for variable in threadVariables}
+    os.environ.update({variable: str(threadsPerWorker) for variable in threadVariables})
+
+    start = time.perf_counter()
+    try:
+        with context.Pool(nbWorkers, initializer=_initWorker,
+                          initargs=(assignments, threadsPerWorker, sceneName, directory, nbSettlingSteps, source)) as pool:
+            # Same layouts together, so that the workers mostly reuse their scenes
+            ordered = sorted(episodes, key=lambda episode: json.dumps(episode.get("layout", {}), sort_keys=True))
+            results = list(pool.imap_unordered(_runEpisode, ordered))
+    finally:
+        for variable, value in environment.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+    return sorted(results, key=lambda result: result["id"]), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run = subparsers.add_parser("run", help="run random ball episodes")
+    run.add_argument("directory", help="output directory of the shards")
+    run.add_argument("--episodes", type=int, default=16, help="number of episodes (default: 16)")
+    run.add_argument("--steps", type=int, default=200, help="steps per episode (default: 200)")
+    run.add_argument("--workers", type=int, help="number of worker processes (default: one per --threads cores)")
+    run.add_argument("--threads", type=int, default=1, help="cores per worker (default: 1)")
+    run.add_argument("--settle", type=int, default=0, help="steps run once per scene before the episodes (default: 0)")
+    run.add_argument("--configurations", nargs="+", help="joint configurations drawn by the episodes")
+    run.add_argument("--scene", default="scene", help="module with the createScene function (default: scene)")
+    run.add_argument("--seed", type=int, default=0, help="seed of the episodes (default: 0)")
+    args = parser.parse_args()
+
+    episodes = makeEpisodes(args.episodes, args.steps, seed=args.seed, configurations=args.configurations)
+    results, wallTime = runEpisodes(episodes, args.directory, nbWorkers=args.workers, threadsPerWorker=args.threads,
+                                    sceneName=args.scene, nbSettlingSteps=args.settle)
+    workers = sorted({result["worker"] for result in results})
+    print(f"{len(results)} episodes in {wallTime:.3f} s, {len(results) / wallTime:.2f} episodes/s on {len(workers)} workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import Sofa
+import numpy as np
+from .cell import Cell
+from .readout import columns
+from .plugins import requireComponents
+
+eventType = np.dtype([("cell", np.int32),
+                      ("time", np.float64),
+                      ("depth", np.float64),
+                      ("active", np.bool_)])
+
+
+class ContactEvents(Sofa.Core.Controller):
+    """
+        Contact on/off events of the cells of a SkinReadout, with hysteresis on the depth.
+        A cell becomes active when its depth goes above onThreshold, and inactive when it goes back below offThreshold.
+        After each step, events holds only the cells that changed, as (cell, time, depth, active) records.
+        Must be added after the SkinReadout.
+    """
+    stateArrays = ["active"] # Saved in the checkpoints, see modules/checkpoint.py
+
+    def __init__(self, readout, onThreshold=1e-4, offThreshold=5e-5, displayNode=None, name="ContactEvents"):
+        Sofa.Core.Controller.__init__(self, name=name)
+
+        self.readout = readout
+        n = readout.nbCells
+        # Thresholds are scalars or per-cell arrays
+        self.onThreshold = np.broadcast_to(np.asarray(onThreshold, dtype=float), (n,)).copy()
+        self.offThreshold = np.broadcast_to(np.asarray(offThreshold, dtype=float), (n,)).copy()
+        assert np.all(self.offThreshold <= self.onThreshold)
+
+        self.active = np.zeros(n, dtype=bool)
+        self.__changed = np.zeros(n, dtype=bool)
+        self.__buffer = np.zeros(n, dtype=eventType)
+        self.events = self.__buffer[:0]
+
+        self.markers = None
+        if displayNode is not None:
+            self.__addMarkers(displayNode)
+
+    def __addMarkers(self, displayNode):
+        """
+        Points drawn with the active color on top of the active cells.
+        """
+        requireComponents(displayNode, ["MechanicalObject"])
+        markers = displayNode.addChild(self.name.value + "Markers")
+        markers.addObject("MechanicalObject", position=np.zeros((self.readout.nbCells, 3)).tolist(),
+                          showObject=False, showObjectScale=Cell.drawScale*1.5, drawMode=Cell.drawMode, showColor=Cell.colorActive)
+        self.markers = markers.getMechanicalState()
+
+    def update(self):
+        """
+        Updates the cell states from the readout frame and fills the events of this step.
+        """
+        depth = self.readout.frame[:, columns["depth"]]
+        active = self.active
+
+        # changed = (~active & depth > on) | (active & depth < off)
+        np.greater(depth, self.onThreshold, out=self.__changed)
+        np.logical_and(self.__changed, ~active, out=self.__changed)
+        self.__changed |= active & (depth < self.offThreshold)
+        cells = np.flatnonzero(self.__changed)
+        active[cells] ^= True
+
+        events = self.__buffer[:len(cells)]
+        events["cell"] = cells
+        events["time"] = self.readout.time
+        events["depth"] = depth[cells]
+        events["active"] = active[cells]
+        self.events = events
+
+        if self.markers is not None:
+            self.__updateMarkers()
+        return events
+
+    def __updateMarkers(self):
+        activeCells = np.flatnonzero(self.active)
+        self.markers.showObject = len(activeCells) > 0
+        if len(activeCells) == 0:
+            return
+        with self.markers.position.writeableArray() as markers:
+            positions = self.readout.getPositions(activeCells)
+            # The markers of the inactive cells are hidden under the first active one
+            markers[:] = positions[0]
+            markers[activeCells] = positions
+
+    def onAnimateEndEvent(self, event):
+        if self.readout.nbOutputs:
+            self.update()
+        else:
+            self.events = self.__buffer[:0] # No new transition between two outputs
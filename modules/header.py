@@ -1,33 +1,45 @@
+import os
+from .plugins import getSettings, requirePlugins, requireComponents
+
+# Constraint solver presets of addHeader(solverPreset=...), speed against accuracy, see benchmarks/solverpresets.py.
+# accurate is sequential, so that its results are reproducible from run to run.
+# The constraint solvers of the scenes (GenericConstraintSolver, QPInverseProblemSolver) cannot be warm started,
+# so the presets do not set warmStart
+solverPresets = {"accurate": {"tolerance": 1e-8, "maxIterations": 500, "multithreading": False},
+                 "balanced": {"tolerance": 1e-6, "maxIterations": 200, "multithreading": True},
+                 "realtime": {"tolerance": 1e-4, "maxIterations": 50, "multithreading": True}}
+
+
 def addHeader(rootnode,
               inverse=False, multithreading=True,
               friction=0.6,
-              withCollision=False, withConstraint=True):
+              withCollision=False, withConstraint=True, withVisual=True,
+              constraintTolerance=1e-8, constraintMaxIterations=500, warmStart=False, solverPreset=None,
+              profiling=False, telemetry=False, broadPhase="ParallelBruteForceBroadPhase"):
+    """
+    solverPreset, when given, overrides constraintTolerance, constraintMaxIterations and multithreading,
+    see solverPresets. warmStart starts the constraint solver from the forces of the previous step, a ValueError is
+    raised if the solver does not have the option (initial_guess). telemetry records the constraint solver iterations, residual and number of
+    constraints at each step, see modules/telemetry.py.
+    """
+    if solverPreset is not None:
+        if solverPreset not in solverPresets:
+            raise ValueError("Unknown solver preset " + str(solverPreset))
+        preset = solverPresets[solverPreset]
+        constraintTolerance, constraintMaxIterations = preset["tolerance"], preset["maxIterations"]
+        multithreading = preset["multithreading"]
 
     # Units are in m, kg, s
-    # RequiredPlugins
-    settings = rootnode.addChild('Settings')
-    settings.addObject('RequiredPlugin', name="external",
-                       pluginName=['BeamAdapter', 'SoftRobots', 'MultiThreading',
-                                   'SoftRobots.Inverse', 'ArticulatedSystemPlugin'
-                                   ])
-    settings.addObject('RequiredPlugin', name="header",
-                       pluginName=['Sofa.GL.Component.Shader',  # needed for LightManager
-                                   'Sofa.Component.Collision.Detection.Algorithm',
-                                   'Sofa.Component.Collision.Detection.Intersection',
-                                   'Sofa.Component.AnimationLoop',
-                                   'Sofa.Component.Collision.Response.Contact',
-                                   # Needed to use components [RuleBasedContactManager]
-                                   'Sofa.Component.Constraint.Lagrangian.Solver',
-                                   # Needed to use components [GenericConstraintSolver]
-                                   'Sofa.Component.StateContainer',  # Needed to use components [MechanicalObject]
-                                   'Sofa.Component.Visual',  # Needed to use components [VisualStyle]
-                                   'Sofa.GUI.Component',  # Needed to use components [AttachBodyButtonSetting]
-                                   "Sofa.Component.IO.Mesh"
-                                   ])
+    # Required plugins, only those of the components used by the scene are loaded, see modules/plugins.py
+    settings = getSettings(rootnode)
 
     # Utilities
-    rootnode.addObject("DefaultVisualManagerLoop")
-    rootnode.addObject('VisualStyle')
+    if withVisual:
+        # Used by the GUI, for the LightManager and the AttachBodyButtonSetting
+        requirePlugins(rootnode, ['Sofa.GL.Component.Shader', 'Sofa.GUI.Component'])
+        requireComponents(rootnode, ["DefaultVisualManagerLoop", "VisualStyle"])
+        rootnode.addObject("DefaultVisualManagerLoop")
+        rootnode.addObject('VisualStyle')
     rootnode.gravity = [0, 0, -9.81]
     rootnode.dt = 0.01
 
@@ -37,54 +49,130 @@ def addHeader(rootnode,
 
     # Collision header
     if withCollision:
+        requireComponents(rootnode, ["CollisionPipeline", "RuleBasedContactManager", broadPhase,
+                                     "ParallelBVHNarrowPhase", "LocalMinDistance"])
         rootnode.addObject('CollisionPipeline')
         rootnode.addObject('RuleBasedContactManager', responseParams='mu=' + str(friction),
                            response='FrictionContactConstraint')
-        rootnode.addObject('ParallelBruteForceBroadPhase')
+        # Each patch of cells is a single collision model with its own bounding volume,
+        # "DirectSAP" (sweep and prune) avoids testing all the pairs of bounding volumes
+        rootnode.addObject(broadPhase)
         rootnode.addObject('ParallelBVHNarrowPhase')
         rootnode.addObject('LocalMinDistance', alarmDistance=0.005, contactDistance=0.001)
 
     # Constraint header
     if withConstraint:
+        requireComponents(rootnode, ["FreeMotionAnimationLoop", "QPInverseProblemSolver" if inverse else "GenericConstraintSolver"])
         rootnode.addObject('FreeMotionAnimationLoop',
                            parallelODESolving=multithreading)
         if inverse:
-            rootnode.addObject('QPInverseProblemSolver', name='ConstraintSolver', tolerance=1e-8, maxIterations=500,
+            rootnode.addObject('QPInverseProblemSolver', name='ConstraintSolver', tolerance=constraintTolerance, maxIterations=constraintMaxIterations,
                                multithreading=multithreading, responseFriction=friction, allowSliding=False, epsilon=0.01)
         else:
-            rootnode.addObject('GenericConstraintSolver', name='ConstraintSolver', tolerance=1e-8, maxIterations=500,
+            rootnode.addObject('GenericConstraintSolver', name='ConstraintSolver', tolerance=constraintTolerance, maxIterations=constraintMaxIterations,
                                multithreading=multithreading)
+        if warmStart:
+            if rootnode.ConstraintSolver.getData("initial_guess") is None:
+                raise ValueError(rootnode.ConstraintSolver.getClassName() + " cannot be warm started")
+            rootnode.ConstraintSolver.initial_guess = True
     else:
+        requireComponents(rootnode, ["DefaultAnimationLoop"])
         rootnode.addObject('DefaultAnimationLoop')
 
+    # Opt-in step profiling, see modules/profiling.py
+    if profiling:
+        from .profiling import StepProfiler
+        rootnode.addObject(StepProfiler())
+    # Opt-in constraint solver telemetry
+    if telemetry and withConstraint:
+        from .telemetry import SolverTelemetry
+        rootnode.addObject(SolverTelemetry())
+
     return settings, modelling, simulation
 
 
+# Above these numbers of cores and of scalar DOFs, addSolvers(linearSolver="auto") picks a multithreaded solver.
+# The Talos scene with 200 cells has about 680 DOFs (3 per cell and the joints), below the threshold, so "auto"
+# picks the sequential SparseLDLSolver there. The threshold is not measured yet: set it to the crossover reported by
+# python benchmarks/linearsolvers.py --calibrate on the target machine
+parallelSolverMinCores = 4
+parallelSolverMinSize = 1500
+
+
+def getNbCores():
+    """
+    Number of cores this process may run on.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count()
+
+
+def getProblemSize(node):
+    """
+    Number of scalar DOFs solved by the solvers of the node, those of the mechanical states under it that are not
+    mapped. Valid once the scene content is created, before init.
+    """
+    size = 0
+    state = node.getMechanicalState()
+    if state is not None and node.getMechanicalMapping() is None:
+        position = state.position.value
+        if len(position):
+            width = len(position[0]) if hasattr(position[0], "__len__") else 1
+            size += len(position) * (6 if width == 7 else width) # Rigid3 positions have 7 coordinates for 6 DOFs
+    for child in node.children:
+        size += getProblemSize(child)
+    return size
+
+
+def selectLinearSolver(problemSize=None, nbCores=None):
+    """
+    Linear solver picked by addSolvers(linearSolver="auto"). The CPU multithreaded sparse LDL is used when there
+    are enough cores and, if the problem size (number of scalar DOFs, see getProblemSize) is known, when the problem
+    is large enough. Without problem size, the choice is made on the number of cores only.
+    """
+    nbCores = getNbCores() if nbCores is None else nbCores
+    if nbCores >= parallelSolverMinCores and (problemSize is None or problemSize >= parallelSolverMinSize):
+        return "AsyncSparseLDLSolver"
+    return "SparseLDLSolver"
+
+
 def addSolvers(node, rayleighMass=0., rayleighStiffness=0.01, firstOrder=False,
-               multithreading=False, iterativeSolver=False):
-
-    # Required plugins
-    settings = node.getRoot().Settings
-    if settings.getObject("solvers") is None:
-        settings.addObject('RequiredPlugin', name="solvers",
-                           pluginName=['Sofa.Component.ODESolver.Backward',
-                                       'Sofa.Component.LinearSolver.Direct',
-                                       'Sofa.Component.Constraint.Lagrangian.Correction',
-                                       'Sofa.Component.LinearSolver.Iterative'
-                                       ])
+               multithreading=False, iterativeSolver=False, linearSolver=None, problemSize=None):
+    """
+    linearSolver, when given, overrides multithreading and iterativeSolver:
+        - "SparseLDLSolver" or "CGLinearSolver", sequential
+        - "AsyncSparseLDLSolver" or "ParallelCGLinearSolver", CPU multithreaded (MultiThreading plugin)
+        - "CudaSparseLDLSolver", GPU (SofaCUDASolvers plugin), same as multithreading=True
+        - "auto", see selectLinearSolver, with problemSize the number of scalar DOFs if known. To give it, add the
+          solvers once the content of the node is created, with problemSize=getProblemSize(node). Without it, the
+          multithreaded solver is picked whenever there are enough cores, even for a small problem
+    """
+
+    if linearSolver is None:
+        linearSolver = "CudaSparseLDLSolver" if multithreading else "CGLinearSolver" if iterativeSolver else "SparseLDLSolver"
+    elif linearSolver == "auto":
+        linearSolver = selectLinearSolver(problemSize)
+    iterativeSolver = linearSolver in ["CGLinearSolver", "ParallelCGLinearSolver"]
+    if linearSolver not in ["CudaSparseLDLSolver", "AsyncSparseLDLSolver", "ParallelCGLinearSolver", "CGLinearSolver", "SparseLDLSolver"]:
+        raise ValueError("Unknown linear solver " + str(linearSolver))
+    requireComponents(node, ["EulerImplicitSolver", linearSolver] + ([] if iterativeSolver else ["GenericConstraintCorrection"]))
 
     # Solvers
     node.addObject('EulerImplicitSolver', firstOrder=firstOrder, rayleighStiffness=rayleighStiffness,
                    rayleighMass=rayleighMass, printLog=False)
-    if multithreading:
-        node.addObject('RequiredPlugin', name='SofaCUDASolvers')
+    if linearSolver == "CudaSparseLDLSolver":
         node.addObject('CudaSparseLDLSolver', name='solver', template='AsyncCompressedRowSparseMatrixMat3x3f',
                        useMultiThread=True)
+    elif linearSolver == "AsyncSparseLDLSolver":
+        node.addObject('AsyncSparseLDLSolver', name='solver', template="CompressedRowSparseMatrixd")
+    elif linearSolver == "ParallelCGLinearSolver":
+        node.addObject('ParallelCGLinearSolver', name='solver', template="ParallelCompressedRowSparseMatrixd",
+                       iterations=500, tolerance=1e-10, threshold=1e-10)
+    elif linearSolver == "CGLinearSolver":
+        node.addObject('CGLinearSolver', name='solver', iterations=500, tolerance=1e-10, threshold=1e-10)
     else:
-        if iterativeSolver:
-            node.addObject('CGLinearSolver', name='solver', iterations=500, tolerance=1e-10, threshold=1e-10)
-        else:
-            node.addObject('SparseLDLSolver', name='solver', template="CompressedRowSparseMatrixd")
+        node.addObject('SparseLDLSolver', name='solver', template="CompressedRowSparseMatrixd")
 
     if not iterativeSolver:
         node.addObject('GenericConstraintCorrection', linearSolver=node.solver.getLinkPath())
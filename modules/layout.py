@@ -0,0 +1,107 @@
+"""
+Layout of the skin cells over the surface of a robot link. The visual mesh of the link is sampled, and cells are
+picked among the samples so that they are at least the cell spacing apart (Poisson disk sampling, with a KD-tree).
+The cell frames have their z axis along the surface normal, and are given in the link frame, see Patch(frames=...).
+"""
+import os
+import numpy as np
+import xml.etree.ElementTree as ET
+from math import pi, cos, sqrt
+from scipy.spatial import cKDTree
+from .cell import Cell
+from .meshcache import getMesh
+from .numerics import rotate, quatFromZ, quatFromRPY
+
+
+def getLinkMesh(urdf, linkName, modelDirectory="data/meshes/"):
+    """
+    Vertices, in the link frame, and triangles of the visual mesh of the link.
+    """
+    link = ET.parse(urdf).getroot().find("link[@name='" + linkName + "']")
+    if link is None or link.find("visual/geometry/mesh") is None:
+        raise ValueError("No visual mesh for the link " + linkName + " in " + urdf)
+    mesh = link.find("visual/geometry/mesh")
+    origin = link.find("visual/origin")
+    xyz = [0., 0., 0.] if origin is None else [float(x) for x in origin.get("xyz", "0 0 0").split()]
+    rpy = [0., 0., 0.] if origin is None else [float(x) for x in origin.get("rpy", "0 0 0").split()]
+    scale = [float(x) for x in mesh.get("scale", "1 1 1").split()]
+
+    vertices, triangles = getMesh(os.path.join(modelDirectory, mesh.get("filename")))
+    vertices = rotate(quatFromRPY(rpy), np.asarray(vertices, dtype=float) * scale) + xyz
+    return vertices, np.asarray(triangles)
+
+
+def sampleSurface(vertices, triangles, nbSamples, rng):
+    """
+    Points uniformly distributed over the surface, with the normals of their triangles.
+    """
+    corners = np.asarray(vertices, dtype=float)[np.asarray(triangles)]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    areas = np.linalg.norm(normals, axis=1)
+    valid = areas > 0
+    corners, normals, areas = corners[valid], normals[valid] / areas[valid, None], areas[valid]
+
+    faces = rng.choice(len(areas), nbSamples, p=areas / np.sum(areas))
+    r1 = np.sqrt(rng.random(nbSamples))[:, None]
+    r2 = rng.random(nbSamples)[:, None]
+    a, b, c = corners[faces, 0], corners[faces, 1], corners[faces, 2]
+    points = (1 - r1) * a + r1 * (1 - r2) * b + r1 * r2 * c
+    return points, normals[faces]
+
+
+def surfaceArea(vertices, triangles):
+    corners = np.asarray(vertices, dtype=float)[np.asarray(triangles)]
+    return 0.5 * float(np.sum(np.linalg.norm(np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis=1)))
+
+
+def layoutCells(vertices, triangles, spacing=None, box=None, direction=None, maxAngle=pi/2,
+                samplesPerCell=16, seed=0):
+    """
+    Frames [x, y, z, qx, qy, qz, qw] of cells over the surface, at least spacing apart (by default the spacing of
+    the cells of a Patch, Cell.sideSize * 3). The surface can be restricted to an axis-aligned box [min, max],
+    and to the normals within maxAngle of a direction.
+    """
+    spacing = Cell.sideSize * 3 if spacing is None else spacing
+    rng = np.random.default_rng(seed)
+    # A hexagonal packing has one cell per spacing^2 * sqrt(3)/2
+    nbSamples = int(samplesPerCell * surfaceArea(vertices, triangles) / (spacing * spacing * sqrt(3) / 2)) + 1
+    points, normals = sampleSurface(vertices, triangles, nbSamples, rng)
+
+    selected = np.ones(len(points), dtype=bool)
+    if box is not None:
+        selected &= np.all((points >= box[0]) & (points <= box[1]), axis=1)
+    if direction is not None:
+        direction = np.asarray(direction, dtype=float) / np.linalg.norm(direction)
+        selected &= normals @ direction >= cos(maxAngle)
+    points, normals = points[selected], normals[selected]
+    if len(points) == 0:
+        return np.zeros((0, 7))
+
+    # Pairs of samples closer than the spacing, lower index first
+    pairs = cKDTree(points).query_pairs(spacing, output_type="ndarray")
+    lower, higher = pairs[:, 0], pairs[:, 1]
+
+    # Greedy selection in the order of the samples (random), by rounds over all the pairs: a sample is kept when
+    # none of its lower neighbours is undecided, and then removes its higher neighbours. Same result as keeping the
+    # samples one by one, in a few rounds
+    undecided, kept = np.ones(len(points), dtype=bool), np.zeros(len(points), dtype=bool)
+    blocked = np.zeros(len(points), dtype=bool)
+    while np.any(undecided):
+        blocked[:] = False
+        blocked[higher] = True # The pairs left have both samples undecided
+        newlyKept = undecided & ~blocked
+        kept |= newlyKept
+        undecided &= ~newlyKept
+        undecided[higher[newlyKept[lower]]] = False
+        left = undecided[lower] & undecided[higher]
+        lower, higher = lower[left], higher[left]
+
+    cells = np.flatnonzero(kept)
+    return np.hstack([points[cells], quatFromZ(normals[cells])])
+
+
+def layoutLink(urdf, linkName, modelDirectory="data/meshes/", **kwargs):
+    """
+    Cell frames over the visual mesh of the link, in the link frame. See layoutCells for the options.
+    """
+    return layoutCells(*getLinkMesh(urdf, linkName, modelDirectory), **kwargs)
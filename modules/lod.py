@@ -0,0 +1,153 @@
+"""
+Levels of detail of the collision meshes. Meshes are decimated by vertex clustering to a triangle budget,
+and the results are written as binary STL files in the mesh cache.
+
+Usage, from the repository root:
+    python -m modules.lod generate data/meshes
+"""
+import os
+import sys
+import numpy as np
+import xml.etree.ElementTree as ET
+from .meshcache import getMesh, getKey, getCacheDirectory, listMeshes, resolvePath, writeSTL, writeAtomic
+
+# Triangle budget of each level, level 0 is the original mesh
+budgets = [None, 2000, 500, 100]
+# Simplified variants shipped next to some meshes, used as the source of the decimation when present
+variants = ["_collision", "_lo_res"]
+
+
+def cluster(vertices, triangles, cellSize):
+    """
+    Merges the vertices falling in the same cell of a grid. Each cluster is represented by its vertex closest
+    to the cluster centroid, so that the decimated vertices are a subset of the original ones.
+    Returns the vertices, the triangles and the indices of the kept vertices in the original mesh.
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    triangles = np.asarray(triangles, dtype=np.int64)
+    keys = np.floor((vertices - vertices.min(axis=0)) / cellSize).astype(np.int64)
+    _, labels = np.unique(keys, axis=0, return_inverse=True)
+    labels = labels.reshape(-1)
+    nbClusters = labels.max() + 1
+
+    counts = np.bincount(labels, minlength=nbClusters)
+    centroids = np.zeros((nbClusters, 3))
+    np.add.at(centroids, labels, vertices)
+    centroids /= counts[:, None]
+    distances = np.linalg.norm(vertices - centroids[labels], axis=1)
+    order = np.lexsort((distances, labels))
+    representatives = order[np.searchsorted(labels[order], np.arange(nbClusters))]
+
+    # Drops the collapsed and the duplicated triangles
+    clustered = labels[triangles]
+    keep = (clustered[:, 0] != clustered[:, 1]) & (clustered[:, 1] != clustered[:, 2]) & (clustered[:, 0] != clustered[:, 2])
+    clustered = clustered[keep]
+    _, unique = np.unique(np.sort(clustered, axis=1), axis=0, return_index=True)
+    clustered = clustered[np.sort(unique)]
+
+    used = np.unique(clustered)
+    remap = np.full(nbClusters, -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    indices = representatives[used]
+    return vertices[indices], remap[clustered].astype(np.int32), indices
+
+
+def decimate(vertices, triangles, budget, nbIterations=20):
+    """
+    Finest clustering with at most budget triangles, found by bisection on the grid cell size.
+    """
+    if budget is None or len(triangles) <= budget:
+        return np.asarray(vertices, dtype=float), np.asarray(triangles, dtype=np.int32), np.arange(len(vertices))
+
+    vertices = np.asarray(vertices, dtype=float)
+    low, high = 0., float(np.linalg.norm(vertices.max(axis=0) - vertices.min(axis=0)))
+    best = cluster(vertices, triangles, high)
+    for _ in range(nbIterations):
+        middle = 0.5 * (low + high)
+        result = cluster(vertices, triangles, middle)
+        if len(result[1]) <= budget:
+            best, high = result, middle
+        else:
+            low = middle
+    return best
+
+
+def getSourceFile(filename):
+    """
+    Mesh decimated for the levels above 0: the collision or low resolution variant of the file if it exists.
+    """
+    stem, extension = os.path.splitext(filename)
+    for variant in variants:
+        if stem.endswith(variant):
+            return filename
+    for variant in variants:
+        if os.path.exists(stem + variant + extension):
+            return stem + variant + extension
+    return filename
+
+
+def getLODFile(filename, level, cacheDirectory=None):
+    """
+    Path of the decimated mesh of the given level, generated on the first call. Level 0 is the original file.
+    The files are keyed by the hash of the source mesh and the triangle budget.
+    """
+    if level == 0:
+        return resolvePath(filename)
+    cacheDirectory = cacheDirectory or getCacheDirectory()
+    filename = getSourceFile(resolvePath(filename))
+    lodFile = os.path.join(cacheDirectory, "lod", getKey(filename, cacheDirectory) + "_" + str(budgets[level]) + ".stl")
+    if not os.path.exists(lodFile):
+        os.makedirs(os.path.dirname(lodFile), exist_ok=True)
+        vertices, triangles, indices = decimate(*getMesh(filename, cacheDirectory), budgets[level])
+        temporary = lodFile + "." + str(os.getpid()) + ".tmp"
+        writeSTL(temporary, vertices, triangles)
+        os.replace(temporary, lodFile)
+    return lodFile
+
+
+def makeURDF(urdf, modelDirectory, level, cacheDirectory=None):
+    """
+    Copy of the URDF where the collision geometries of each link are replaced by the LOD of its visual mesh.
+    Mesh paths are written relative to modelDirectory, like the original ones. Returns the path of the copy.
+    """
+    cacheDirectory = cacheDirectory or getCacheDirectory()
+    tree = ET.parse(urdf)
+    for link in tree.getroot().iter("link"):
+        visual = link.find("visual")
+        mesh = None if visual is None else visual.find("geometry/mesh")
+        if mesh is None or os.path.splitext(mesh.get("filename"))[1].lower() not in [".stl", ".obj"]:
+            continue
+        for collision in link.findall("collision"):
+            link.remove(collision)
+
+        lodFile = getLODFile(os.path.join(modelDirectory, mesh.get("filename")), level, cacheDirectory)
+        collision = ET.SubElement(link, "collision")
+        origin = visual.find("origin")
+        if origin is not None:
+            collision.append(origin)
+        geometry = ET.SubElement(collision, "geometry")
+        ET.SubElement(geometry, "mesh", filename=os.path.relpath(lodFile, modelDirectory), scale=mesh.get("scale", "1 1 1"))
+
+    lodURDF = os.path.join(cacheDirectory, "lod", os.path.splitext(os.path.basename(urdf))[0] + "_lod" + str(level) + ".urdf")
+    os.makedirs(os.path.dirname(lodURDF), exist_ok=True)
+    writeAtomic(lodURDF, tree.write) # Shared by the processes building the robot at once
+    return lodURDF
+
+
+def generate(directory, levels=None, cacheDirectory=None):
+    """
+    Offline pipeline, writes all the levels of all the meshes under the directory into the cache.
+    """
+    levels = levels or range(1, len(budgets))
+    for filename in listMeshes(directory):
+        sizes = [len(getMesh(filename, cacheDirectory)[1])]
+        for level in levels:
+            sizes.append(len(getMesh(getLODFile(filename, level, cacheDirectory), cacheDirectory)[1]))
+        print(f"{filename}: " + " / ".join(str(size) for size in sizes) + " triangles")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "generate":
+        generate(sys.argv[2] if len(sys.argv) > 2 else "data/meshes")
+    else:
+        print(__doc__)
@@ -0,0 +1,207 @@
+"""
+Cache of parsed meshes (STL and OBJ): vertices and triangles are stored as .npy files, keyed by the hash
+of the mesh file, and memory-mapped when read, so that the processes share them.
+
+An index maps each mesh path to its size, modification time and hash, so that unchanged files are not
+hashed again. A file that changed gets a new hash, hence a new entry.
+
+The cache serves the Python tools reading the meshes (modules/lod.py, modules/layout.py). The robot meshes are
+loaded by SOFA (URDFModelLoader) from the binary STL files, which the cache would not make faster to load.
+
+Usage, from the repository root:
+    python -m modules.meshcache prewarm data/meshes
+    python -m modules.meshcache clear
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+import numpy as np
+
+defaultCacheDirectory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "meshes")
+indexFileName = "index.json"
+extensions = [".stl", ".obj"]
+
+
+def getCacheDirectory():
+    return os.environ.get("LAAS_MESH_CACHE", defaultCacheDirectory)
+
+
+def resolvePath(filename):
+    """
+    Absolute path of the mesh file, looked up in the SOFA data repository (e.g. mesh/ball.obj) if not found as is.
+    """
+    if os.path.exists(filename):
+        return os.path.abspath(filename)
+    from Sofa.Helper.System import DataRepository
+    return DataRepository.getFile(filename)
+
+
+def readSTL(filename):
+    """
+    Reads a binary or ASCII STL file. Returns the vertices (V, 3) float32 and the triangles (T, 3) int32,
+    with the duplicated vertices merged.
+    """
+    with open(filename, "rb") as file:
+        data = file.read()
+
+    binary = len(data) >= 84 and 84 + 50 * struct.unpack_from("<I", data, 80)[0] == len(data)
+    if binary:
+        nbTriangles = struct.unpack_from("<I", data, 80)[0]
+        records = np.frombuffer(data, dtype=np.dtype([("normal", "<f4", 3), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")]),
+                                count=nbTriangles, offset=84)
+        corners = records["vertices"].reshape(-1, 3)
+    else:
+        lines = data.decode("ascii", errors="ignore").split("\n")
+        corners = np.array([line.split()[1:4] for line in lines if line.strip().startswith("vertex")], dtype=np.float32)
+
+    vertices, triangles = np.unique(corners, axis=0, return_inverse=True)
+    return vertices.astype(np.float32), triangles.reshape(-1, 3).astype(np.int32)
+
+
+def readOBJ(filename):
+    """
+    Reads the vertices and faces of an OBJ file, polygons are triangulated as fans.
+    """
+    vertices = []
+    triangles = []
+    with open(filename) as file:
+        for line in file:
+            if line.startswith("v "):
+                vertices.append(line.split()[1:4])
+            elif line.startswith("f "):
+                face = [int(corner.split("/")[0]) for corner in line.split()[1:]]
+                face = [index - 1 if index > 0 else len(vertices) + index for index in face]
+                for k in range(1, len(face) - 1):
+                    triangles.append([face[0], face[k], face[k + 1]])
+    return np.array(vertices, dtype=np.float32).reshape(-1, 3), np.array(triangles, dtype=np.int32).reshape(-1, 3)
+
+
+def readMesh(filename):
+    """
+    Parses the mesh file, without the cache.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".stl":
+        return readSTL(filename)
+    if extension == ".obj":
+        return readOBJ(filename)
+    raise ValueError("Unsupported mesh format " + filename)
+
+
+def hashFile(filename):
+    sha = hashlib.sha1()
+    with open(filename, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def writeAtomic(filename, write):
+    """
+    Writes through a temporary file, so that concurrent processes never read a partial file.
+    """
+    directory = os.path.dirname(filename)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(descriptor, "wb") as file:
+        write(file)
+    os.replace(temporary, filename)
+
+
+def _readIndex(cacheDirectory):
+    try:
+        with open(os.path.join(cacheDirectory, indexFileName)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def getKey(filename, cacheDirectory=None):
+    """
+    Hash of the mesh file, from the index when the file did not change since it was hashed.
+    """
+    cacheDirectory = cacheDirectory or getCacheDirectory()
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    index = _readIndex(cacheDirectory)
+    entry = index.get(path)
+    if entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+        return entry["hash"]
+
+    key = hashFile(path)
+    index[path] = {"size": stat.st_size, "mtime": stat.st_mtime, "hash": key}
+    os.makedirs(cacheDirectory, exist_ok=True)
+    writeAtomic(os.path.join(cacheDirectory, indexFileName), lambda file: file.write(json.dumps(index, indent=1).encode()))
+    return key
+
+
+def getMesh(filename, cacheDirectory=None):
+    """
+    Vertices and triangles of the mesh, memory-mapped from the cache. The mesh is parsed and cached on the first call.
+    """
+    cacheDirectory = cacheDirectory or getCacheDirectory()
+    filename = resolvePath(filename)
+    key = getKey(filename, cacheDirectory)
+    verticesFile = os.path.join(cacheDirectory, key + ".vertices.npy")
+    trianglesFile = os.path.join(cacheDirectory, key + ".triangles.npy")
+
+    if not (os.path.exists(verticesFile) and os.path.exists(trianglesFile)):
+        vertices, triangles = readMesh(filename)
+        writeAtomic(verticesFile, lambda file: np.save(file, vertices))
+        writeAtomic(trianglesFile, lambda file: np.save(file, triangles))
+
+    return np.load(verticesFile, mmap_mode="r"), np.load(trianglesFile, mmap_mode="r")
+
+
+def writeSTL(filename, vertices, triangles):
+    """
+    Writes a binary STL file.
+    """
+    corners = np.asarray(vertices, dtype=np.float32)[np.asarray(triangles)]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+    records = np.zeros(len(triangles), dtype=np.dtype([("normal", "<f4", 3), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")]))
+    records["normal"] = normals
+    records["vertices"] = corners
+    with open(filename, "wb") as file:
+        file.write(b"LOD".ljust(80, b" "))
+        file.write(np.uint32(len(triangles)).tobytes())
+        file.write(records.tobytes())
+
+
+def listMeshes(directory):
+    meshes = []
+    for root, dirs, files in os.walk(directory):
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in extensions:
+                meshes.append(os.path.join(root, name))
+    return sorted(meshes)
+
+
+def prewarm(directory, cacheDirectory=None):
+    """
+    Parses and caches all the meshes under the directory.
+    """
+    for filename in listMeshes(directory):
+        vertices, triangles = getMesh(filename, cacheDirectory)
+        print(f"{filename}: {len(vertices)} vertices, {len(triangles)} triangles")
+
+
+def clear(cacheDirectory=None):
+    cacheDirectory = cacheDirectory or getCacheDirectory()
+    if not os.path.isdir(cacheDirectory):
+        return
+    for name in os.listdir(cacheDirectory):
+        if name.endswith(".npy") or name == indexFileName:
+            os.remove(os.path.join(cacheDirectory, name))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "prewarm":
+        prewarm(sys.argv[2] if len(sys.argv) > 2 else "data/meshes")
+    elif len(sys.argv) >= 2 and sys.argv[1] == "clear":
+        clear()
+    else:
+        print(__doc__)
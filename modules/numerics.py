@@ -0,0 +1,67 @@
+"""
+Vectorized helpers on SOFA rigid frames. Quaternions follow the SOFA convention [x, y, z, w].
+"""
+import numpy as np
+
+
+def rotate(q, v):
+    """
+    Rotates the vectors v by the quaternions q. Both are broadcast against each other,
+    q with shape (..., 4) and v with shape (..., 3).
+    """
+    q = np.asarray(q, dtype=float)
+    v = np.asarray(v, dtype=float)
+    u = q[..., :3]
+    w = q[..., 3:4]
+    t = 2. * np.cross(u, v)
+    return v + w * t + np.cross(u, t)
+
+
+def transform(frames, v):
+    """
+    Maps the local points v to world coordinates with the Rigid3 frames [x, y, z, qx, qy, qz, qw].
+    """
+    frames = np.asarray(frames, dtype=float)
+    return frames[..., :3] + rotate(frames[..., 3:7], v)
+
+
+def zAxis(q, out=None):
+    """
+    Third column of the rotation matrices of the quaternions q, i.e. the local z axis in world coordinates.
+    Writes into out, of shape (..., 3), when given.
+    """
+    q = np.asarray(q, dtype=float)
+    if out is None:
+        out = np.empty(q.shape[:-1] + (3,))
+    x, y, z, w = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    out[..., 0] = 2. * (x * z + w * y)
+    out[..., 1] = 2. * (y * z - w * x)
+    out[..., 2] = 1. - 2. * (x * x + y * y)
+    return out
+
+
+def quatFromZ(n):
+    """
+    Quaternions of the smallest rotations taking the z axis to the unit vectors n, of shape (..., 3).
+    """
+    n = np.asarray(n, dtype=float)
+    q = np.zeros(n.shape[:-1] + (4,))
+    q[..., 0] = -n[..., 1]
+    q[..., 1] = n[..., 0]
+    q[..., 3] = 1. + n[..., 2]
+    opposite = q[..., 3] < 1e-9 # n = -z, half turn around x
+    q[opposite] = [1., 0., 0., 0.]
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def quatFromRPY(rpy):
+    """
+    Quaternions of the URDF roll, pitch, yaw angles (rotations around the fixed x, y then z axes).
+    """
+    rpy = np.asarray(rpy, dtype=float)
+    cr, cp, cy = np.cos(rpy[..., 0] / 2), np.cos(rpy[..., 1] / 2), np.cos(rpy[..., 2] / 2)
+    sr, sp, sy = np.sin(rpy[..., 0] / 2), np.sin(rpy[..., 1] / 2), np.sin(rpy[..., 2] / 2)
+    return np.stack([sr * cp * cy - cr * sp * sy,
+                     cr * sp * cy + sr * cp * sy,
+                     cr * cp * sy - sr * sp * cy,
+                     cr * cp * cy + sr * sp * sy], axis=-1)
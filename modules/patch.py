@@ -1,10 +1,21 @@
 import Sofa 
 from .cell import Cell
+from .plugins import requireComponents
+from .numerics import rotate
 import numpy as np
-from math import sqrt, pi, cos, sin
-from splib3.numerics import Quat, Vec3
+from math import sqrt
+from itertools import count
 
 class Patch(Sofa.Prefab):
+    """
+        Grid of cells attached to a rigid frame. The cells of all the patches share the skin collision group,
+        and each patch has its own collision group, see excludeCollisionWith. The collision models mapped on the
+        attach frame (e.g. those of the robot link) do not collide with the patch.
+        Instead of the grid, the cells can be placed at the given frames, in the frame of the attach index
+        (e.g. from modules/layout.py), the patch is then a 1 x n grid.
+        stiffness, damping and lateralStiffness are those of the cells, see Cell (by default its class attributes).
+    """
+    collisionGroupCounter = count(100)
 
     def __init__(self,
                  name: str,
@@ -12,7 +23,15 @@ class Patch(Sofa.Prefab):
                  attachNode: Sofa.Core.Node,
                  attachIndex: int=0,
                  cellGrid: tuple[int]=[1, 1],
-                 origin: list[float]=[0, 0, 0, 0, 0, 0, 1]):
+                 origin: list[float]=[0, 0, 0, 0, 0, 0, 1],
+                 sharedRestShape: bool=True,
+                 withVisual: bool=True,
+                 withCollisionGroups: bool=True,
+                 model: str="tetra",
+                 frames: list[list[float]]=None,
+                 stiffness: float=None,
+                 damping: float=None,
+                 lateralStiffness: float=None):
         
         Sofa.Prefab.__init__(self)
 
@@ -20,57 +39,93 @@ class Patch(Sofa.Prefab):
         self.simulationNode = simulationNode
         self.attachNode = attachNode
         self.attachIndex = attachIndex
-        self.cellGrid = cellGrid
+        self.frames = None if frames is None else np.asarray(frames, dtype=float).reshape(-1, 7)
+        self.cellGrid = cellGrid if frames is None else [1, len(self.frames)]
         self.origin = origin
+        self.sharedRestShape = sharedRestShape
+        self.withVisual = withVisual
+        self.withCollisionGroups = withCollisionGroups
+        self.model = model
+        self.stiffness = stiffness
+        self.damping = damping
+        self.lateralStiffness = lateralStiffness
+        self.collisionGroup = next(Patch.collisionGroupCounter)
 
         self.attachNode.addChild(self)
 
         self.__addMechanical()
         self.__addCells()
+        if withCollisionGroups:
+            self.excludeCollisionWith(self.getAttachCollisionModels())
 
     def __addMechanical(self):
-        positions = []
-        stepx = Cell.sideSize * 3
-        stepy = Cell.sideSize * sqrt(3)/2
-        for i in range(self.cellGrid[0]):
-            for j in range(self.cellGrid[1]):
-                x = stepx * i + 1.5 * Cell.sideSize * (j % 2) 
-                y = stepy * j
-                z = 0
-                q = Quat(self.origin[3:7])
-                v = Vec3([x, y, z])
-                v = v.rotateFromQuat(q)
-                for k in range(3):
-                    v[k] += self.origin[k]
-                positions.append(list(v)+list(q))
-
-        self.addObject("MechanicalObject", template="Rigid3", position=positions,
+        if self.frames is None:
+            # Hexagonal grid, rotated and translated by the origin
+            i, j = np.meshgrid(np.arange(self.cellGrid[0]), np.arange(self.cellGrid[1]), indexing="ij")
+            local = np.zeros((i.size, 3))
+            local[:, 0] = Cell.sideSize * 3 * i.ravel() + 1.5 * Cell.sideSize * (j.ravel() % 2)
+            local[:, 1] = Cell.sideSize * sqrt(3)/2 * j.ravel()
+            q = np.asarray(self.origin[3:7], dtype=float)
+            positions = np.hstack([np.asarray(self.origin[:3], dtype=float) + rotate(q, local), np.tile(q, (i.size, 1))])
+        else:
+            positions = self.frames
+
+        requireComponents(self, ["MechanicalObject", "RigidMapping"])
+        self.addObject("MechanicalObject", template="Rigid3", position=positions.tolist(),
                        showObject=False, showObjectScale=0.01, drawMode=2)
-        self.addObject("RigidMapping", index=self.attachIndex, globalToLocalCoords=True)
+        self.addObject("RigidMapping", index=self.attachIndex, globalToLocalCoords=self.frames is None)
 
     def __addCells(self):
-        cell = None
-        for i in range(self.cellGrid[0]):
-            for j in range(self.cellGrid[1]):
-                index = i*self.cellGrid[1] + j
-                if cell is None:
-                    cell = Cell(name=self.name.value + "Cells",
-                                simulationNode=self.simulationNode,
-                                attachNode=self,
-                                attachIndex=index,
-                                )
-                else:
-                    Cell(simulationNode=self.simulationNode,
-                         attachNode=self,
-                         attachIndex=index,
-                         addToCell=cell)
+        nbCells = self.cellGrid[0] * self.cellGrid[1]
+        self.cells = Cell(name=self.name.value + "Cells",
+                          simulationNode=self.simulationNode,
+                          attachNode=self,
+                          attachIndex=list(range(nbCells)),
+                          sharedRestShape=self.sharedRestShape,
+                          withVisual=self.withVisual,
+                          collisionGroups=[Cell.skinCollisionGroup, self.collisionGroup] if self.withCollisionGroups else [],
+                          model=self.model,
+                          stiffness=self.stiffness,
+                          damping=self.damping,
+                          lateralStiffness=self.lateralStiffness
+                          )
+
+    def getAttachCollisionModels(self):
+        """
+        Collision models under the attach node mapped on the attach frame, e.g. those created by URDFModelLoader for
+        the link, the patches excluded.
+        """
+        models = []
+
+        def walk(node, mapped):
+            mapping = node.getMechanicalMapping() if node is not self.attachNode else None
+            if mapping is not None and mapping.getClassName() == "RigidMapping":
+                mapped = mapping.index.value == self.attachIndex and not len(mapping.rigidIndexPerPoint.value)
+            if mapped:
+                models.extend(obj for obj in node.objects if obj.getClassName().endswith("CollisionModel"))
+            for child in node.children:
+                if not isinstance(child, Patch):
+                    walk(child, mapped)
+
+        walk(self.attachNode, False)
+        return models
+
+    def excludeCollisionWith(self, collisionModels):
+        """
+        Excludes the collisions between the patch and the given collision models, e.g. those of the link it is attached to.
+        """
+        for model in collisionModels:
+            model.group.value = list(model.group.value) + [self.collisionGroup]
                     
 
 def createScene(rootnode):
 
+    from math import pi, cos, sin
     from modules.header import addHeader, addSolvers
+    from modules.plugins import requireComponents
 
     settings, modelling, simulation = addHeader(rootnode, inverse=False, withCollision=False, friction=0)
+    requireComponents(rootnode, ["MechanicalObject", "FixedProjectiveConstraint"])
 
     addSolvers(simulation, rayleighStiffness=0.001)
     rootnode.VisualStyle.displayFlags = ["showVisual"]
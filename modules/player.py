@@ -0,0 +1,82 @@
+import Sofa
+import numpy as np
+
+
+class TrajectoryPlayer(Sofa.Core.Controller):
+    """
+        Plays trajectories back to back into the joint targets of a TalosHumanoidRobot (created with a configuration).
+        The trajectories are resampled to dt when queued, so a step only copies one row into the targets.
+        The joints a trajectory does not drive keep their last target. At the end, the last posture is held,
+        or the queue starts over with loop. The samples follow the simulation time, so the playback speed does not
+        depend on the time step when it changes during the simulation (see modules/timestepping.py).
+        The playback position is saved in the checkpoints, the samples are rebuilt from the same queued trajectories.
+    """
+    stateArrays = ["step", "phase", "sampleDt"] # Saved in the checkpoints, see modules/checkpoint.py
+
+    def __init__(self, robot, trajectories=[], interpolation="smooth", loop=False, name="TrajectoryPlayer"):
+        Sofa.Core.Controller.__init__(self, name=name)
+
+        self.robot = robot
+        self.interpolation = interpolation
+        self.loop = loop
+        self.samples = np.zeros((0, len(robot.jointTable.names)))
+        self.segments = [] # (start step, stop step, trajectory name)
+        self.step = 0
+        self.sampleDt = np.nan # dt of the samples, the dt of the scene when the first trajectory is resampled
+        self.phase = 0. # Fraction of sample covered by the steps since the last sample
+        self.__pending = list(trajectories)
+
+    @property
+    def done(self):
+        return not self.__pending and self.step >= len(self.samples)
+
+    def play(self, trajectory):
+        """
+        Queues the trajectory after the ones already queued.
+        """
+        self.__pending.append(trajectory)
+        if self.getContext() is not None:
+            self.__resamplePending()
+
+    def current(self):
+        """
+        Name of the trajectory being played, None when done.
+        """
+        for start, stop, name in self.segments:
+            if start <= self.step < stop:
+                return name
+        return None
+
+    def __resamplePending(self):
+        if np.isnan(self.sampleDt):
+            self.sampleDt = self.getContext().getRoot().dt.value
+        dt = self.sampleDt
+        blocks = [self.samples]
+        last = self.samples[-1] if len(self.samples) else self.robot.jointTargets.position.array()[:, 0]
+        start = len(self.samples)
+        for trajectory in self.__pending:
+            columns = self.robot.jointTable.indices(trajectory.jointNames)
+            resampled = trajectory.resample(dt, self.interpolation)
+            block = np.tile(last, (len(resampled), 1))
+            block[:, columns] = resampled
+            blocks.append(block)
+            self.segments.append((start, start + len(block), trajectory.name))
+            start += len(block)
+            last = block[-1]
+        self.samples = np.concatenate(blocks)
+        self.__pending = []
+
+    def onAnimateBeginEvent(self, event):
+        if self.__pending:
+            self.__resamplePending()
+        if self.step >= len(self.samples):
+            if not self.loop or not len(self.samples):
+                return
+            self.step %= len(self.samples)
+        with self.robot.jointTargets.position.writeableArray() as targets:
+            targets[:, 0] = self.samples[self.step]
+        # Samples covered by this step, one per step when the dt of the scene is the dt of the samples
+        self.phase += self.getContext().getRoot().dt.value / self.sampleDt
+        advance = int(self.phase + 1e-9)
+        self.phase -= advance
+        self.step += advance
@@ -0,0 +1,130 @@
+"""
+Registry of the SOFA plugins used by the scenes. The prefabs and helpers declare the components they create with
+requireComponents, which loads the plugins providing them and adds one RequiredPlugin per plugin to the Settings
+node of the scene, so that a scene loads only the plugins it uses, each once.
+The plugins must be loaded before their components are created, so they are loaded on the first declaration
+rather than at init. report() gives the load time of each plugin and the import time of the Python modules.
+"""
+import importlib
+import time
+
+# Plugin providing each component created by the scenes
+componentPlugins = {
+    # Core
+    "MechanicalObject": "Sofa.Component.StateContainer",
+    "MeshTopology": "Sofa.Component.Topology.Container.Constant",
+    "MeshOBJLoader": "Sofa.Component.IO.Mesh",
+    "MeshSTLLoader": "Sofa.Component.IO.Mesh",
+    "UniformMass": "Sofa.Component.Mass",
+    "RestShapeSpringsForceField": "Sofa.Component.SolidMechanics.Spring",
+    "StiffSpringForceField": "Sofa.Component.SolidMechanics.Spring",
+    "FixedProjectiveConstraint": "Sofa.Component.Constraint.Projective",
+    "AttachProjectiveConstraint": "Sofa.Component.Constraint.Projective",
+    "ConstantForceField": "Sofa.Component.MechanicalLoad",
+    "IdentityMapping": "Sofa.Component.Mapping.Linear",
+    "SubsetMapping": "Sofa.Component.Mapping.Linear",
+    "SubsetMultiMapping": "Sofa.Component.Mapping.Linear",
+    "RigidMapping": "Sofa.Component.Mapping.NonLinear",
+    "PointCollisionModel": "Sofa.Component.Collision.Geometry",
+    "LineCollisionModel": "Sofa.Component.Collision.Geometry",
+    "TriangleCollisionModel": "Sofa.Component.Collision.Geometry",
+    "CollisionPipeline": "Sofa.Component.Collision.Detection.Algorithm",
+    "BruteForceBroadPhase": "Sofa.Component.Collision.Detection.Algorithm",
+    "DirectSAP": "Sofa.Component.Collision.Detection.Algorithm",
+    "BVHNarrowPhase": "Sofa.Component.Collision.Detection.Algorithm",
+    "LocalMinDistance": "Sofa.Component.Collision.Detection.Intersection",
+    "MinProximityIntersection": "Sofa.Component.Collision.Detection.Intersection",
+    "RuleBasedContactManager": "Sofa.Component.Collision.Response.Contact",
+    "FreeMotionAnimationLoop": "Sofa.Component.AnimationLoop",
+    "DefaultAnimationLoop": "Sofa.Component.AnimationLoop",
+    "GenericConstraintSolver": "Sofa.Component.Constraint.Lagrangian.Solver",
+    "GenericConstraintCorrection": "Sofa.Component.Constraint.Lagrangian.Correction",
+    "EulerImplicitSolver": "Sofa.Component.ODESolver.Backward",
+    "SparseLDLSolver": "Sofa.Component.LinearSolver.Direct",
+    "CGLinearSolver": "Sofa.Component.LinearSolver.Iterative",
+    "DefaultVisualManagerLoop": "Sofa.Component.Visual",
+    "VisualStyle": "Sofa.Component.Visual",
+    "OglModel": "Sofa.GL.Component.Rendering3D",
+    # External plugins
+    "ParallelBruteForceBroadPhase": "MultiThreading",
+    "ParallelBVHNarrowPhase": "MultiThreading",
+    "AsyncSparseLDLSolver": "MultiThreading",
+    "ParallelCGLinearSolver": "MultiThreading",
+    "CudaSparseLDLSolver": "SofaCUDASolvers",
+    "TriangularBendingFEMForceField": "Shell",
+    "URDFModelLoader": "Sofa.RigidBodyDynamics",
+    "JointConstraint": "SoftRobots",
+    "QPInverseProblemSolver": "SoftRobots.Inverse",
+}
+
+# Plugin loading is global to the process: plugin -> {"load": seconds of the first load, "components": [...]}
+plugins = {}
+# Python module -> seconds of the first import
+modules = {}
+
+
+def getSettings(node):
+    """
+    Settings node of the scene of the node, created if needed.
+    """
+    root = node.getRoot()
+    settings = root.getChild("Settings")
+    if settings is None:
+        settings = root.addChild("Settings")
+    return settings
+
+
+def requirePlugins(node, names, component=None):
+    """
+    Loads the plugins, if not loaded yet, and declares them in the Settings node of the scene.
+    """
+    settings = getSettings(node)
+    for plugin in names:
+        if settings.getObject(plugin) is None:
+            start = time.perf_counter()
+            settings.addObject("RequiredPlugin", name=plugin)
+            if plugin not in plugins:
+                plugins[plugin] = {"load": time.perf_counter() - start, "components": []}
+        entry = plugins.setdefault(plugin, {"load": 0., "components": []})
+        if component is not None and component not in entry["components"]:
+            entry["components"].append(component)
+
+
+def requireComponents(node, components):
+    """
+    Declares the components created under the node, and loads their plugins.
+    """
+    for component in components:
+        if component not in componentPlugins:
+            raise ValueError("Unknown plugin of the component " + component + ", add it to componentPlugins")
+        requirePlugins(node, [componentPlugins[component]], component)
+
+
+def importModule(name):
+    """
+    importlib.import_module, timed on the first import.
+    """
+    if name in modules:
+        return importlib.import_module(name)
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    modules[name] = time.perf_counter() - start
+    return module
+
+
+def report():
+    """
+    Load time of the plugins and import time of the Python modules, in seconds, slowest first.
+    """
+    return {"plugins": {plugin: plugins[plugin] for plugin in sorted(plugins, key=lambda p: -plugins[p]["load"])},
+            "modules": {name: modules[name] for name in sorted(modules, key=lambda m: -modules[m])},
+            "total": sum(entry["load"] for entry in plugins.values()) + sum(modules.values())}
+
+
+def printReport():
+    summary = report()
+    for plugin, entry in summary["plugins"].items():
+        print(f"{plugin:<50} {entry['load']*1e3:>9.1f} ms  {', '.join(entry['components'])}")
+    for name, seconds in summary["modules"].items():
+        print(f"{name + ' (import)':<50} {seconds*1e3:>9.1f} ms")
+    print(f"{'total':<50} {summary['total']*1e3:>9.1f} ms")
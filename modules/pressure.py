@@ -0,0 +1,94 @@
+import Sofa
+import numpy as np
+from math import sqrt
+from .cell import Cell
+from .readout import columns
+
+cellArea = 3 * sqrt(3) / 2 * Cell.sideSize ** 2 # Hexagon of circumradius sideSize
+
+
+class PressureImages(Sofa.Core.Controller):
+    """
+        Per-patch pressure images and contact summaries, computed from a SkinReadout after each step.
+        The images of the grid patches are stacked in one (nbGridPatches, rows, columns) array, padded with zeros.
+        The patches laid out with frames (Patch(frames=...)) have no grid, hence no image, only the summaries.
+        A patch grid follows the hex offset of Patch: cell (i, j) is at x = 3 * i + 1.5 * (j % 2), y = sqrt(3)/2 * j
+        in cell sizes. So in doubled coordinates, it is the pixel (row j, column 2 * i + j % 2), and mask gives the
+        pixels holding a cell. The summaries are, per patch, the total spring force, the total normal force, the
+        pressure-weighted contact centroid (NaN without contact) and the contact area.
+        All the arrays are preallocated and updated in place. Must be added after the SkinReadout.
+    """
+
+    def __init__(self, readout, contactThreshold=1e-4, name="PressureImages"):
+        Sofa.Core.Controller.__init__(self, name=name)
+
+        self.readout = readout
+        self.contactThreshold = contactThreshold
+        nbPatches = len(readout.patches)
+        # Patches with an image, and their position in the stacked images
+        self.gridPatches = [p for p, patch in enumerate(readout.patches) if patch.frames is None]
+        imageIndex = np.full(nbPatches, -1)
+        imageIndex[self.gridPatches] = np.arange(len(self.gridPatches))
+        rows = max([readout.patches[p].cellGrid[1] for p in self.gridPatches], default=0)
+        cols = max([2 * readout.patches[p].cellGrid[0] for p in self.gridPatches], default=0)
+
+        self.images = np.zeros((len(self.gridPatches), rows, cols))
+        self.mask = np.zeros((len(self.gridPatches), rows, cols), dtype=bool)
+        index = readout.cellIndex
+        self.__imageCells = np.flatnonzero(imageIndex[index["patch"]] >= 0)
+        index = index[self.__imageCells]
+        self.__pixels = np.ravel_multi_index((imageIndex[index["patch"]], index["j"], 2 * index["i"] + index["j"] % 2), self.images.shape)
+        self.mask.reshape(-1)[self.__pixels] = True
+
+        self.totalForce = np.zeros((nbPatches, 3))
+        self.normalForce = np.zeros(nbPatches)
+        self.centroid = np.zeros((nbPatches, 3))
+        self.area = np.zeros(nbPatches)
+
+        n = readout.nbCells
+        self.pressure = np.zeros(n)
+        self.positions = np.zeros((n, 3))
+        self.__starts = np.array([s.start for s in readout.patchSlices])
+        self.__contact = np.zeros(n, dtype=bool)
+        self.__weighted = np.zeros((n, 3))
+        self.__weights = np.zeros(nbPatches)
+
+    def update(self):
+        frame = self.readout.frame
+        for patch, s in zip(self.readout.patches, self.readout.patchSlices):
+            self.positions[s] = patch.cells.deformable.getMechanicalState().position.array()
+
+        # Pressure of the cells pushed in, normal force over the cell area
+        np.maximum(frame[:, columns["depth"]], 0., out=self.pressure)
+        self.pressure *= self.readout.stiffness
+        self.pressure /= cellArea
+        self.images.reshape(-1)[self.__pixels] = self.pressure[self.__imageCells]
+
+        np.add.reduceat(frame[:, columns["force"]], self.__starts, axis=0, out=self.totalForce)
+        np.add.reduceat(self.pressure, self.__starts, out=self.normalForce)
+        self.normalForce *= cellArea
+
+        np.greater(frame[:, columns["depth"]], self.contactThreshold, out=self.__contact)
+        np.add.reduceat(self.__contact, self.__starts, out=self.area, dtype=float)
+        self.area *= cellArea
+
+        np.multiply(self.positions, self.pressure[:, None], out=self.__weighted)
+        np.add.reduceat(self.__weighted, self.__starts, axis=0, out=self.centroid)
+        np.add.reduceat(self.pressure, self.__starts, out=self.__weights)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.centroid /= self.__weights[:, None]
+        self.centroid[self.__weights == 0] = np.nan
+
+    def getImage(self, name):
+        """
+        View on the image of the given grid patch, cropped to its grid.
+        """
+        p = self.readout.patchNames.index(name)
+        if p not in self.gridPatches:
+            raise ValueError("The patch " + name + " is laid out with frames, it has no image")
+        cellGrid = self.readout.patches[p].cellGrid
+        return self.images[self.gridPatches.index(p), :cellGrid[1], :2 * cellGrid[0]]
+
+    def onAnimateEndEvent(self, event):
+        if self.readout.nbOutputs:
+            self.update()
@@ -0,0 +1,139 @@
+import Sofa
+import Sofa.Timer
+import numpy as np
+import json
+import time
+from .runner import getConstraintSolverStats
+
+# Phases of a step, matched in order on the labels of the SOFA timer records
+phases = {"collision": ["Collision", "BroadPhase", "NarrowPhase", "Intersection", "ContactManager"],
+          "constraintSolver": ["ConstraintSolver", "ConstraintCorrection", "solveSystem", "Build Constraint"],
+          "odeSolver": ["FreeMotion", "Solve", "ODE", "Mechanical", "Integrate"],
+          "mappings": ["Mapping", "PropagateOnlyPositionAndVelocity", "UpdateMapping"],
+          "controllers": ["AnimateBeginEvent", "AnimateEndEvent", "Controller"]}
+timerName = "Animate"
+
+
+class StepProfiler(Sofa.Core.Controller):
+    """
+        Opt-in profiling of the steps, installed by addHeader(profiling=True).
+        Records per step the wall time of each phase, the number of constraints and the constraint solver iterations,
+        with rolling statistics over the last window steps. The timelines of the steps in [traceStart, traceStop)
+        are kept and can be dumped as Chrome trace / Perfetto JSON.
+        The SOFA timer records are read at the beginning of the next step, so the last step is not profiled.
+        The SOFA timer is global to the process: close() gives it back in the state it had before the profiler.
+    """
+
+    def __init__(self, window=1000, traceStart=0, traceStop=0, name="StepProfiler"):
+        Sofa.Core.Controller.__init__(self, name=name)
+
+        self.window = window
+        self.traceStart = traceStart
+        self.traceStop = traceStop
+        self.phaseNames = list(phases) + ["other"]
+
+        self.times = np.zeros((window, len(self.phaseNames) + 1)) # Phases then the whole step
+        self.constraints = np.zeros(window, dtype=int)
+        self.iterations = np.zeros(window, dtype=int)
+        self.nbSteps = 0
+        self.traceEvents = []
+
+        self.__stepStart = None
+        self.__stepWall = 0.
+        self.__timerWasEnabled = Sofa.Timer.isEnabled(timerName)
+        self.closed = False
+        Sofa.Timer.setEnabled(timerName, True)
+        Sofa.Timer.setInterval(timerName, 1)
+        Sofa.Timer.setOutputType(timerName, "json")
+
+    @staticmethod
+    def classify(label):
+        for phase, patterns in phases.items():
+            if any(pattern in label for pattern in patterns):
+                return phase
+        return None
+
+    def __walk(self, records, start, depth, durations, events):
+        """
+        Adds the records to the phase durations (ms) and the trace events. Returns the end time of the records.
+        Unclassified records are split into their children, and what is left is counted as other.
+        """
+        for label, record in records.items():
+            if not isinstance(record, dict):
+                continue
+            total = float(record.get("total_time", 0.))
+            begin = float(record.get("start_time", start))
+            phase = self.classify(label)
+            children = {key: value for key, value in record.items() if isinstance(value, dict)}
+            if phase is None and children:
+                childrenTime = self.__walk(children, begin, depth + 1, durations, events) - begin
+                durations["other"] += max(total - childrenTime, 0.)
+            else:
+                durations[phase or "other"] += total
+            events.append((label, begin, total, depth))
+            start = begin + total
+        return start
+
+    def __recordStep(self):
+        durations = dict.fromkeys(self.phaseNames, 0.)
+        events = []
+        self.__walk(Sofa.Timer.getRecords(timerName), 0., 0, durations, events)
+
+        k = self.nbSteps % self.window
+        self.times[k, :-1] = [durations[phase] for phase in self.phaseNames]
+        self.times[k, -1] = self.__stepWall * 1e3
+        stats = getConstraintSolverStats(self.getContext().getRoot())
+        if stats is not None:
+            self.iterations[k] = stats["iterations"]
+            self.constraints[k] = stats["constraints"]
+
+        if self.traceStart <= self.nbSteps < self.traceStop:
+            offset = self.__stepStart * 1e6
+            origin = min((begin for label, begin, total, depth in events), default=0.) # Timer records are in ms
+            self.traceEvents.append({"name": "step " + str(self.nbSteps), "ph": "X", "pid": 0, "tid": 0,
+                                     "ts": offset, "dur": self.__stepWall * 1e6,
+                                     "args": {"constraints": int(self.constraints[k]), "iterations": int(self.iterations[k])}})
+            for label, begin, total, depth in events:
+                self.traceEvents.append({"name": label, "cat": self.classify(label) or "other", "ph": "X", "pid": 0, "tid": 0,
+                                         "ts": offset + (begin - origin) * 1e3, "dur": total * 1e3})
+        self.nbSteps += 1
+
+    def statistics(self):
+        """
+        Rolling statistics of the last steps, times in ms.
+        """
+        n = min(self.nbSteps, self.window)
+        statistics = {}
+        for i, phase in enumerate(self.phaseNames + ["step"]):
+            values = self.times[:n, i]
+            statistics[phase] = {"mean": float(np.mean(values)) if n else 0.,
+                                 "p50": float(np.percentile(values, 50)) if n else 0.,
+                                 "p95": float(np.percentile(values, 95)) if n else 0.,
+                                 "max": float(np.max(values)) if n else 0.}
+        statistics["constraints"] = float(np.mean(self.constraints[:n])) if n else 0.
+        statistics["iterations"] = float(np.mean(self.iterations[:n])) if n else 0.
+        return statistics
+
+    def dumpTrace(self, filename):
+        """
+        Writes the recorded steps as Chrome trace / Perfetto JSON (open in chrome://tracing or ui.perfetto.dev).
+        """
+        with open(filename, "w") as file:
+            json.dump({"traceEvents": self.traceEvents, "displayTimeUnit": "ms"}, file)
+
+    def close(self):
+        """
+        Stops the profiling and restores the enabled state of the SOFA timer. The statistics and the trace are kept.
+        """
+        if not self.closed:
+            Sofa.Timer.setEnabled(timerName, self.__timerWasEnabled)
+            self.closed = True
+
+    def onAnimateBeginEvent(self, event):
+        if self.closed:
+            return
+        now = time.perf_counter()
+        if self.__stepStart is not None:
+            self.__stepWall = now - self.__stepStart
+            self.__recordStep()
+        self.__stepStart = now
@@ -0,0 +1,33 @@
+import Sofa
+import atexit
+import numpy as np
+from .readout import nbColumns
+from .sharedmemory import SharedFramesWriter
+
+
+class SkinPublisher(Sofa.Core.Controller):
+    """
+        Publishes the frame of a SkinReadout after each step into a ring of frames in shared memory, for other
+        processes on the same machine, see SharedFramesReader in modules/sharedmemory.py.
+        source is the object whose frame is published, the readout by default, or e.g. a SensorEmulator.
+        Must be added after the SkinReadout (and the source).
+    """
+
+    def __init__(self, readout, memoryName="laas_skin", nbSlots=8, dtype=np.float32, source=None, name="SkinPublisher"):
+        Sofa.Core.Controller.__init__(self, name=name)
+
+        self.readout = readout
+        self.source = readout if source is None else source
+        self.writer = SharedFramesWriter(memoryName, readout.getLayout(), nbColumns, nbSlots=nbSlots, dtype=dtype)
+        self.memoryName = self.writer.memoryName
+        atexit.register(self.close)
+
+    def close(self):
+        """
+        Removes the shared memory, the readers see the writer closed.
+        """
+        self.writer.close()
+
+    def onAnimateEndEvent(self, event):
+        if not self.writer.closed and self.readout.nbOutputs:
+            self.writer.write(self.readout.time, self.source.frame)
@@ -0,0 +1,131 @@
+import Sofa
+import numpy as np
+from .numerics import zAxis
+
+# Columns of a readout frame
+columns = {"indentation": slice(0, 3), # Rest position minus current position of the top center, world coordinates
+           "depth": 3,                 # Indentation along the cell normal
+           "force": slice(4, 7)}       # Spring force on the top center, world coordinates, see Cell stiffness and lateralStiffness
+nbColumns = 7
+
+cellIndexType = np.dtype([("patch", np.int32),
+                          ("i", np.int32), ("j", np.int32),
+                          ("deformableIndex", np.int32),
+                          ("restIndex", np.int32)])
+
+
+class SkinReadout(Sofa.Core.Controller):
+    """
+        Reads all the cells of the given patches at the end of each step, into one (nbCells, 7) array.
+        The cells of a patch are contiguous in the frame, ordered as in its cellGrid.
+        nbOutputs is the number of output times reached by the step, one per step unless an AdaptiveTimeStep
+        sets it (see modules/timestepping.py): the controllers using the frame only process the output steps.
+    """
+    stateArrays = ["frame", "time"] # Saved in the checkpoints, see modules/checkpoint.py
+
+    def __init__(self, patches, name="SkinReadout"):
+        Sofa.Core.Controller.__init__(self, name=name)
+
+        self.patches = patches
+        self.patchNames = [patch.name.value for patch in patches]
+        self.__buildIndex()
+
+        self.frame = np.zeros((self.nbCells, nbColumns))
+        self.time = 0.
+        self.nbOutputs = 1
+        self.outputPeriod = None # Time between two outputs, set with nbOutputs
+        self.__normals = np.zeros((self.nbCells, 3))
+        self.__rest = np.zeros((self.nbCells, 3))
+
+    def __buildIndex(self):
+        """
+        Map from the global cell id to (patch, grid i, j, deformable index, rest index).
+        """
+        indices = []
+        self.patchSlices = []
+        start = 0
+        for p, patch in enumerate(self.patches):
+            cells = patch.cells
+            n = cells.nbCells
+            index = np.zeros(n, dtype=cellIndexType)
+            index["patch"] = p
+            index["i"] = cells.attachIndices // patch.cellGrid[1]
+            index["j"] = cells.attachIndices % patch.cellGrid[1]
+            index["deformableIndex"] = np.arange(n)
+            index["restIndex"] = np.arange(n) if cells.sharedRestShape else 0
+            indices.append(index)
+            self.patchSlices.append(slice(start, start + n))
+            start += n
+
+        self.cellIndex = np.concatenate(indices)
+        self.nbCells = start
+        # Stiffness along the normal and along the tangents of the cells, the same for the tetra model
+        self.stiffness = np.concatenate([np.full(patch.cells.nbCells, patch.cells.stiffness) for patch in self.patches])
+        self.lateralStiffness = np.concatenate([np.full(patch.cells.nbCells, patch.cells.lateralStiffness if patch.cells.model == "point"
+                                                        else patch.cells.stiffness) for patch in self.patches])
+        self.__normalForce = np.zeros(self.nbCells)
+
+    def update(self):
+        """
+        Computes the frame from the current states.
+        """
+        frame = self.frame
+        for patch, s in zip(self.patches, self.patchSlices):
+            cells = patch.cells
+            # Read-only views on the Data, no copy
+            deformable = cells.deformable.getMechanicalState().position.array()
+            frames = patch.getMechanicalState().position.array()
+            if cells.sharedRestShape:
+                rest = cells.restPositions[0].getMechanicalState().position.array()
+            else:
+                rest = self.__rest[s]
+                for k, node in enumerate(cells.restPositions):
+                    rest[k] = node.getMechanicalState().position.array()[0]
+
+            zAxis(frames[cells.attachIndices, 3:7], out=self.__normals[s])
+            np.subtract(rest, deformable, out=frame[s, columns["indentation"]])
+
+        indentation = frame[:, columns["indentation"]]
+        np.einsum("ij,ij->i", indentation, self.__normals, out=frame[:, columns["depth"]])
+        # Tangential stiffness on the whole indentation, corrected along the normal
+        force = frame[:, columns["force"]]
+        np.multiply(indentation, self.lateralStiffness[:, None], out=force)
+        np.subtract(self.stiffness, self.lateralStiffness, out=self.__normalForce)
+        self.__normalForce *= frame[:, columns["depth"]]
+        force += self.__normalForce[:, None] * self.__normals
+        return frame
+
+    def getPositions(self, cells):
+        """
+        Current positions of the top centers of the given cells (global ids), in world coordinates.
+        """
+        cells = np.asarray(cells, dtype=int)
+        positions = np.zeros((len(cells), 3))
+        patches = self.cellIndex["patch"][cells]
+        for p in np.unique(patches):
+            selected = patches == p
+            deformable = self.patches[p].cells.deformable.getMechanicalState().position.array()
+            positions[selected] = deformable[self.cellIndex["deformableIndex"][cells[selected]]]
+        return positions
+
+    def getLayout(self):
+        """
+        Layout of the frame, as JSON-serializable lists: patch names, cellGrids, cell slices of the patches,
+        cell index (see cellIndexType), columns and number of cells.
+        """
+        return {"patchNames": self.patchNames,
+                "cellGrids": [list(patch.cellGrid) for patch in self.patches],
+                "patchSlices": [[s.start, s.stop] for s in self.patchSlices],
+                "cellIndex": {field: self.cellIndex[field].tolist() for field in self.cellIndex.dtype.names},
+                "columns": {key: [c.start, c.stop] if isinstance(c, slice) else c for key, c in columns.items()},
+                "nbCells": self.nbCells}
+
+    def getPatchFrame(self, name):
+        """
+        View on the frame rows of the given patch.
+        """
+        return self.frame[self.patchSlices[self.patchNames.index(name)]]
+
+    def onAnimateEndEvent(self, event):
+        self.time = self.getContext().getRoot().time.value
+        self.update()
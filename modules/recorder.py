@@ -0,0 +1,197 @@
+import Sofa
+import numpy as np
+import os
+import json
+import queue
+import threading
+import atexit
+from .readout import nbColumns
+
+# On-disk layout of a recording directory:
+#   meta.json             cell layout, patch names, cellGrid, dt, columns, chunk size and number of frames
+#   frames_<chunk>.npy    (chunkSize, nbCells, nbColumns) frames, the last chunk may be shorter
+#   time_<chunk>.npy      (chunkSize,) simulation times of the frames
+metaFileName = "meta.json"
+framesFileName = "frames_{:06d}.npy"
+timeFileName = "time_{:06d}.npy"
+
+
+class SkinRecorder(Sofa.Core.Controller):
+    """
+        Records the frames of a SkinReadout into a ring of preallocated chunks.
+        Full chunks are written to disk by a background thread, as .npy files that can be memory-mapped.
+        An error of the writer (e.g. disk full) is raised by the next record or by close.
+        Must be added after the SkinReadout, so that the frame is up to date when recorded.
+    """
+
+    def __init__(self, readout, directory, chunkSize=1000, nbChunks=4, dtype=np.float32, name="SkinRecorder"):
+        Sofa.Core.Controller.__init__(self, name=name)
+
+        self.readout = readout
+        self.directory = directory
+        self.chunkSize = chunkSize
+        self.nbChunks = nbChunks
+        self.dtype = np.dtype(dtype)
+
+        self.frames = np.zeros((nbChunks, chunkSize, readout.nbCells, nbColumns), dtype=self.dtype)
+        self.times = np.zeros((nbChunks, chunkSize))
+        self.nbFrames = 0
+        self.nbChunksQueued = 0
+        self.nbWrittenFrames = 0
+        self.nbWrittenChunks = 0
+        self.closed = False
+
+        # Slots of the ring are released by the writer thread once written
+        self.__freeSlots = threading.Semaphore(nbChunks)
+        self.__freeSlots.acquire()
+        self.__slot = 0
+        self.__index = 0
+        self.__queue = queue.Queue()
+        self.__error = None # First exception of the writer thread
+
+        self.meta = dict(readout.getLayout(),
+                         dt=readout.getContext().getRoot().dt.value,
+                         dtype=self.dtype.str,
+                         chunkSize=chunkSize)
+
+        os.makedirs(directory, exist_ok=True)
+        self.__writeMeta()
+        self.__writer = threading.Thread(target=self.__write, daemon=True)
+        self.__writer.start()
+        atexit.register(self.close)
+
+    def __writeMeta(self):
+        self.meta["nbFrames"] = self.nbWrittenFrames
+        self.meta["nbChunks"] = self.nbWrittenChunks
+        with open(os.path.join(self.directory, metaFileName), "w") as file:
+            json.dump(self.meta, file)
+
+    def __write(self):
+        """
+        Writer thread, flushes the chunks of the ring to disk.
+        """
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                break
+            slot, chunk, size = item
+            try:
+                if self.__error is None: # The chunks after an error are dropped
+                    self.__writeChunk(slot, chunk, size)
+            except Exception as error:
+                self.__error = error
+            finally:
+                self.__freeSlots.release() # Else the simulation would wait for the slot forever
+
+    def __writeChunk(self, slot, chunk, size):
+        frames = np.lib.format.open_memmap(os.path.join(self.directory, framesFileName.format(chunk)), mode="w+",
+                                           dtype=self.dtype, shape=(size,) + self.frames.shape[2:])
+        frames[:] = self.frames[slot, :size]
+        frames.flush()
+        del frames
+        np.save(os.path.join(self.directory, timeFileName.format(chunk)), self.times[slot, :size])
+        self.nbWrittenFrames += size
+        self.nbWrittenChunks += 1
+        self.__writeMeta() # The recording stays readable if the process dies
+
+    def __raiseWriterError(self):
+        if self.__error is not None:
+            raise self.__error
+
+    def __flushChunk(self):
+        self.__queue.put((self.__slot, self.nbChunksQueued, self.__index))
+        self.nbChunksQueued += 1
+        self.__slot = (self.__slot + 1) % self.nbChunks
+        self.__index = 0
+        self.__freeSlots.acquire() # Waits for the writer if the ring is full
+
+    def record(self, time, frame):
+        self.__raiseWriterError()
+        self.frames[self.__slot, self.__index] = frame
+        self.times[self.__slot, self.__index] = time
+        self.__index += 1
+        self.nbFrames += 1
+        if self.__index == self.chunkSize:
+            self.__flushChunk()
+
+    def close(self):
+        """
+        Flushes the last partial chunk and waits for the writer thread.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self.__index > 0:
+            self.__flushChunk()
+        self.__queue.put(None)
+        self.__writer.join()
+        self.__raiseWriterError()
+
+    def onAnimateEndEvent(self, event):
+        if self.closed:
+            return
+        # A step covering several output times is recorded at each of them, so the recording keeps a fixed rate
+        nbOutputs = self.readout.nbOutputs
+        for k in range(nbOutputs):
+            self.record(self.readout.time - (nbOutputs - 1 - k) * (self.readout.outputPeriod or 0.), self.readout.frame)
+
+
+class Recording:
+    """
+        Lazy reader of a directory written by SkinRecorder. Chunks are memory-mapped when first accessed.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, metaFileName)) as file:
+            self.meta = json.load(file)
+
+        self.patchNames = self.meta["patchNames"]
+        self.cellGrids = self.meta["cellGrids"]
+        self.patchSlices = [slice(start, stop) for start, stop in self.meta["patchSlices"]]
+        self.dt = self.meta["dt"]
+        self.chunkSize = self.meta["chunkSize"]
+        self.nbChunks = self.meta["nbChunks"]
+        self.nbFrames = self.meta["nbFrames"]
+        self.__chunks = {}
+
+        # Times are small compared to the frames, they are read once
+        times = [np.load(os.path.join(directory, timeFileName.format(chunk))) for chunk in range(self.nbChunks)]
+        self.times = np.concatenate(times) if times else np.zeros(0)
+
+    def __len__(self):
+        return self.nbFrames
+
+    def __chunk(self, chunk):
+        if chunk not in self.__chunks:
+            self.__chunks[chunk] = np.load(os.path.join(self.directory, framesFileName.format(chunk)), mmap_mode="r")
+        return self.__chunks[chunk]
+
+    def __cells(self, patch):
+        if patch is None:
+            return slice(None)
+        if isinstance(patch, str):
+            patch = self.patchNames.index(patch)
+        return self.patchSlices[patch]
+
+    def frames(self, start=0, stop=None, patch=None):
+        """
+        Frames [start, stop) of the given patch (name or index, all the cells when None).
+        Only the chunks overlapping the range are read.
+        """
+        stop = self.nbFrames if stop is None else min(stop, self.nbFrames)
+        cells = self.__cells(patch)
+        parts = []
+        for chunk in range(start // self.chunkSize, (stop - 1) // self.chunkSize + 1 if stop > start else 0):
+            offset = chunk * self.chunkSize
+            parts.append(self.__chunk(chunk)[max(start - offset, 0):stop - offset, cells])
+        if not parts:
+            return np.zeros((0, len(range(self.meta["nbCells"])[cells]), nbColumns), dtype=self.meta["dtype"])
+        return np.concatenate(parts)
+
+    def timeRange(self, t0, t1, patch=None):
+        """
+        Frames with t0 <= time < t1, and their times.
+        """
+        start, stop = np.searchsorted(self.times, [t0, t1])
+        return self.times[start:stop], self.frames(start, stop, patch)
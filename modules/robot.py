@@ -1,32 +1,62 @@
 import Sofa
+import os
 import numpy as np
+import xml.etree.ElementTree as ET
+from math import pi
+from .plugins import requireComponents, importModule
+from .robotconfigurations import JointTable
+
+# Component loading the meshes of each format referenced by the URDF
+meshLoaders = {".stl": "MeshSTLLoader", ".obj": "MeshOBJLoader"}
 
 class TalosHumanoidRobot(Sofa.Prefab):
 
-    def __init__(self, urdf="data/talos.urdf"):
+    modelDirectory = "data/meshes/"
+
+    def __init__(self, urdf="data/talos.urdf", withVisual=True, collisionLOD=None, configuration=None):
+        """
+        collisionLOD: None for no collision, else the level of detail of the collision meshes of the links (see modules/lod.py)
+        configuration: dict of ControlJointValue (see modules/robotconfigurations.py), each joint is held
+                       at its pos_desired, see setJointTargets
+        """
         Sofa.Prefab.__init__(self)
         self.name = 'TalosHumanoidRobot'
         self.urdf = urdf
+        self.withVisual = withVisual
+        self.collisionLOD = collisionLOD
+        self.configuration = configuration
 
         # Add the robot model to the scene graph
         self.__addRobot()
+        if configuration is not None:
+            self.__addJointTargets()
 
     def __addRobot(self):
 
         # Robot node
-        settings = self.addChild('Settings')
-        settings.addObject("RequiredPlugin", name="Sofa.RigidBodyDynamics") # Needed to use components [URDFModelLoader]
-        settings.addObject('RequiredPlugin', name='Sofa.Component.Mapping.NonLinear') # Needed to use components [RigidMapping]  
-        settings.addObject('RequiredPlugin', name='Sofa.Component.Mass') # Needed to use components [UniformMass]
-        settings.addObject('RequiredPlugin', name='Sofa.Component.Topology.Container.Constant') # Needed to use components [MeshTopology]  
-        settings.addObject('RequiredPlugin', name='Sofa.GL.Component.Rendering3D') # Needed to use components [OglModel]  
+        # The prefab is not attached yet, its plugins are declared in its own Settings node
+        # URDFModelLoader creates the visual models of the links in any case (withVisual only shows the frames),
+        # with a loader per mesh format of the URDF, shared with the collision models
+        components = ["URDFModelLoader", "MechanicalObject", "RigidMapping", "UniformMass", "MeshTopology", "OglModel"]
+        formats = {os.path.splitext(mesh.get("filename"))[1].lower() for mesh in ET.parse(self.urdf).getroot().iter("mesh")}
+        components += [meshLoaders[extension] for extension in sorted(formats) if extension in meshLoaders]
+        if self.collisionLOD is not None:
+            components += ["MeshSTLLoader", "PointCollisionModel", "LineCollisionModel", "TriangleCollisionModel"]
+        if self.configuration is not None:
+            components += ["AttachProjectiveConstraint", "FixedProjectiveConstraint"]
+        requireComponents(self, components)
+
+        urdf = self.urdf
+        if self.collisionLOD is not None:
+            from .lod import makeURDF
+            urdf = makeURDF(self.urdf, self.modelDirectory, self.collisionLOD)
 
         self.addObject('URDFModelLoader', 
-                        filename=self.urdf, 
-                        modelDirectory="data/meshes/", 
+                        filename=urdf, 
+                        modelDirectory=self.modelDirectory, 
                         useFreeFlyerRootJoint=False, 
                         printLog=False, 
-                        addCollision=False, 
+                        addCollision=self.collisionLOD is not None, 
                         addJointsActuators=False,
                         # qInit = [ 0., 0., -0.448041, 0.896082, -0.448041, 0., 0., 0., 
                         #          -0.448041, 0.896082, -0.448041, 0., 0., 0., -0.75847, 
@@ -35,46 +65,98 @@ class TalosHumanoidRobot(Sofa.Prefab):
                                  )
         robot = self.getChild("Robot")
         mechanical = robot.Model.getMechanicalState()
-        mechanical.showObject = True
+        mechanical.showObject = self.withVisual
         mechanical.showObjectScale = 0.01
         mechanical.drawMode = 0
-    
+
+    def __addJointTargets(self):
+        """
+        Holds each joint at its target angle, as the JointConstraint per joint did: the joint angles of the robot are
+        projected onto the positions of a fixed state (AttachProjectiveConstraint), so that the joints do not yield to
+        gravity or contacts, and a posture update is a single array write. The gains of the configuration (Kp, Kd,
+        Ki, i_clamp) are not used, the joints are position controlled. The joints missing from the configuration are
+        fixed at 0.
+        """
+        robot = self.Robot
+        mechanical = robot.getMechanicalState()
+        nbJoints = len(mechanical.position.value)
+        jointNames = [joint.name.value for joint in robot.Joints.children[1:nbJoints + 1]]
+        self.jointTable = JointTable.fromConfiguration(self.configuration, jointNames)
+
+        positions = self.jointTable.pos_desired.reshape(np.shape(mechanical.position.value))
+        # Setting the initial configuration here does not work I don't know why
+        # Thus we have to hard code the initial configuration in the first call of URDFModelLoader
+        mechanical.position.value = positions
+
+        targets = robot.addChild("JointTargets")
+        targets.addObject("MechanicalObject", template="Vec1", position=positions.tolist())
+        targets.addObject("FixedProjectiveConstraint", fixAll=True)
+        self.jointTargets = targets.getMechanicalState()
+        # Relative links, the prefab is not attached yet
+        robot.addObject("AttachProjectiveConstraint", template="Vec1", name="JointTargetsAttach",
+                        object1="@./JointTargets/MechanicalObject", object2="@./" + mechanical.name.value,
+                        indices1=list(range(nbJoints)), indices2=list(range(nbJoints)), twoWay=False)
+
+    def setJointTargets(self, positions, joints=None):
+        """
+        Target angles of all the joints, in the robot order, or of the given joints (names or indices).
+        """
+        if joints is not None and len(joints) and isinstance(joints[0], str):
+            joints = self.jointTable.indices(joints)
+        with self.jointTargets.position.writeableArray() as targets:
+            if joints is None:
+                targets[:, 0] = positions
+            else:
+                targets[joints, 0] = positions
+
+    def addGuiSettings(self, window, group="Joints"):
+        """
+        One slider per joint in the given Sofa.ImGui window. The sliders edit one Data per joint,
+        copied into the targets at the beginning of each step.
+        """
+        targets = self.Robot.JointTargets
+        values = self.jointTargets.position.value[:, 0]
+        for name, value in zip(self.jointTable.names, values):
+            data = targets.addData(name=str(name), type="double", value=float(value), default=0., help="Target angle", group=group)
+            window.addSetting(str(name), data, -pi, pi)
+        targets.addObject(JointTargetsGui(self))
+
+
+class JointTargetsGui(Sofa.Core.Controller):
+    """
+        Copies the per-joint Data edited in the GUI into the joint targets of the robot.
+    """
+
+    def __init__(self, robot, name="JointTargetsGui"):
+        Sofa.Core.Controller.__init__(self, name=name)
+        self.robot = robot
+        self.targets = robot.Robot.JointTargets
+
+    def onAnimateBeginEvent(self, event):
+        self.robot.setJointTargets([self.targets.getData(str(name)).value for name in self.robot.jointTable.names])
+
 
 # Test/example scene
-def createScene(rootnode):
+def createScene(rootnode, withGui=True, withVisual=True):
 
     from modules.header import addHeader, addSolvers
-    import Sofa.ImGui as MyGui
-    from math import pi
     from modules.robotconfigurations import talos_ctrl_joint_infos_grasp as talosInitConfiguration
 
-    settings, modelling, simulation = addHeader(rootnode, inverse=False, withCollision=False, friction=0)
+    settings, modelling, simulation = addHeader(rootnode, inverse=False, withCollision=False, friction=0, withVisual=withVisual)
 
     addSolvers(simulation, rayleighStiffness=0.001)
-    rootnode.VisualStyle.displayFlags = ["showVisual"]
+    if withVisual:
+        rootnode.VisualStyle.displayFlags = ["showVisual"]
+    if withGui:
+        MyGui = importModule("Sofa.ImGui")
 
     # Units are in m, kg, s
     rootnode.dt = 0.01
     rootnode.gravity = [0., -9.81, 0.]
 
-    # Robot
-    simulation.addChild(TalosHumanoidRobot())
-    robot = simulation.TalosHumanoidRobot.Robot
-
-    # Direct problem
-    names = robot.Joints.children
-    positions = np.copy(robot.getMechanicalState().position.value)
-    for i in range(len(positions)):
-        jointName = names[i+1].name.value
-        value = 0 if jointName not in talosInitConfiguration else talosInitConfiguration[jointName].pos_desired
-        positions[i] = value
-        joint = robot.addObject('JointConstraint', template='Vec1', name='joint' + str(i), index=i, 
-                                valueType="angle", 
-                                value=value
-                                )
-        MyGui.MyRobotWindow.addSetting(jointName, joint.value, -pi, pi)
-    # This does not work I don't know why
-    # Thus we have to hard code the initial configuration in the first call of URDFModelLoader
-    robot.getMechanicalState().position.value = positions
+    # Robot, direct problem
+    simulation.addChild(TalosHumanoidRobot(withVisual=withVisual, configuration=talosInitConfiguration))
+    if withGui:
+        simulation.TalosHumanoidRobot.addGuiSettings(MyGui.MyRobotWindow)
 
     return
@@ -1,5 +1,6 @@
 # Adapted from https://gitlab.laas.fr/ostasse/gz_gep_tools/-/blob/main/src/robots_data.cc?ref_type=heads#L40
 import dataclasses
+import numpy as np
 
 @dataclasses.dataclass
 class ControlJointValue:
@@ -9,6 +10,36 @@ class ControlJointValue:
     i_clamp: float = 0.0
     pos_desired: float = 0.0
     vel_desired: float = 0.0
+
+
+@dataclasses.dataclass
+class JointTable:
+    """
+    A configuration compiled into arrays aligned with the joint order of the robot.
+    The joints missing from the configuration get the default ControlJointValue, see known.
+    """
+    names: np.ndarray
+    known: np.ndarray
+    Kp: np.ndarray
+    Kd: np.ndarray
+    Ki: np.ndarray
+    i_clamp: np.ndarray
+    pos_desired: np.ndarray
+    vel_desired: np.ndarray
+
+    @classmethod
+    def fromConfiguration(cls, configuration, jointNames):
+        values = [configuration.get(name, ControlJointValue()) for name in jointNames]
+        fields = {field.name: np.array([getattr(value, field.name) for value in values], dtype=float)
+                  for field in dataclasses.fields(ControlJointValue)}
+        return cls(names=np.array(jointNames), known=np.array([name in configuration for name in jointNames]), **fields)
+
+    def indices(self, jointNames):
+        """
+        Indices of the given joints in the robot order.
+        """
+        order = {name: i for i, name in enumerate(self.names)}
+        return np.array([order[name] for name in jointNames], dtype=int)
  
 talos_ctrl_joint_infos = {
     "arm_left_1_joint": ControlJointValue(  10000.0, 0.01, 1.0, 14.0, 0.25847 ,  0.0),
@@ -0,0 +1,63 @@
+"""
+Helpers to build and run scenes without GUI, e.g. from the headless runner or the benchmarks.
+"""
+import Sofa
+import Sofa.Simulation
+import numpy as np
+import time
+
+
+def buildScene(createScene, **kwargs):
+    """
+    Creates and initializes a root node with the given createScene function.
+    Returns the root node and the build time in seconds (createScene and init).
+    """
+    start = time.perf_counter()
+    rootnode = Sofa.Core.Node("root")
+    createScene(rootnode, **kwargs)
+    Sofa.Simulation.init(rootnode)
+    return rootnode, time.perf_counter() - start
+
+
+def runSteps(rootnode, nbSteps, callback=None):
+    """
+    Runs nbSteps animation steps and returns the wall time of each step in seconds.
+    callback(step) is called after each step, outside of the timing.
+    """
+    times = np.zeros(nbSteps)
+    for step in range(nbSteps):
+        start = time.perf_counter()
+        # dt is read at each step, a controller may change it, see modules/timestepping.py
+        Sofa.Simulation.animate(rootnode, rootnode.dt.value)
+        times[step] = time.perf_counter() - start
+        if callback is not None:
+            callback(step)
+    return times
+
+
+def getConstraintSolverStats(rootnode):
+    """
+    Iterations, final error (residual) and number of constraints of the last constraint solve, with the iteration
+    limit of the solver. None without constraint solver.
+    """
+    solver = rootnode.getObject("ConstraintSolver")
+    if solver is None or solver.getData("currentIterations") is None:
+        return None
+    return {"iterations": solver.currentIterations.value,
+            "residual": solver.currentError.value,
+            "constraints": solver.currentNumConstraints.value,
+            "maxIterations": solver.maxIterations.value}
+
+
+def summarize(times, percentiles=(50, 90, 99)):
+    """
+    Statistics of per-step wall times, in seconds.
+    """
+    summary = {"steps": len(times),
+               "total": float(np.sum(times)),
+               "stepsPerSecond": float(len(times) / np.sum(times)) if len(times) else 0.,
+               "mean": float(np.mean(times)) if len(times) else 0.,
+               "max": float(np.max(times)) if len(times) else 0.}
+    for p, value in zip(percentiles, np.percentile(times, percentiles) if len(times) else [0.] * len(percentiles)):
+        summary["p" + str(p)] = float(value)
+    return summary
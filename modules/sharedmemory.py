@@ -0,0 +1,203 @@
+"""
+Ring of skin frames in shared memory, written by SkinPublisher (modules/publisher.py) and mapped without copy by
+SharedFramesReader in other processes. This module does not import SOFA, so that the readers do not need it.
+
+Layout of the shared memory block:
+    header          int64[8], see headerFields
+    meta            JSON layout of the frame (SkinReadout.getLayout), dtype and number of slots, padded to 64 bytes
+    sequences       int64[nbSlots], seqlock of each slot
+    times           float64[nbSlots], simulation time of the frame of each slot
+    stamps          float64[nbSlots], time.perf_counter() when the frame was published
+    frames          dtype[nbSlots, nbCells, nbColumns]
+
+Frame k (from 0) is written into slot k % nbSlots. The sequence of the slot is 2k + 1 while the frame is written,
+and 2k + 2 once it is complete, then the frame counter of the header is set to k + 1. A reader checks the sequence
+before and after using a frame: it is intact only if the sequence is still 2k + 2, i.e. the writer did not start
+overwriting the slot, which happens nbSlots frames later.
+"""
+import json
+import sys
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+magic = 0x534B494E # "SKIN"
+version = 1
+headerFields = ["magic", "version", "nbSlots", "nbCells", "nbColumns", "metaSize", "nbFrames", "closed"]
+alignment = 64
+
+
+def _align(size):
+    return (size + alignment - 1) // alignment * alignment
+
+
+def _layout(nbSlots, nbCells, nbColumns, dtype, metaSize):
+    """
+    Offsets of the arrays of the block and its total size.
+    """
+    offsets = {"header": 0, "meta": _align(8 * len(headerFields))}
+    offsets["sequences"] = offsets["meta"] + _align(metaSize)
+    offsets["times"] = offsets["sequences"] + _align(8 * nbSlots)
+    offsets["stamps"] = offsets["times"] + _align(8 * nbSlots)
+    offsets["frames"] = offsets["stamps"] + _align(8 * nbSlots)
+    return offsets, offsets["frames"] + nbSlots * nbCells * nbColumns * np.dtype(dtype).itemsize
+
+
+class _SharedFrames:
+    """
+        Numpy views on the arrays of a block.
+    """
+
+    def _map(self, meta, nbSlots):
+        self.meta = meta
+        self.nbSlots = nbSlots
+        self.nbCells = meta["nbCells"]
+        self.nbColumns = meta["nbColumns"]
+        self.dtype = np.dtype(meta["dtype"])
+        offsets, _ = _layout(nbSlots, self.nbCells, self.nbColumns, self.dtype, self.header[headerFields.index("metaSize")])
+        buffer = self.memory.buf
+        self.sequences = np.ndarray((nbSlots,), dtype=np.int64, buffer=buffer, offset=offsets["sequences"])
+        self.times = np.ndarray((nbSlots,), dtype=np.float64, buffer=buffer, offset=offsets["times"])
+        self.stamps = np.ndarray((nbSlots,), dtype=np.float64, buffer=buffer, offset=offsets["stamps"])
+        self.frames = np.ndarray((nbSlots, self.nbCells, self.nbColumns), dtype=self.dtype, buffer=buffer,
+                                 offset=offsets["frames"])
+
+        self.patchNames = meta["patchNames"]
+        self.cellGrids = meta["cellGrids"]
+        self.patchSlices = [slice(start, stop) for start, stop in meta["patchSlices"]]
+
+    def _unmap(self):
+        # The views must be released before the block is closed
+        self.header = self.sequences = self.times = self.stamps = self.frames = None
+
+    @property
+    def nbFrames(self):
+        """
+        Number of frames published so far.
+        """
+        return int(self.header[headerFields.index("nbFrames")])
+
+    def getPatchFrame(self, frame, name):
+        """
+        View on the rows of the given patch in a frame.
+        """
+        return frame[self.patchSlices[self.patchNames.index(name)]]
+
+
+class SharedFramesWriter(_SharedFrames):
+    """
+        Creates the block and publishes the frames into its ring.
+        layout is the layout of the frames, see SkinReadout.getLayout.
+    """
+
+    def __init__(self, memoryName, layout, nbColumns, nbSlots=8, dtype=np.float32):
+        meta = dict(layout, nbColumns=nbColumns, dtype=np.dtype(dtype).str, nbSlots=nbSlots)
+        metaBytes = json.dumps(meta).encode()
+        offsets, size = _layout(nbSlots, meta["nbCells"], nbColumns, dtype, len(metaBytes))
+        self.memory = shared_memory.SharedMemory(name=memoryName, create=True, size=size)
+        self.memoryName = self.memory.name
+        self.closed = False
+
+        self.header = np.ndarray((len(headerFields),), dtype=np.int64, buffer=self.memory.buf)
+        self.header[:] = [magic, version, nbSlots, meta["nbCells"], nbColumns, len(metaBytes), 0, 0]
+        self.memory.buf[offsets["meta"]:offsets["meta"] + len(metaBytes)] = metaBytes
+        self._map(meta, nbSlots)
+        self.sequences[:] = 0
+
+    def write(self, t, frame):
+        """
+        Publishes a frame, returns its number.
+        """
+        k = self.nbFrames
+        slot = k % self.nbSlots
+        self.sequences[slot] = 2 * k + 1
+        self.frames[slot] = frame
+        self.times[slot] = t
+        self.stamps[slot] = time.perf_counter()
+        self.sequences[slot] = 2 * k + 2
+        self.header[headerFields.index("nbFrames")] = k + 1
+        return k
+
+    def close(self):
+        """
+        Marks the block as closed for the readers, and removes it.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.header[headerFields.index("closed")] = 1
+        self._unmap()
+        self.memory.close()
+        self.memory.unlink()
+
+
+class SharedFramesReader(_SharedFrames):
+    """
+        Maps the block of a writer. The frames are returned as views on the shared memory, without copy.
+        A view stays valid until the writer reuses its slot, see isIntact.
+    """
+
+    def __init__(self, memoryName):
+        if sys.version_info >= (3, 13):
+            self.memory = shared_memory.SharedMemory(name=memoryName, track=False)
+        else:
+            self.memory = shared_memory.SharedMemory(name=memoryName)
+            # Else the resource tracker of this process removes the block of the writer when it exits
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.memory._name, "shared_memory")
+        self.memoryName = memoryName
+
+        self.header = np.ndarray((len(headerFields),), dtype=np.int64, buffer=self.memory.buf)
+        if self.header[0] != magic or self.header[1] != version:
+            self.close()
+            raise ValueError("Not a block of skin frames: " + memoryName)
+        metaOffset = _align(8 * len(headerFields))
+        metaBytes = bytes(self.memory.buf[metaOffset:metaOffset + self.header[headerFields.index("metaSize")]])
+        meta = json.loads(metaBytes)
+        self._map(meta, meta["nbSlots"])
+        self.nextFrame = 0
+
+    @property
+    def writerClosed(self):
+        return bool(self.header[headerFields.index("closed")])
+
+    def isIntact(self, k):
+        """
+        True if the frame k is complete and its slot not reused yet.
+        """
+        return self.sequences[k % self.nbSlots] == 2 * k + 2
+
+    def read(self, k=None):
+        """
+        Frame k (the last one by default) as (k, time, view), or None if it is not available.
+        """
+        k = self.nbFrames - 1 if k is None else k
+        if k < 0 or not self.isIntact(k):
+            return None
+        slot = k % self.nbSlots
+        return k, self.times[slot], self.frames[slot]
+
+    def wait(self, timeout=None, sleep=0.):
+        """
+        Waits for the frame after the last one returned, and returns it as read does.
+        Frames overwritten before they could be read are skipped. Returns None on timeout or when the writer closed.
+        """
+        start = time.perf_counter()
+        while True:
+            nbFrames = self.nbFrames
+            if nbFrames > self.nextFrame:
+                # The oldest frames may already be overwritten
+                k = max(self.nextFrame, nbFrames - self.nbSlots + 1)
+                result = self.read(k)
+                if result is not None:
+                    self.nextFrame = k + 1
+                    return result
+                self.nextFrame = k + 1
+                continue
+            if self.writerClosed or (timeout is not None and time.perf_counter() - start > timeout):
+                return None
+            time.sleep(sleep)
+
+    def close(self):
+        self._unmap()
+        self.memory.close()
@@ -0,0 +1,155 @@
+import Sofa
+import numpy as np
+from itertools import chain
+from scipy.spatial import cKDTree
+from .cell import Cell
+
+
+class SkinIndex(Sofa.Core.Controller):
+    """
+        Spatial index over the top centers of all the cells of a SkinReadout, for batched radius, box,
+        k-nearest-neighbour and ray queries returning global cell ids.
+        The KD-tree is rebuilt only when a cell moved more than tolerance since the last build. In between, the queries
+        are widened by the largest displacement and filtered on the current positions, so the results are exact.
+    """
+
+    def __init__(self, readout, tolerance=0.01, name="SkinIndex"):
+        Sofa.Core.Controller.__init__(self, name=name)
+
+        self.readout = readout
+        self.tolerance = tolerance
+        self.positions = np.zeros((readout.nbCells, 3))
+        self.nbBuilds = 0
+        self.__built = np.zeros((readout.nbCells, 3))
+        self.__displacement = np.zeros(readout.nbCells)
+        self.__slack = 0.
+        self.__tree = None
+
+    def update(self):
+        """
+        Reads the current positions, and rebuilds the tree if they moved more than the tolerance.
+        """
+        for patch, s in zip(self.readout.patches, self.readout.patchSlices):
+            self.positions[s] = patch.cells.deformable.getMechanicalState().position.array()
+        if self.__tree is None:
+            self.__rebuild()
+            return
+        difference = self.positions - self.__built
+        np.einsum("ij,ij->i", difference, difference, out=self.__displacement)
+        self.__slack = float(np.sqrt(np.max(self.__displacement))) if len(self.__displacement) else 0.
+        if self.__slack > self.tolerance:
+            self.__rebuild()
+
+    def __rebuild(self):
+        self.__built[:] = self.positions
+        self.__tree = cKDTree(self.__built)
+        self.__slack = 0.
+        self.nbBuilds += 1
+
+    def radius(self, points, r):
+        """
+        Ids of the cells within r of each point, one array per point.
+        """
+        if self.__tree is None:
+            self.update()
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        candidates = self.__tree.query_ball_point(points, r + self.__slack)
+        if self.__slack == 0.:
+            return [np.array(c, dtype=int) for c in candidates]
+        results = []
+        for point, c in zip(points, candidates):
+            c = np.array(c, dtype=int)
+            results.append(c[np.sum((self.positions[c] - point) ** 2, axis=1) <= r * r])
+        return results
+
+    def box(self, lower, upper):
+        """
+        Ids of the cells inside the axis-aligned box [lower, upper].
+        """
+        if self.__tree is None:
+            self.update()
+        lower, upper = np.asarray(lower, dtype=float), np.asarray(upper, dtype=float)
+        # Candidates in the smallest cube around the box (Chebyshev distance), filtered on the current positions
+        c = np.array(self.__tree.query_ball_point((lower + upper) / 2, np.max(upper - lower) / 2 + self.__slack, p=np.inf), dtype=int)
+        return np.sort(c[np.all((self.positions[c] >= lower) & (self.positions[c] <= upper), axis=1)])
+
+    def nearest(self, points, k=1):
+        """
+        Ids and distances of the k nearest cells of each point, (nbPoints, k) arrays sorted by distance.
+        """
+        if self.__tree is None:
+            self.update()
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        k = min(k, self.readout.nbCells)
+        distances, ids = self.__tree.query(points, k=k)
+        distances, ids = distances.reshape(len(points), k), ids.reshape(len(points), k)
+        if self.__slack == 0.:
+            return ids, distances
+
+        # The true k nearest are within the k-th old distance plus twice the displacement
+        candidates = self.__tree.query_ball_point(points, distances[:, -1] + 2 * self.__slack)
+        for p, (point, c) in enumerate(zip(points, candidates)):
+            c = np.array(c, dtype=int)
+            d = np.linalg.norm(self.positions[c] - point, axis=1)
+            order = np.argsort(d)[:k]
+            ids[p], distances[p] = c[order], d[order]
+        return ids, distances
+
+    def ray(self, origins, directions, radius=None):
+        """
+        First cell hit by each ray, i.e. the one with the smallest abscissa among the cells within radius of the ray
+        (by default the cell size). Returns the ids, -1 for no hit, and the abscissae along the normalized directions.
+        The rays are clipped to the bounding box of the cells, and the candidates are the cells within reach of
+        points sampled every radius along the clipped segments, found with the tree.
+        """
+        if self.__tree is None:
+            self.update()
+        radius = Cell.sideSize if radius is None else radius
+        origins = np.atleast_2d(np.asarray(origins, dtype=float))
+        directions = np.atleast_2d(np.asarray(directions, dtype=float))
+        directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+        ids = np.full(len(origins), -1, dtype=int)
+        abscissae = np.full(len(origins), np.inf)
+        if not len(self.positions):
+            return ids, abscissae
+
+        # Segment of each ray inside the bounding box of the cells widened by radius (slab method)
+        lower, upper = self.positions.min(axis=0) - radius, self.positions.max(axis=0) + radius
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t0 = (lower - origins) / directions
+            t1 = (upper - origins) / directions
+        inside = (origins >= lower) & (origins <= upper)
+        t0 = np.where(np.isnan(t0), np.where(inside, -np.inf, np.inf), t0) # Rays parallel to a slab
+        t1 = np.where(np.isnan(t1), np.where(inside, np.inf, -np.inf), t1)
+        tEnter = np.maximum(np.max(np.minimum(t0, t1), axis=1), 0.)
+        tExit = np.min(np.maximum(t0, t1), axis=1)
+        rays = np.flatnonzero(tEnter <= tExit)
+        if not len(rays):
+            return ids, abscissae
+
+        # Points every radius along the segments, the balls of the query cover the cylinder of the segment
+        nbSamples = np.ceil((tExit[rays] - tEnter[rays]) / radius).astype(int) + 1
+        sampleRays = np.repeat(rays, nbSamples)
+        sampleT = tEnter[sampleRays] + radius * (np.arange(len(sampleRays)) - np.repeat(np.cumsum(nbSamples) - nbSamples, nbSamples))
+        samples = origins[sampleRays] + sampleT[:, None] * directions[sampleRays]
+        candidates = self.__tree.query_ball_point(samples, np.sqrt(1.25) * radius + self.__slack)
+        counts = np.fromiter(map(len, candidates), dtype=int, count=len(candidates))
+        cells = np.fromiter(chain.from_iterable(candidates), dtype=int, count=int(np.sum(counts)))
+        pairs = np.unique(np.repeat(sampleRays, counts) * len(self.positions) + cells)
+        pairRays, pairCells = pairs // len(self.positions), pairs % len(self.positions)
+
+        # Exact test on the current positions, then the smallest abscissa per ray
+        relative = self.positions[pairCells] - origins[pairRays]
+        t = np.einsum("ij,ij->i", relative, directions[pairRays])
+        distance2 = np.einsum("ij,ij->i", relative, relative) - t * t
+        hit = (t >= 0) & (distance2 <= radius * radius)
+        pairRays, pairCells, t = pairRays[hit], pairCells[hit], t[hit]
+        order = np.lexsort((t, pairRays))
+        first = order[np.r_[True, pairRays[order][1:] != pairRays[order][:-1]]] if len(order) else order
+        ids[pairRays[first]] = pairCells[first]
+        abscissae[pairRays[first]] = t[first]
+        return ids, abscissae
+
+    def onAnimateEndEvent(self, event):
+        if self.readout.nbOutputs:
+            self.update()
@@ -0,0 +1,62 @@
+import Sofa
+import numpy as np
+from .runner import getConstraintSolverStats
+
+
+class SolverTelemetry(Sofa.Core.Controller):
+    """
+        Records after each step the iterations, the final residual and the number of constraints of the constraint
+        solver, into preallocated rolling arrays of the last window steps, with totals since the start.
+        A solve is unconverged when it stopped at the iteration limit of the solver.
+        Lighter than the StepProfiler (no SOFA timer), installed by addHeader(telemetry=True).
+    """
+
+    def __init__(self, window=1000, name="SolverTelemetry"):
+        Sofa.Core.Controller.__init__(self, name=name)
+
+        self.window = window
+        self.iterations = np.zeros(window, dtype=int)
+        self.residuals = np.zeros(window)
+        self.constraints = np.zeros(window, dtype=int)
+        self.nbSteps = 0
+        self.nbUnconverged = 0
+        self.totalIterations = 0
+
+    def __record(self, stats):
+        k = self.nbSteps % self.window
+        self.iterations[k] = stats["iterations"]
+        self.residuals[k] = stats["residual"]
+        self.constraints[k] = stats["constraints"]
+        self.nbSteps += 1
+        self.totalIterations += stats["iterations"]
+        self.nbUnconverged += stats["constraints"] > 0 and stats["iterations"] >= stats["maxIterations"]
+
+    def last(self, n=None):
+        """
+        Iterations, residuals and constraints of the last n steps (at most window, all of them by default), oldest first.
+        """
+        n = min(self.nbSteps, self.window) if n is None else min(n, self.nbSteps, self.window)
+        order = (self.nbSteps - n + np.arange(n)) % self.window
+        return self.iterations[order], self.residuals[order], self.constraints[order]
+
+    def statistics(self):
+        """
+        Statistics of the last steps, and the totals since the start.
+        """
+        iterations, residuals, constraints = self.last()
+        n = len(iterations)
+        return {"steps": self.nbSteps,
+                "iterationsMean": float(np.mean(iterations)) if n else 0.,
+                "iterationsP95": float(np.percentile(iterations, 95)) if n else 0.,
+                "iterationsMax": int(np.max(iterations)) if n else 0,
+                "residualMedian": float(np.median(residuals)) if n else 0.,
+                "residualMax": float(np.max(residuals)) if n else 0.,
+                "constraintsMean": float(np.mean(constraints)) if n else 0.,
+                "constraintsMax": int(np.max(constraints)) if n else 0,
+                "totalIterations": int(self.totalIterations),
+                "unconverged": self.nbUnconverged}
+
+    def onAnimateEndEvent(self, event):
+        stats = getConstraintSolverStats(self.getContext().getRoot())
+        if stats is not None:
+            self.__record(stats)
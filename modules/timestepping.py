@@ -0,0 +1,96 @@
+import Sofa
+import numpy as np
+from .cell import Cell
+from .readout import columns
+from .runner import getConstraintSolverStats
+
+
+class AdaptiveTimeStep(Sofa.Core.Controller):
+    """
+        Adapts the dt of the scene to the contact load, at the end of each step for the next one:
+            - sub-steps (dt shrunk, down to dtMin) when the number of cells in contact, the largest cell depth or
+              the constraint solver iterations cross their thresholds
+            - grows dt (up to dtMax) when no cell is in contact and there are at most maxFreeConstraints constraints
+              (e.g. those of the scene outside of the contacts)
+            - else grows or shrinks dt to at most the output period
+        The steps land on the output times of the readout, every outputPeriod (by default the dt of the scene): the
+        sub-steps divide the output period, the large steps are multiples of it. SkinReadout.nbOutputs is the number
+        of output times reached by the step, 0 for the sub-steps between two outputs.
+        The dt is read by the runners at each step (see modules/runner.py). Must be added after the SkinReadout.
+    """
+    stateArrays = ["nominalDt", "nextOutput"] # Saved in the checkpoints, see modules/checkpoint.py
+
+    def __init__(self, readout, outputPeriod=None, dtMin=None, dtMax=None, growth=1.5, shrink=0.5,
+                 contactThreshold=1e-4, maxContacts=20, maxDepth=Cell.centerThickness / 2, maxIterationsFraction=0.5,
+                 maxFreeConstraints=0, name="AdaptiveTimeStep"):
+        Sofa.Core.Controller.__init__(self, name=name)
+
+        self.readout = readout
+        root = readout.getContext().getRoot()
+        self.outputPeriod = root.dt.value if outputPeriod is None else outputPeriod
+        self.dtMin = self.outputPeriod / 8 if dtMin is None else dtMin
+        self.dtMax = self.outputPeriod * 4 if dtMax is None else dtMax
+        assert self.dtMin <= self.outputPeriod <= self.dtMax
+        self.growth = growth
+        self.shrink = shrink
+        self.contactThreshold = contactThreshold
+        self.maxContacts = maxContacts
+        self.maxDepth = maxDepth
+        self.maxFreeConstraints = maxFreeConstraints
+        solver = root.getObject("ConstraintSolver")
+        self.maxIterations = maxIterationsFraction * solver.maxIterations.value if solver is not None else np.inf
+
+        self.nominalDt = self.outputPeriod # Before landing on the output times
+        self.nextOutput = np.nan
+        self.nbSteps = 0
+        self.nbSubSteps = 0
+        self.nbLargeSteps = 0
+        self.nbContacts = 0
+        self.depth = 0.
+        self.iterations = 0
+        readout.outputPeriod = self.outputPeriod
+        root.dt.value = self.outputPeriod
+        self.__eps = 1e-9 * self.outputPeriod
+        self.__stepEnd = 0.
+
+    def __land(self, t, dt):
+        """
+        dt from t to the next output time in equal sub-steps, or to the furthest output time within dt.
+        """
+        remaining = self.nextOutput - t
+        if dt < remaining - self.__eps:
+            return remaining / np.ceil(remaining / dt - 1e-6)
+        return remaining + np.floor((dt - remaining) / self.outputPeriod + 1e-6) * self.outputPeriod
+
+    def onAnimateBeginEvent(self, event):
+        root = self.getContext().getRoot()
+        t, dt = root.time.value, root.dt.value
+        if np.isnan(self.nextOutput):
+            self.nextOutput = t + self.outputPeriod
+
+        # Output times reached by this step
+        nbOutputs = 0
+        while self.nextOutput <= t + dt + self.__eps:
+            self.nextOutput += self.outputPeriod
+            nbOutputs += 1
+        self.readout.nbOutputs = nbOutputs
+        self.__stepEnd = t + dt # The next step starts there
+        self.nbSteps += 1
+        self.nbSubSteps += dt < self.outputPeriod - self.__eps
+        self.nbLargeSteps += dt > self.outputPeriod + self.__eps
+
+    def onAnimateEndEvent(self, event):
+        root = self.getContext().getRoot()
+        depth = self.readout.frame[:, columns["depth"]]
+        self.nbContacts = int(np.count_nonzero(depth > self.contactThreshold))
+        self.depth = float(np.max(depth)) if len(depth) else 0.
+        stats = getConstraintSolverStats(root)
+        self.iterations, nbConstraints = (stats["iterations"], stats["constraints"]) if stats is not None else (0, 0)
+
+        if self.nbContacts > self.maxContacts or self.depth > self.maxDepth or self.iterations > self.maxIterations:
+            self.nominalDt = max(self.nominalDt * self.shrink, self.dtMin)
+        elif self.nbContacts == 0 and nbConstraints <= self.maxFreeConstraints:
+            self.nominalDt = min(self.nominalDt * self.growth, self.dtMax)
+        else:
+            self.nominalDt = min(self.nominalDt * self.growth, self.outputPeriod)
+        root.dt.value = self.__land(self.__stepEnd, self.nominalDt)
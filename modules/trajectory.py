@@ -0,0 +1,81 @@
+"""
+Joint trajectories of the robot: keyframe postures (named configurations of modules/robotconfigurations.py, dicts of
+ControlJointValue or arrays) resampled to the simulation dt ahead of time, and played back into the joint targets of
+TalosHumanoidRobot, one array row per step, by the TrajectoryPlayer of modules/player.py.
+This module does not need SOFA, so that trajectories can be made without it.
+
+Usage, from the repository root:
+    python -m modules.trajectory make wave.npz talos_ctrl_joint_infos:0 talos_ctrl_joint_infos_grasp:2 talos_ctrl_joint_infos:4
+    python headless.py --trajectory wave.npz grasp.npz --steps 2000
+"""
+import os
+import sys
+import numpy as np
+from . import robotconfigurations
+from .robotconfigurations import JointTable
+
+interpolations = ["linear", "smooth"]
+
+
+class Trajectory:
+    """
+        Keyframe postures at increasing times (s), on the given joints.
+        Smooth interpolation eases in and out of each keyframe (zero velocity at the keyframes).
+    """
+
+    def __init__(self, times, postures, jointNames, name="Trajectory"):
+        self.times = np.asarray(times, dtype=float)
+        self.postures = np.asarray(postures, dtype=float).reshape(len(self.times), len(jointNames))
+        self.jointNames = [str(joint) for joint in jointNames]
+        self.name = name
+        assert np.all(np.diff(self.times) > 0)
+
+    @property
+    def duration(self):
+        return float(self.times[-1] - self.times[0])
+
+    @classmethod
+    def fromConfigurations(cls, keyframes, jointNames=None, name="Trajectory"):
+        """
+        keyframes: list of (time, configuration), the configurations being dicts of ControlJointValue or names of
+        the dicts of modules/robotconfigurations.py. The joints are those of the first configuration by default.
+        """
+        configurations = [getattr(robotconfigurations, c) if isinstance(c, str) else c for t, c in keyframes]
+        jointNames = list(configurations[0]) if jointNames is None else jointNames
+        postures = [JointTable.fromConfiguration(configuration, jointNames).pos_desired for configuration in configurations]
+        return cls([t for t, c in keyframes], postures, jointNames, name=name)
+
+    def resample(self, dt, interpolation="smooth"):
+        """
+        Postures at each step of the trajectory, (nbSteps, nbJoints).
+        """
+        assert interpolation in interpolations
+        t = self.times[0] + dt * np.arange(int(round(self.duration / dt)) + 1)
+        if len(self.times) == 1:
+            return np.repeat(self.postures, len(t), axis=0)
+        k = np.clip(np.searchsorted(self.times, t, side="right") - 1, 0, len(self.times) - 2)
+        u = np.clip((t - self.times[k]) / (self.times[k + 1] - self.times[k]), 0., 1.)
+        if interpolation == "smooth":
+            u = u * u * (3. - 2. * u)
+        return self.postures[k] + u[:, None] * (self.postures[k + 1] - self.postures[k])
+
+    def save(self, filename):
+        """
+        Compact binary file (compressed .npz, postures in float32).
+        """
+        np.savez_compressed(filename, times=self.times, postures=self.postures.astype(np.float32),
+                            jointNames=np.array(self.jointNames), name=np.array(self.name))
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as file:
+            return cls(file["times"], file["postures"], list(file["jointNames"]), name=str(file["name"]))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "make":
+        keyframes = [(float(keyframe.split(":")[1]), keyframe.split(":")[0]) for keyframe in sys.argv[3:]]
+        name = os.path.splitext(os.path.basename(sys.argv[2]))[0]
+        Trajectory.fromConfigurations(keyframes, name=name).save(sys.argv[2])
+    else:
+        print(__doc__)